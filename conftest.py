@@ -0,0 +1,15 @@
+import shutil
+import tempfile
+
+import pytest
+from django.test import override_settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temp_media_root():
+    """Файлы, которые создают тесты (в том числе картинки постов из
+    mixer), пишутся во временный каталог, а не в yatube/media."""
+    media_root = tempfile.mkdtemp()
+    with override_settings(MEDIA_ROOT=media_root):
+        yield media_root
+    shutil.rmtree(media_root, ignore_errors=True)
@@ -0,0 +1,62 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Выполняется в отдельном процессе, чтобы измерять холодный старт.
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+import django
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+timings = {"import": time.perf_counter() - start}
+if os.environ["WARMUP_ON_START"] == "1":
+    from core.warmup import warm_up
+    start = time.perf_counter()
+    warm_up(application)
+    timings["warmup"] = time.perf_counter() - start
+from core.warmup import request_urls
+for key in ("first_request", "second_request"):
+    start = time.perf_counter()
+    request_urls(application, [sys.argv[1]])
+    timings[key] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Измеряет холодный старт воркера: импорт приложения, прогрев '
+            'и время первого и второго запроса, с прогревом и без')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--url', default='/')
+
+    def probe(self, url, warmup):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'yatube.settings'),
+            WARMUP_ON_START='1' if warmup else '0',
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, url], env=env, cwd=settings.BASE_DIR,
+            check=True, stdout=subprocess.PIPE, universal_newlines=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for warmup in (False, True):
+            runs = [self.probe(options['url'], warmup)
+                    for _ in range(options['runs'])]
+            medians = {key: statistics.median(run[key] for run in runs)
+                       for key in runs[0]}
+            self.stdout.write(
+                ('с прогревом: ' if warmup else 'без прогрева: ')
+                + ', '.join(f'{key} {seconds * 1000:.1f} мс'
+                            for key, seconds in medians.items()))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.perfcheck import BLOCKER, WARNING, run_checks
+
+
+class Command(BaseCommand):
+    help = ('Проверяет настройки, базу и middleware на типичные проблемы '
+            'производительности; завершается с ошибкой при блокерах')
+
+    def handle(self, *args, **options):
+        findings = run_checks()
+        for finding in findings:
+            style = {
+                BLOCKER: self.style.ERROR,
+                WARNING: self.style.WARNING,
+            }.get(finding.level, str)
+            self.stdout.write(style(
+                f'[{finding.level.upper()}] {finding.title}'))
+            self.stdout.write(f'    влияние: {finding.impact}')
+            self.stdout.write(f'    что сделать: {finding.advice}')
+        blockers = sum(finding.level == BLOCKER for finding in findings)
+        if blockers:
+            raise CommandError(f'Блокеров: {blockers}')
+        self.stdout.write(f'Блокеров нет, замечаний: {len(findings)}')
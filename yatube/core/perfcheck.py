@@ -0,0 +1,224 @@
+"""Проверки настроек, влияющих на производительность.
+
+Каждая проверка возвращает список Finding. BLOCKER — то, с чем нельзя
+выкладывать проект: команда perfcheck в этом случае завершается
+с ошибкой. WARNING — заметная потеря скорости, INFO — совет.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections
+
+BLOCKER = 'blocker'
+WARNING = 'warning'
+INFO = 'info'
+LEVELS = (BLOCKER, WARNING, INFO)
+
+Finding = namedtuple('Finding', ('level', 'title', 'impact', 'advice'))
+
+# Таблица, столбцы и страница, для которой нужен индекс с этими
+# столбцами в начале.
+EXPECTED_INDEXES = (
+    ('posts_post', ('pub_date',), 'главная: ORDER BY pub_date'),
+    ('posts_post', ('author_id',), 'профиль: WHERE author_id'),
+    ('posts_post', ('group_id',), 'группа: WHERE group_id'),
+    ('posts_post', ('image',), 'очистка картинок: WHERE image'),
+    ('posts_comment', ('post_id',), 'пост: комментарии по post_id'),
+    ('posts_comment', ('created',), 'популярное: комментарии по created'),
+    ('posts_follow', ('user_id',), 'подписки: WHERE user_id'),
+    ('posts_follow', ('author_id',), 'профиль: подписчики по author_id'),
+    ('posts_follow', ('created',), 'популярное: подписки по created'),
+)
+
+UNCACHED_LOADERS = {
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+}
+
+
+def check_debug():
+    if not settings.DEBUG:
+        return []
+    return [Finding(
+        BLOCKER, 'DEBUG = True',
+        'каждый SQL-запрос сохраняется в connection.queries, память '
+        'воркера растёт с каждым запросом; шаблоны не кешируются',
+        'выставьте DEBUG = False в боевых настройках',
+    )]
+
+
+def check_template_loaders():
+    findings = []
+    for engine in settings.TEMPLATES:
+        if not engine['BACKEND'].endswith('DjangoTemplates'):
+            continue
+        options = engine.get('OPTIONS', {})
+        loaders = options.get('loaders')
+        if loaders is None:
+            if settings.DEBUG or options.get('debug'):
+                findings.append(Finding(
+                    WARNING, 'шаблоны загружаются без кеша',
+                    'при DEBUG каждый рендер заново читает и разбирает '
+                    'base.html и все include — миллисекунды на страницу',
+                    'без DEBUG Django включает cached.Loader сам; иначе '
+                    'задайте его в OPTIONS["loaders"]',
+                ))
+            continue
+        flat = {loader if isinstance(loader, str) else loader[0]
+                for loader in loaders}
+        if flat & UNCACHED_LOADERS and (
+                'django.template.loaders.cached.Loader' not in flat):
+            findings.append(Finding(
+                WARNING, 'в OPTIONS["loaders"] нет cached.Loader',
+                'шаблоны разбираются при каждом рендере',
+                'оберните загрузчики в django.template.loaders.cached.Loader',
+            ))
+    return findings
+
+
+def check_cache():
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('DummyCache'):
+        return [Finding(
+            BLOCKER, 'кеш по умолчанию — DummyCache',
+            'cache_page главной и кеши приложения ничего не хранят',
+            'настройте Memcached или Redis',
+        )]
+    if backend.endswith(('LocMemCache', 'FileBasedCache')):
+        return [Finding(
+            WARNING, f'кеш по умолчанию — {backend.rsplit(".", 1)[-1]}',
+            'у каждого воркера свой кеш: меньше попаданий, а сброс кеша '
+            'в одном процессе не виден остальным',
+            'используйте общий кеш (Memcached, Redis)',
+        )]
+    return []
+
+
+def check_connections():
+    findings = []
+    for alias, database in settings.DATABASES.items():
+        if database.get('CONN_MAX_AGE', 0) != 0:
+            continue
+        sqlite = database['ENGINE'].endswith('sqlite3')
+        findings.append(Finding(
+            INFO if sqlite else WARNING,
+            f'{alias}: CONN_MAX_AGE = 0',
+            'соединение с базой открывается на каждый запрос'
+            + ('' if sqlite else ' — TCP и аутентификация, 1–10 мс'),
+            'задайте CONN_MAX_AGE, например 60',
+        ))
+    return findings
+
+
+def check_sqlite_pragmas():
+    findings = []
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0].lower()
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        if journal_mode not in ('wal', 'memory'):
+            findings.append(Finding(
+                WARNING, f'{alias}: SQLite journal_mode = {journal_mode}',
+                'запись блокирует чтение всей базы, параллельные запросы '
+                'ждут или падают с "database is locked"',
+                'выполните PRAGMA journal_mode=WAL (сохраняется в файле)',
+            ))
+        if journal_mode == 'wal' and synchronous >= 2:
+            findings.append(Finding(
+                INFO, f'{alias}: SQLite synchronous = FULL',
+                'fsync при каждой фиксации',
+                'в режиме WAL достаточно synchronous=NORMAL',
+            ))
+    return findings
+
+
+def _indexed_prefixes(connection, table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [tuple(info['columns']) for info in constraints.values()
+            if info['index'] or info['unique'] or info['primary_key']]
+
+
+def check_indexes(using='default'):
+    connection = connections[using]
+    tables = set(connection.introspection.table_names())
+    findings = []
+    prefixes = {}
+    for table, columns, usage in EXPECTED_INDEXES:
+        if table not in tables:
+            continue
+        if table not in prefixes:
+            prefixes[table] = _indexed_prefixes(connection, table)
+        if any(index[:len(columns)] == columns
+               for index in prefixes[table]):
+            continue
+        findings.append(Finding(
+            WARNING, f'нет индекса {table}({", ".join(columns)})',
+            f'{usage} — полный просмотр таблицы или сортировка во '
+            'временном B-дереве, растёт с числом строк',
+            'добавьте db_index или Meta.indexes и миграцию',
+        ))
+    return findings
+
+
+def check_middleware():
+    middleware = list(settings.MIDDLEWARE)
+    findings = []
+
+    def position(name):
+        return next((number for number, path in enumerate(middleware)
+                     if path.endswith(name)), None)
+
+    update_cache = position('UpdateCacheMiddleware')
+    fetch_cache = position('FetchFromCacheMiddleware')
+    if update_cache is not None and update_cache != 0:
+        findings.append(Finding(
+            BLOCKER, 'UpdateCacheMiddleware не первый',
+            'в кеш попадают ответы без заголовков внешних middleware',
+            'поставьте UpdateCacheMiddleware первым в MIDDLEWARE',
+        ))
+    if fetch_cache is not None and fetch_cache != len(middleware) - 1:
+        findings.append(Finding(
+            BLOCKER, 'FetchFromCacheMiddleware не последний',
+            'middleware после него выполняются даже для ответов из кеша',
+            'поставьте FetchFromCacheMiddleware последним',
+        ))
+    gzip = position('GZipMiddleware')
+    if gzip is not None and gzip > 1:
+        findings.append(Finding(
+            WARNING, 'GZipMiddleware стоит не в начале',
+            'middleware выше него работают с несжатым ответом',
+            'поставьте GZipMiddleware сразу после SecurityMiddleware',
+        ))
+    if position('ConditionalGetMiddleware') is None:
+        findings.append(Finding(
+            INFO, 'нет ConditionalGetMiddleware',
+            'страницы отдаются целиком даже при совпадении ETag',
+            'добавьте django.middleware.http.ConditionalGetMiddleware',
+        ))
+    return findings
+
+
+def check_sessions():
+    if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.db':
+        return []
+    return [Finding(
+        INFO, 'сессии хранятся в базе',
+        'каждый запрос авторизованного пользователя читает django_session',
+        'используйте django.contrib.sessions.backends.cached_db',
+    )]
+
+
+CHECKS = (check_debug, check_template_loaders, check_cache,
+          check_connections, check_sqlite_pragmas, check_indexes,
+          check_middleware, check_sessions)
+
+
+def run_checks():
+    findings = [finding for check in CHECKS for finding in check()]
+    return sorted(findings, key=lambda finding: LEVELS.index(finding.level))
@@ -0,0 +1,78 @@
+import os
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+from posts.tests.utils import TempMediaMixin
+
+CONTENT = bytes(range(256)) * 4
+
+
+class MediaViewTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(cls.media_root, 'posts'), exist_ok=True)
+        cls.path = os.path.join(cls.media_root, 'posts', 'data.png')
+        with open(cls.path, 'wb') as file:
+            file.write(CONTENT)
+        cls.url = f'{settings.MEDIA_URL}posts/data.png'
+
+    def read(self, response):
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_whole_file_is_streamed_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.read(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_requests_get_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=http_date(os.path.getmtime(self.path)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(self.read(response), CONTENT[10:20])
+        self.assertEqual(response['Content-Range'],
+                         f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(response['Content-Length'], '10')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.read(response), CONTENT[-5:])
+        response = self.client.get(self.url,
+                                   HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-0',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.read(response), CONTENT)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_proxy_delegation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/data.png')
+        self.assertEqual(response.content, b'')
+
+    def test_paths_outside_media_root_are_not_served(self):
+        response = self.client.get(f'{settings.MEDIA_URL}../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(f'{settings.MEDIA_URL}posts/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
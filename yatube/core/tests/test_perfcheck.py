@@ -0,0 +1,46 @@
+import io
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.perfcheck import BLOCKER, check_indexes, run_checks
+
+PRODUCTION_MIDDLEWARE = [
+    'django.middleware.cache.UpdateCacheMiddleware',
+    *settings.MIDDLEWARE,
+    'django.middleware.http.ConditionalGetMiddleware',
+    'django.middleware.cache.FetchFromCacheMiddleware',
+]
+
+
+class PerfcheckTest(TestCase):
+    def titles(self):
+        return {finding.title: finding.level for finding in run_checks()}
+
+    def test_debug_is_a_blocker(self):
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.titles()['DEBUG = True'], BLOCKER)
+            with self.assertRaises(CommandError):
+                call_command('perfcheck', stdout=io.StringIO())
+
+    @override_settings(
+        DEBUG=False,
+        MIDDLEWARE=PRODUCTION_MIDDLEWARE,
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    )
+    def test_production_settings_pass(self):
+        stdout = io.StringIO()
+        call_command('perfcheck', stdout=stdout)
+        self.assertIn('Блокеров нет', stdout.getvalue())
+        self.assertIn('кеш по умолчанию — LocMemCache', stdout.getvalue())
+
+    @override_settings(DEBUG=False, MIDDLEWARE=PRODUCTION_MIDDLEWARE[::-1])
+    def test_cache_middleware_order_is_checked(self):
+        titles = self.titles()
+        self.assertEqual(titles['UpdateCacheMiddleware не первый'], BLOCKER)
+        self.assertEqual(titles['FetchFromCacheMiddleware не последний'],
+                         BLOCKER)
+
+    def test_migrated_schema_has_expected_indexes(self):
+        self.assertEqual(check_indexes(), [])
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.template import engines
+from django.test import TestCase
+
+from core.warmup import (WarmUpApplication, compile_templates, request_urls,
+                         resolve_routes, warm_up)
+
+
+class WarmupTest(TestCase):
+    def test_routes_and_templates_are_loaded(self):
+        self.assertGreater(resolve_routes(), 20)
+        self.assertGreater(compile_templates(), 10)
+
+    def test_requests_go_through_wsgi_application(self):
+        calls = []
+
+        def application(environ, start_response):
+            calls.append((environ['PATH_INFO'], environ['HTTP_HOST']))
+            start_response('200 OK', [])
+            return [b'ok']
+
+        self.assertEqual(request_urls(application, ['/', '/groups/']),
+                         {'/': 200, '/groups/': 200})
+        self.assertEqual(calls, [('/', 'localhost'),
+                                 ('/groups/', 'localhost')])
+
+    def test_failed_step_does_not_stop_warm_up(self):
+        def broken(environ, start_response):
+            raise RuntimeError
+
+        with self.assertLogs('core.warmup', 'ERROR'):
+            timings = warm_up(broken)
+        self.assertEqual(list(timings), ['routes', 'templates',
+                                         'image_libraries', 'requests',
+                                         'connections'])
+
+    def test_templates_are_not_compiled_without_cached_loader(self):
+        engine = engines['django'].engine
+        with mock.patch.object(engine, 'template_loaders',
+                               engine.get_template_loaders(
+                                   ['django.template.loaders.'
+                                    'filesystem.Loader'])):
+            self.assertEqual(compile_templates(), 0)
+
+    def test_application_warms_up_once_per_process(self):
+        def application(environ, start_response):
+            start_response('200 OK', [])
+            return [b'ok']
+
+        warmed = WarmUpApplication(application)
+        with mock.patch('core.warmup.warm_up') as warm_up_mock:
+            self.assertEqual(request_urls(warmed, ['/', '/groups/']),
+                             {'/': 200, '/groups/': 200})
+            warm_up_mock.assert_called_once_with(application)
+            with mock.patch('os.getpid', return_value=-1):
+                request_urls(warmed, ['/'])
+        self.assertEqual(warm_up_mock.call_count, 2)
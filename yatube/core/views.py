@@ -1,4 +1,19 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from posts.storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def page_not_found(request, exception):
@@ -11,3 +26,119 @@ def csrf_failure(request, reason=''):
 
 def server_error(request, reason=''):
     return render(request, 'core/500.html')
+
+
+class FileRange:
+    """Часть открытого файла для ответа на запрос с Range."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Границы (start, end) единственного диапазона байтов. None, если
+    заголовок не разобран и файл отдаётся целиком; ValueError, если
+    диапазон лежит за концом файла."""
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _range_applies(request, etag, last_modified):
+    """Range учитывается, только если If-Range совпадает с версией файла."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def media(request, path):
+    """Отдаёт загруженные файлы без отдельного веб-сервера.
+
+    Ответ содержит ETag и Last-Modified, поэтому повторные запросы
+    получают 304. Целые файлы отдаются через FileResponse: WSGI-сервер
+    с wsgi.file_wrapper (gunicorn, uWSGI) передаёт их через sendfile без
+    копирования в Python. Поддерживается один диапазон Range. Если задан
+    MEDIA_SENDFILE_HEADER, тело отдаёт прокси по заголовку
+    X-Accel-Redirect (nginx) или X-Sendfile (Apache, lighttpd).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405)
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag, last_modified)
+    if response is None:
+        response = _file_response(request, path, full_path, stat.st_size,
+                                  etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _file_response(request, path, full_path, size, etag, last_modified):
+    header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if header in ('X-Accel-Redirect', 'X-Sendfile'):
+        content_type = mimetypes.guess_type(full_path)[0]
+        response = HttpResponse(
+            content_type=content_type or 'application/octet-stream')
+        if header == 'X-Accel-Redirect':
+            response[header] = quote(
+                settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response[header] = full_path
+        return response
+    response_range = None
+    if 'HTTP_RANGE' in request.META and _range_applies(
+            request, etag, last_modified):
+        try:
+            response_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(full_path, 'rb')
+    if response_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = response_range
+        response = FileResponse(FileRange(file, start, end - start + 1),
+                                filename=os.path.basename(full_path),
+                                status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
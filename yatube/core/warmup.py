@@ -0,0 +1,168 @@
+"""Прогрев воркера после запуска.
+
+Первые запросы к свежему воркеру платят за заполнение URL-резолвера,
+разбор шаблонов, импорт sorl.thumbnail и Pillow, открытие соединения
+с базой и пустые кеши. warm_up() делает это заранее: компилирует шаблоны
+проекта (если включён кеширующий загрузчик, иначе компилировать впрок
+бесполезно), заполняет резолверы, открывает соединения и прогоняет через
+приложение GET-запросы к WARMUP_URLS, чтобы заполнить кеши страниц.
+Ошибка прогрева не мешает запуску: шаг пропускается и пишется в лог.
+
+Прогрев нельзя выполнять при импорте yatube/wsgi.py: модуль загружают и
+процесс автоперезагрузки, и мастер gunicorn с --preload, а открытые там
+соединения с базой наследуют все воркеры. Поэтому wsgi.py оборачивает
+приложение в WarmUpApplication, которая прогревает каждый процесс перед
+его первым запросом. В gunicorn прогрев можно выполнить сразу после
+запуска воркера, указав в конфигурации
+post_worker_init = 'core.warmup.post_worker_init'.
+"""
+import logging
+import os
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_routes(resolver=None):
+    """Заполняет таблицы reverse() и компилирует шаблоны маршрутов всех
+    вложенных резолверов. Возвращает число маршрутов."""
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            count += resolve_routes(pattern)
+        else:
+            count += 1
+    return count
+
+
+def _caches_templates(engine):
+    loaders = getattr(getattr(engine, 'engine', None), 'template_loaders', ())
+    return any(isinstance(loader, CachedLoader) for loader in loaders)
+
+
+def compile_templates():
+    """Загружает все шаблоны из каталогов DIRS движков с кеширующим
+    загрузчиком, чтобы они остались скомпилированными в памяти."""
+    count = 0
+    for engine in engines.all():
+        if not _caches_templates(engine):
+            continue
+        for directory in getattr(engine, 'dirs', ()):
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    if not filename.endswith('.html'):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename),
+                                           directory)
+                    engine.get_template(name.replace(os.sep, '/'))
+                    count += 1
+    return count
+
+
+def import_image_libraries():
+    from PIL import Image
+    from sorl.thumbnail import default
+
+    Image.init()
+    default.backend, default.engine, default.kvstore, default.storage
+
+
+def open_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS
+             if host and not host.startswith(('*', '.'))]
+    return getattr(settings, 'WARMUP_HOST', None) or (
+        hosts[0] if hosts else 'localhost')
+
+
+def request_urls(application, urls=None):
+    """Прогоняет GET-запросы через WSGI-приложение целиком, как от
+    анонимного посетителя. Возвращает {url: статус}."""
+    statuses = {}
+    for url in urls if urls is not None else settings.WARMUP_URLS:
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': url,
+                   'HTTP_HOST': _host()}
+        setup_testing_defaults(environ)
+
+        def start_response(status, headers, exc_info=None):
+            statuses[url] = int(status.split()[0])
+
+        response = application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+    return statuses
+
+
+def warm_up(application=None):
+    """Выполняет шаги прогрева и возвращает {шаг: секунды}."""
+    steps = [
+        ('routes', resolve_routes),
+        ('templates', compile_templates),
+        ('image_libraries', import_image_libraries),
+    ]
+    if application is not None:
+        steps.append(('requests', lambda: request_urls(application)))
+    # После запросов: при CONN_MAX_AGE = 0 они закрывают соединения.
+    steps.append(('connections', open_connections))
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Шаг прогрева %s не выполнен', name)
+        timings[name] = time.perf_counter() - start
+    logger.info('Прогрев воркера: %s', ', '.join(
+        f'{name} {seconds * 1000:.0f} мс'
+        for name, seconds in timings.items()))
+    return timings
+
+
+class WarmUpApplication:
+    """WSGI-приложение, которое прогревает процесс перед первым запросом.
+
+    Номер процесса запоминается, поэтому прогрев выполняется заново в
+    каждом воркере, созданном fork после загрузки приложения.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self._warmed_pid = None
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        if self._warmed_pid == os.getpid():
+            return
+        with self._lock:
+            if self._warmed_pid != os.getpid():
+                warm_up(self.application)
+                self._warmed_pid = os.getpid()
+
+    def __call__(self, environ, start_response):
+        self.warm_up()
+        return self.application(environ, start_response)
+
+
+def post_worker_init(worker):
+    """Хук gunicorn: прогревает воркер сразу после его запуска."""
+    if isinstance(worker.wsgi, WarmUpApplication):
+        worker.wsgi.warm_up()
@@ -1,17 +1,178 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
 
-from .models import Comment, Follow, Group, Post
+from . import bulk, deletion
+from .models import Comment, Deletion, Follow, Group, Post, User
 
 
-class PostAdmin(admin.ModelAdmin):
+def schedule_deletion(modeladmin, request, queryset):
+    """Скрывает выбранные объекты и ставит их удаление в очередь
+    process_deletions."""
+    scheduled = 0
+    for obj in queryset:
+        if obj == request.user:
+            continue
+        deletion.schedule(obj)
+        scheduled += 1
+    modeladmin.message_user(
+        request, f'Поставлено в очередь удаления: {scheduled}')
+
+
+schedule_deletion.short_description = 'Удалить в фоне'
+
+
+NO_GROUP = 'none'
+
+
+def group_choices():
+    return [('', '---------'), (NO_GROUP, '-без группы-')] + [
+        (group.id, group.title) for group in Group.objects.all()]
+
+
+class PostActionForm(ActionForm):
+    # Поле нужно только переносу в группу, поэтому не обязательное для
+    # формы; «без группы» выбирается явно, а пустое значение — ошибка.
+    group = forms.ChoiceField(choices=group_choices, required=False,
+                              label='Группа')
+
+
+def reassign_group(modeladmin, request, queryset):
+    try:
+        value = PostActionForm.base_fields['group'].clean(
+            request.POST.get('group'))
+    except ValidationError:
+        value = None
+    if not value:
+        modeladmin.message_user(
+            request, 'Выберите группу или «без группы»', messages.ERROR)
+        return
+    group = None
+    if value != NO_GROUP:
+        group = Group.objects.filter(id=value).first()
+        if group is None:
+            modeladmin.message_user(request, 'Группа не найдена',
+                                    messages.ERROR)
+            return
+    moved = bulk.reassign_group(queryset, group)
+    modeladmin.message_user(request, f'Перенесено постов: {moved}')
+
+
+reassign_group.short_description = 'Перенести в группу'
+reassign_group.allowed_permissions = ('change',)
+
+
+def clear_images(modeladmin, request, queryset):
+    cleared = bulk.clear_images(queryset)
+    modeladmin.message_user(request, f'Убрано картинок: {cleared}')
+
+
+clear_images.short_description = 'Убрать картинки'
+clear_images.allowed_permissions = ('change',)
+
+
+def confirm_bulk_deletion(modeladmin, request, queryset, related=None):
+    """Страница подтверждения с числом удаляемых строк, как у
+    delete_selected; повторно отправленная форма несёт post=yes."""
+    opts = modeladmin.model._meta
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'title': 'Подтверждение удаления',
+        'opts': opts,
+        'count': queryset.count(),
+        'related': related,
+        'action': request.POST.getlist('action')[
+            int(request.POST.get('index', 0))],
+        'select_across': request.POST.get('select_across') == '1',
+        'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+        'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        'media': modeladmin.media,
+    }
+    request.current_app = modeladmin.admin_site.name
+    return TemplateResponse(
+        request, 'admin/bulk_delete_confirmation.html', context)
+
+
+def delete_posts(modeladmin, request, queryset):
+    if not request.POST.get('post'):
+        return confirm_bulk_deletion(modeladmin, request, queryset,
+                                     'их комментарии')
+    deleted = bulk.delete_posts(queryset)
+    modeladmin.message_user(request, f'Удалено постов: {deleted}')
+
+
+delete_posts.short_description = 'Удалить выбранные посты'
+delete_posts.allowed_permissions = ('delete',)
+
+
+def delete_comments(modeladmin, request, queryset):
+    if not request.POST.get('post'):
+        return confirm_bulk_deletion(modeladmin, request, queryset)
+    deleted = bulk.delete_comments(queryset)
+    modeladmin.message_user(request, f'Удалено комментариев: {deleted}')
+
+
+delete_comments.short_description = 'Удалить выбранные комментарии'
+delete_comments.allowed_permissions = ('delete',)
+
+
+class BulkActionsAdmin(admin.ModelAdmin):
+    """Действия над выбранными строками выполняются порциями через
+    posts.bulk, без загрузки моделей; стандартное delete_selected,
+    удаляющее по одной строке с сигналами, отключено."""
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+class PostAdmin(BulkActionsAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = (reassign_group, clear_images, delete_posts)
+
+
+class CommentAdmin(BulkActionsAdmin):
+    actions = (delete_comments,)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    actions = (schedule_deletion,)
+
+
+class BackgroundDeletionUserAdmin(UserAdmin):
+    actions = (schedule_deletion,)
+
+
+class DeletionAdmin(admin.ModelAdmin):
+    list_display = ('label', 'kind', 'done', 'total', 'percent', 'created',
+                    'finished')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'object_id', 'label', 'total', 'done',
+                       'created', 'finished')
+
+    def percent(self, obj):
+        return f'{obj.progress:.0%}'
+
+    percent.short_description = 'Готово'
+
+    def has_add_permission(self, request):
+        return False
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow)
+admin.site.register(Deletion, DeletionAdmin)
+# Импорт django.contrib.auth.admin уже зарегистрировал User.
+admin.site.unregister(User)
+admin.site.register(User, BackgroundDeletionUserAdmin)
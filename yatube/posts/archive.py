@@ -0,0 +1,150 @@
+"""Архив постов по месяцам и дням.
+
+Для сайта, каждой группы и каждого автора ArchiveBucket хранит число
+постов и диапазон их id за месяц и за день. Корзины обновляются при
+записи постов, поэтому меню архива читается по уникальному индексу
+корзин, а страница архива — диапазоном первичного ключа постов.
+После удаления постов диапазон id может оказаться шире фактического,
+что не влияет на результат: выборка дополнительно ограничена датами.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import ArchiveBucket, Post
+
+
+def post_scopes(group_id, author_id):
+    scopes = [(ArchiveBucket.SITE, 0), (ArchiveBucket.AUTHOR, author_id)]
+    if group_id is not None:
+        scopes.append((ArchiveBucket.GROUP, group_id))
+    return scopes
+
+
+def _periods(pub_date):
+    local = timezone.localtime(pub_date)
+    return ((local.year, local.month, 0),
+            (local.year, local.month, local.day))
+
+
+def _apply(scope, scope_id, period, delta, min_id, max_id):
+    year, month, day = period
+    lookup = dict(scope=scope, scope_id=scope_id, year=year, month=month,
+                  day=day)
+    ArchiveBucket.objects.get_or_create(
+        **lookup, defaults={'min_id': min_id, 'max_id': max_id})
+    ArchiveBucket.objects.filter(**lookup).update(
+        post_count=F('post_count') + delta,
+        min_id=Least(F('min_id'), min_id),
+        max_id=Greatest(F('max_id'), max_id),
+    )
+
+
+def _record(entries):
+    """Применяет изменения (раздел, id раздела, пост, delta), сгруппировав
+    их по корзинам."""
+    changes = Counter()
+    bounds = {}
+    for scope, scope_id, post, delta in entries:
+        for period in _periods(post.pub_date):
+            key = (scope, scope_id, period)
+            changes[key] += delta
+            low, high = bounds.get(key, (post.id, post.id))
+            bounds[key] = (min(low, post.id), max(high, post.id))
+    with transaction.atomic():
+        for key, change in changes.items():
+            _apply(*key, change, *bounds[key])
+
+
+def record_posts(posts, delta=1):
+    """Учитывает появление (delta=1) или удаление (delta=-1) постов."""
+    _record(
+        (scope, scope_id, post, delta)
+        for post in posts
+        for scope, scope_id in post_scopes(post.group_id, post.author_id)
+    )
+
+
+def record_group_change(post, old_group_id):
+    """Переносит пост между архивами групп."""
+    entries = []
+    if old_group_id is not None:
+        entries.append((ArchiveBucket.GROUP, old_group_id, post, -1))
+    if post.group_id is not None:
+        entries.append((ArchiveBucket.GROUP, post.group_id, post, 1))
+    _record(entries)
+
+
+def record_group_moves(posts, group_id):
+    """Переносит посты из архивов их групп в архив группы group_id."""
+    entries = []
+    for post in posts:
+        if post.group_id is not None:
+            entries.append((ArchiveBucket.GROUP, post.group_id, post, -1))
+        if group_id is not None:
+            entries.append((ArchiveBucket.GROUP, group_id, post, 1))
+    _record(entries)
+
+
+def month_menu(scope, scope_id):
+    """Месяцы раздела с числом постов, новые сверху."""
+    return ArchiveBucket.objects.filter(
+        scope=scope, scope_id=scope_id, day=0, post_count__gt=0)
+
+
+def day_menu(scope, scope_id, year, month):
+    return ArchiveBucket.objects.filter(
+        scope=scope, scope_id=scope_id, year=year, month=month,
+        day__gt=0, post_count__gt=0).order_by('day')
+
+
+def period_posts(scope, scope_id, year, month, day=0):
+    """Посты периода и их число из корзины; (None, 0), если за период
+    постов не было."""
+    bucket = ArchiveBucket.objects.filter(
+        scope=scope, scope_id=scope_id, year=year, month=month, day=day,
+    ).first()
+    if bucket is None:
+        return None, 0
+    start = timezone.make_aware(datetime(year, month, day or 1))
+    if day:
+        end = start + timedelta(days=1)
+    else:
+        end = timezone.make_aware(
+            datetime(year + month // 12, month % 12 + 1, 1))
+    posts = Post.objects.filter(
+        id__range=(bucket.min_id, bucket.max_id),
+        pub_date__gte=start, pub_date__lt=end,
+    )
+    if scope == ArchiveBucket.GROUP:
+        posts = posts.filter(group_id=scope_id)
+    elif scope == ArchiveBucket.AUTHOR:
+        posts = posts.filter(author_id=scope_id)
+    return posts, bucket.post_count
+
+
+def rebuild_archive():
+    """Полностью пересчитывает корзины архива по таблице постов."""
+    with transaction.atomic():
+        ArchiveBucket.objects.all().delete()
+        buckets = {}
+        for post in Post.objects.order_by().only(
+                'id', 'pub_date', 'group', 'author').iterator():
+            for scope in post_scopes(post.group_id, post.author_id):
+                for period in _periods(post.pub_date):
+                    key = scope + period
+                    count, low, high = buckets.get(key, (0, post.id, post.id))
+                    buckets[key] = (count + 1, min(low, post.id),
+                                    max(high, post.id))
+        ArchiveBucket.objects.bulk_create(
+            (ArchiveBucket(scope=scope, scope_id=scope_id, year=year,
+                           month=month, day=day, post_count=count,
+                           min_id=low, max_id=high)
+             for (scope, scope_id, year, month, day), (count, low, high)
+             in buckets.items()),
+            batch_size=500,
+        )
@@ -0,0 +1,174 @@
+"""Учёт ссылок на картинки и отложенное удаление ненужных файлов.
+
+Один файл может принадлежать многим постам, поэтому удалять его вместе
+с постом нельзя. Сигналы постов увеличивают ImageBlob.refcount при
+появлении ссылки на файл с именем из хеша и уменьшают при её
+исчезновении. Имена заменённых и удалённых картинок записываются
+в ImageDeletion в той же транзакции, что и изменение поста: откат
+транзакции отменяет и запись. После фиксации purge_images() удаляет
+файлы, на которые больше никто не ссылается, вместе с миниатюрами;
+записи, оставшиеся после сбоя, дочищает команда reconcile_images.
+
+Загрузка файла, который уже лежит на диске, не пишет его заново, а
+ссылку пост возьмёт только при сохранении. Чтобы purge_images() не
+удалил файл в этом промежутке, хранилище до проверки наличия файла
+вызывает lease(): файл с ImageBlob.leased_at моложе IMAGE_LEASE не
+удаляется, его запись в очереди ждёт следующего прохода. Решение об
+удалении принимает один DELETE по ImageBlob, и файл удаляется в той же
+транзакции, поэтому lease() и purge_images() не пересекаются.
+"""
+import itertools
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import ImageBlob, ImageDeletion, Post
+from .storage import is_content_addressed
+
+PURGE_BATCH_SIZE = 500
+IMAGE_LEASE = 15 * 60
+
+
+def _counted(names):
+    return Counter(name for name in names if is_content_addressed(name))
+
+
+def retain(names):
+    """Учитывает новые ссылки на файлы names."""
+    with transaction.atomic():
+        for name, count in _counted(names).items():
+            ImageBlob.objects.get_or_create(name=name)
+            ImageBlob.objects.filter(name=name).update(
+                refcount=F('refcount') + count)
+
+
+def release(names):
+    """Снимает ссылки на файлы names и ставит их в очередь на удаление."""
+    names = [name for name in names if name]
+    if not names:
+        return
+    with transaction.atomic():
+        for name, count in _counted(names).items():
+            ImageBlob.objects.filter(name=name).update(
+                refcount=Greatest(F('refcount') - count, 0))
+        ImageDeletion.objects.bulk_create(
+            (ImageDeletion(name=name) for name in set(names)),
+            ignore_conflicts=True,
+        )
+    if getattr(settings, 'POSTS_PURGE_IMAGES_ON_COMMIT', True):
+        transaction.on_commit(lambda: purge_images(names))
+
+
+def lease(names):
+    """Защищает файлы names от удаления на IMAGE_LEASE секунд: их только
+    что загрузили, и пост ещё не сохранил ссылку."""
+    now = timezone.now()
+    for name in set(_counted(names)):
+        with transaction.atomic():
+            blob, created = ImageBlob.objects.get_or_create(
+                name=name, defaults={'leased_at': now})
+            if not created:
+                ImageBlob.objects.filter(id=blob.id).update(leased_at=now)
+
+
+def _purge_blob(name):
+    """Удаляет запись файла без ссылок и без свежей загрузки. True, если
+    файл можно удалять; None, если его держит lease()."""
+    ImageBlob.objects.get_or_create(name=name)
+    cutoff = timezone.now() - timedelta(seconds=IMAGE_LEASE)
+    deleted, _ = ImageBlob.objects.filter(
+        Q(leased_at__isnull=True) | Q(leased_at__lt=cutoff),
+        name=name, refcount=0).delete()
+    if deleted:
+        return True
+    if ImageBlob.objects.filter(name=name, refcount__gt=0).exists():
+        return False
+    return None
+
+
+def is_referenced(name):
+    if is_content_addressed(name):
+        return ImageBlob.objects.filter(name=name, refcount__gt=0).exists()
+    return Post.objects.filter(image=name).exists()
+
+
+def delete_image(name):
+    """Удаляет файл картинки и её миниатюры. Имена вне хранилища
+    (абсолютные пути) пропускаются."""
+    field = Post._meta.get_field('image')
+    try:
+        delete_thumbnails(field.attr_class(None, field, name))
+    except SuspiciousFileOperation:
+        pass
+
+
+def purge_images(names=None, batch_size=PURGE_BATCH_SIZE):
+    """Разбирает очередь удаления (целиком или только names) порциями.
+    Возвращает число удалённых файлов."""
+    pending = ImageDeletion.objects.order_by('id')
+    if names is not None:
+        pending = pending.filter(name__in=set(names))
+    deleted = 0
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id).values_list(
+            'id', 'name')[:batch_size])
+        if not batch:
+            return deleted
+        last_id = batch[-1][0]
+        for entry_id, name in batch:
+            with transaction.atomic():
+                if is_content_addressed(name):
+                    orphaned = _purge_blob(name)
+                else:
+                    orphaned = not is_referenced(name)
+                if orphaned is None:
+                    continue
+                ImageDeletion.objects.filter(id=entry_id).delete()
+                if orphaned:
+                    # Внутри транзакции: lease() ждёт её фиксации и
+                    # после неё увидит, что файла нет.
+                    delete_image(name)
+                    deleted += 1
+
+
+def _scan(storage, directory):
+    """Имена файлов каталога хранилища, обходя его без полного списка
+    в памяти."""
+    try:
+        entries = os.scandir(storage.path(directory))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f'{directory}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan(storage, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat().st_mtime
+
+
+def find_orphans(directory='posts', min_age=3600,
+                 batch_size=PURGE_BATCH_SIZE):
+    """Файлы каталога, на которые не ссылается ни один пост. Файлы
+    моложе min_age секунд пропускаются: их пост может быть ещё не
+    сохранён. Имена сверяются с Post.image порциями по индексу."""
+    storage = Post._meta.get_field('image').storage
+    files = (name for name, mtime in _scan(storage, directory)
+             if mtime < time.time() - min_age)
+    while True:
+        batch = list(itertools.islice(files, batch_size))
+        if not batch:
+            return
+        referenced = set(Post.objects.filter(image__in=batch).values_list(
+            'image', flat=True))
+        yield from (name for name in batch if name not in referenced)
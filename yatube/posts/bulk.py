@@ -0,0 +1,98 @@
+"""Массовые изменения постов и комментариев.
+
+Действия админки над тысячами строк (в том числе над «всеми N
+подходящими») не загружают модели и не сохраняют их по одной. Строки
+выбираются порциями по BULK_BATCH_SIZE в порядке id через values_list(),
+и каждая порция в своей транзакции меняется одним update() или удаляется
+без сборщика Django. Вместо post_save и post_delete на каждую строку
+после порции отправляется один сигнал posts_bulk_updated,
+posts_bulk_deleted или comments_bulk_deleted; его получатели в signals
+разом поправляют статистику групп, архив, окна лент, ссылки на
+картинки и кеши.
+"""
+from django.db import transaction
+
+from .models import (Comment, Post, TrendingPost, comments_bulk_deleted,
+                     posts_bulk_deleted, posts_bulk_updated)
+
+BULK_BATCH_SIZE = 500
+
+POST_ROW_FIELDS = ('id', 'author_id', 'group_id', 'pub_date', 'image')
+
+
+class PostRow:
+    """Поля поста, нужные получателям сигналов массовых изменений."""
+
+    __slots__ = ('id', 'author_id', 'group_id', 'pub_date', 'image_name')
+
+    def __init__(self, post_id, author_id, group_id, pub_date, image_name):
+        self.id = post_id
+        self.author_id = author_id
+        self.group_id = group_id
+        self.pub_date = pub_date
+        self.image_name = image_name
+
+
+def _in_batches(queryset, fields, batch_size, apply):
+    """Вызывает apply(строки) для порций values_list(*fields) queryset
+    по возрастанию id; первое поле — id. Возвращает число строк."""
+    queryset = queryset.order_by('id').values_list(*fields)
+    last_id = 0
+    processed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not rows:
+                return processed
+            apply(rows)
+        last_id = rows[-1][0]
+        processed += len(rows)
+
+
+def _update_posts(queryset, changes, batch_size):
+    def apply(rows):
+        rows = [PostRow(*row) for row in rows]
+        Post.objects.filter(id__in=[row.id for row in rows]).update(**changes)
+        posts_bulk_updated.send(sender=Post, rows=rows, changes=changes)
+
+    return _in_batches(queryset, POST_ROW_FIELDS, batch_size, apply)
+
+
+def reassign_group(queryset, group, batch_size=BULK_BATCH_SIZE):
+    """Переносит посты queryset в группу group (None — убирает из
+    группы)."""
+    return _update_posts(queryset, {'group_id': getattr(group, 'id', None)},
+                         batch_size)
+
+
+def clear_images(queryset, batch_size=BULK_BATCH_SIZE):
+    """Убирает картинки у постов queryset."""
+    return _update_posts(queryset.exclude(image=''), {'image': ''},
+                         batch_size)
+
+
+def delete_posts(queryset, batch_size=BULK_BATCH_SIZE):
+    """Удаляет посты queryset вместе с их комментариями."""
+    def apply(rows):
+        rows = [PostRow(*row) for row in rows]
+        ids = [row.id for row in rows]
+        # _raw_delete() — удаление одним DELETE без сборщика, который
+        # при наличии получателей pre_delete загружает каждую строку.
+        for model in (Comment, TrendingPost):
+            model.objects.filter(post_id__in=ids)._raw_delete(queryset.db)
+        Post.objects.filter(id__in=ids)._raw_delete(queryset.db)
+        posts_bulk_deleted.send(sender=Post, rows=rows)
+
+    return _in_batches(queryset, POST_ROW_FIELDS, batch_size, apply)
+
+
+def delete_comments(queryset, batch_size=BULK_BATCH_SIZE):
+    """Удаляет комментарии queryset."""
+    def apply(rows):
+        Comment.objects.filter(
+            id__in=[comment_id for comment_id, _ in rows])._raw_delete(
+            queryset.db)
+        comments_bulk_deleted.send(
+            sender=Comment, post_ids={post_id for _, post_id in rows})
+
+    return _in_batches(queryset, ('id', 'post_id'), batch_size, apply)
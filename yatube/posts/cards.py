@@ -0,0 +1,152 @@
+"""Карточки постов в лентах.
+
+Карточка — автор, дата, картинка, начало текста и ссылки — выводится
+в цикле каждой ленты. Разметка карточки — шаблоны LAYOUTS (с include
+author_card.html и post_excerpt.html); CardRenderer компилирует их один
+раз на процесс и рендерит с обычным Context, а вместо {% url %} на
+каждый пост передаёт готовые URL: префиксы URL вычисляются один раз на
+рендер страницы. В шаблонах карточку выводит тег {% post_card %}
+(библиотека post_cards), render() собирает список карточек целиком.
+Готовые карточки кешируются, см. CardRenderer.
+"""
+import logging
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.template import Context, engines
+from django.urls import reverse
+from django.utils import formats, timezone
+from django.utils.html import conditional_escape
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from .page_cache import post_versions
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+DATE_FORMAT = 'd E Y'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Шаблоны карточек: главная (а также популярное и подписки), страница
+# группы (и архив) и профиль.
+LAYOUTS = {
+    'index': 'posts/includes/cards/feed.html',
+    'group': 'posts/includes/cards/feed.html',
+    'profile': 'posts/includes/cards/profile.html',
+}
+# Место разделителя <hr> в закешированной карточке.
+SEPARATOR = mark_safe('<!-- separator -->')
+
+_templates = {}
+
+
+def card_template(layout):
+    """Скомпилированный шаблон карточки. Шаблоны компилируются при первом
+    рендере, а не при импорте: модуль импортируется библиотекой тегов во
+    время создания движка шаблонов."""
+    name = LAYOUTS[layout]
+    if name not in _templates:
+        _templates[name] = engines['django'].engine.get_template(name)
+    return _templates[name]
+
+
+URL_SENTINEL = 987654321
+
+
+def url_builder(name):
+    """Функция, строящая URL маршрута с одним аргументом по префиксу и
+    суффиксу, вычисленным одним reverse(). Аргумент экранируется так
+    же, как в reverse()."""
+    prefix, suffix = reverse(name, args=(URL_SENTINEL,)).rsplit(
+        str(URL_SENTINEL), 1)
+    safe = RFC3986_SUBDELIMS + '/~:@'
+    return lambda value: conditional_escape(
+        prefix + quote(str(value), safe=safe) + suffix)
+
+
+def thumbnail_url(image):
+    """URL миниатюры как у тега {% thumbnail %}; пустая строка без
+    картинки или при ошибке."""
+    if not image:
+        return ''
+    try:
+        return conditional_escape(get_thumbnail(
+            image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS).url)
+    except Exception:
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось построить миниатюру %s', image)
+        return ''
+
+
+class CardRenderer:
+    """Рендер карточек одной страницы.
+
+    Карточка кешируется с меткой SEPARATOR вместо <hr> по id поста и версиям
+    поста, автора и группы из page_cache: правка поста, имени автора или
+    группы меняет версию, и карточка рендерится заново. Карточки
+    страницы берутся из кеша одним get_many, рендерятся только промахи.
+    """
+
+    def __init__(self, layout='index'):
+        self.name = layout
+        self.template = card_template(layout)
+        self.detail_url = url_builder('posts:post_detail')
+        self.profile_url = url_builder('posts:profile')
+        self.group_url = url_builder('posts:group_list')
+        self.dates = {}
+        self.heads = {}
+
+    def date(self, pub_date):
+        pub_date = timezone.template_localtime(pub_date)
+        day = pub_date.date()
+        if day not in self.dates:
+            self.dates[day] = conditional_escape(
+                formats.date_format(pub_date, DATE_FORMAT))
+        return self.dates[day]
+
+    def render_head(self, post):
+        return self.template.render(Context({
+            'post': post,
+            'profile_url': self.profile_url(post.author),
+            'date': self.date(post.pub_date),
+            'detail_url': self.detail_url(post.id),
+            'image_url': thumbnail_url(post.image),
+            'group_url': self.group_url(post.group.slug)
+            if post.group else '',
+            'separator': SEPARATOR,
+        }))
+
+    def prefetch(self, posts):
+        """Берёт карточки постов из кеша и рендерит недостающие."""
+        posts = [post for post in posts if post.id not in self.heads]
+        if not posts:
+            return
+        versions = post_versions(posts)
+        keys = {post.id: f'post-card:{self.name}:{post.id}:{versions[post.id]}'
+                for post in posts}
+        found = cache.get_many(keys.values())
+        missing = {}
+        for post in posts:
+            key = keys[post.id]
+            if key not in found:
+                found[key] = missing[key] = self.render_head(post)
+            self.heads[post.id] = found[key]
+        if missing:
+            cache.set_many(missing, CARD_CACHE_TIMEOUT)
+
+    def card(self, post, last):
+        self.prefetch([post])
+        return mark_safe(
+            self.heads[post.id].replace(SEPARATOR, '' if last else '<hr>'))
+
+    def render(self, posts):
+        posts = list(posts)
+        self.prefetch(posts)
+        return mark_safe(''.join(
+            self.card(post, number == len(posts) - 1)
+            for number, post in enumerate(posts)))
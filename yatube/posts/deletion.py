@@ -0,0 +1,170 @@
+"""Фоновое удаление пользователей и групп с большим числом зависимых
+строк.
+
+Обычное удаление собирает все каскадные строки в память и держит одну
+длинную транзакцию записи, а SQLite на это время блокирует всю базу.
+schedule() вместо этого сразу создаёт Deletion: объект скрывается со
+страниц (hidden_ids()), пользователь деактивируется. Команда
+process_deletions затем удаляет зависимые строки порциями по
+DELETION_BATCH_SIZE, каждая порция — в своей короткой транзакции,
+и ведёт счётчик удалённых строк. Последним удаляется сам объект.
+
+Пользователь: сначала его комментарии и подписки, затем посты через
+delete() (сигналы поправляют статистику групп, архив, окна лент и
+ссылки на картинки), затем он сам. Группа: посты отвязываются
+update(group=None) порциями — на таблице постов это SET_NULL, — кеши
+этих постов сбрасываются, затем удаляются корзины архива группы и она
+сама.
+
+Посты скрытого автора исключаются из лент и окон timelines через
+visible() (закешированное окно с такими постами сбрасывается при первом
+чтении), его профиль и посты отдают 404, на него нельзя подписаться,
+его посты нельзя комментировать, а его комментарии пропадают из
+фрагментов постов. Посты удаляемой группы остаются в лентах, пока их не
+отвяжут; страница группы сразу отдаёт 404, а в форме поста её выбрать
+нельзя. Набор скрытых id кешируется на HIDDEN_TIMEOUT секунд.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (ArchiveBucket, Comment, Deletion, Follow, Group, Post,
+                     User)
+from .object_cache import posts_by_id
+from .page_cache import bump
+
+DELETION_BATCH_SIZE = 100
+HIDDEN_KEY = 'deletions:hidden'
+# Другие процессы со своим кешем узнают о новом удалении не позже чем
+# через столько секунд.
+HIDDEN_TIMEOUT = 30
+
+
+def hidden_ids(kind):
+    """id объектов вида kind, удаление которых ещё не завершено."""
+    hidden = cache.get(HIDDEN_KEY)
+    if hidden is None:
+        hidden = {Deletion.USER: set(), Deletion.GROUP: set()}
+        for deletion_kind, object_id in Deletion.objects.filter(
+                finished__isnull=True).values_list('kind', 'object_id'):
+            hidden[deletion_kind].add(object_id)
+        cache.set(HIDDEN_KEY, hidden, HIDDEN_TIMEOUT)
+    return hidden[kind]
+
+
+def _forget_hidden():
+    transaction.on_commit(lambda: cache.delete(HIDDEN_KEY))
+    cache.delete(HIDDEN_KEY)
+
+
+def visible(posts):
+    """Посты без постов удаляемых авторов."""
+    authors = hidden_ids(Deletion.USER)
+    if authors:
+        posts = posts.exclude(author_id__in=authors)
+    return posts
+
+
+def _user_rows(user_id):
+    return {
+        'comments': Comment.objects.filter(author_id=user_id),
+        'follows': Follow.objects.filter(user_id=user_id),
+        'followers': Follow.objects.filter(author_id=user_id),
+        'posts': Post.objects.filter(author_id=user_id),
+    }
+
+
+def _group_rows(group_id):
+    return {'posts': Post.objects.filter(group_id=group_id)}
+
+
+def schedule(obj):
+    """Скрывает пользователя или группу и ставит их удаление в очередь."""
+    if isinstance(obj, Group):
+        kind, rows = Deletion.GROUP, _group_rows(obj.id)
+    else:
+        kind, rows = Deletion.USER, _user_rows(obj.id)
+    with transaction.atomic():
+        deletion, created = Deletion.objects.get_or_create(
+            kind=kind, object_id=obj.id,
+            defaults={'label': str(obj)[:200],
+                      'total': sum(queryset.count()
+                                   for queryset in rows.values())})
+        if kind == Deletion.USER and obj.is_active:
+            obj.is_active = False
+            obj.save(update_fields=['is_active'])
+        if kind == Deletion.USER:
+            # Комментарии пользователя лежат во фрагментах чужих постов.
+            commented = set(Comment.objects.filter(
+                author_id=obj.id).values_list('post_id', flat=True))
+            transaction.on_commit(lambda: bump('post', *commented))
+        _forget_hidden()
+    return deletion
+
+
+def _delete_batch(queryset, batch_size):
+    ids = list(queryset.order_by().values_list('id', flat=True)[:batch_size])
+    if ids:
+        queryset.model.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def _detach_batch(queryset, batch_size):
+    """Отвязывает порцию постов от группы в обход сигналов и сбрасывает
+    их кеши."""
+    ids = list(queryset.order_by().values_list('id', flat=True)[:batch_size])
+    if ids:
+        Post.objects.filter(id__in=ids).update(group=None)
+        transaction.on_commit(lambda: (
+            posts_by_id.forget(ids), bump('post', *ids)))
+    return len(ids)
+
+
+def _finish(deletion):
+    if deletion.kind == Deletion.USER:
+        User.objects.filter(id=deletion.object_id).delete()
+    else:
+        ArchiveBucket.objects.filter(
+            scope=ArchiveBucket.GROUP, scope_id=deletion.object_id).delete()
+        Group.objects.filter(id=deletion.object_id).delete()
+    deletion.finished = timezone.now()
+    deletion.save(update_fields=['finished'])
+    _forget_hidden()
+
+
+def run_step(deletion, batch_size=DELETION_BATCH_SIZE):
+    """Удаляет одну порцию зависимых строк или, если их не осталось,
+    сам объект. Возвращает число обработанных строк; 0 — удаление
+    завершено."""
+    if deletion.kind == Deletion.USER:
+        rows, step = _user_rows(deletion.object_id), _delete_batch
+    else:
+        rows, step = _group_rows(deletion.object_id), _detach_batch
+    with transaction.atomic():
+        for queryset in rows.values():
+            processed = step(queryset, batch_size)
+            if processed:
+                Deletion.objects.filter(id=deletion.id).update(
+                    done=deletion.done + processed)
+                deletion.done += processed
+                return processed
+        _finish(deletion)
+    return 0
+
+
+def run(deletion, batch_size=DELETION_BATCH_SIZE, pause=0, progress=None):
+    """Выполняет удаление до конца. Между порциями ждёт pause секунд,
+    чтобы дать записать другим; progress(deletion) вызывается после
+    каждой порции."""
+    while run_step(deletion, batch_size):
+        if progress is not None:
+            progress(deletion)
+        time.sleep(pause)
+    if progress is not None:
+        progress(deletion)
+
+
+def pending():
+    return Deletion.objects.filter(finished__isnull=True).order_by('created')
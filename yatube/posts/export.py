@@ -0,0 +1,108 @@
+"""Потоковая выгрузка постов и комментариев пользователя.
+
+Строки читаются из базы порциями через .iterator() и сразу
+превращаются в CSV или JSONL, поэтому память не зависит от числа
+записей автора. Архив zip тоже пишется потоком: zipfile умеет писать
+в объект без seek(), а картинки копируются в него кусками.
+"""
+import csv
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+FIELDS = {
+    'posts': ('id', 'pub_date', 'group__slug', 'text', 'image'),
+    'comments': ('id', 'post_id', 'created', 'text'),
+}
+
+
+def rows(author, kind):
+    """Строки выгрузки выбранного вида в виде словарей."""
+    if kind == 'posts':
+        queryset = Post.objects.filter(author=author).order_by('id')
+    else:
+        queryset = Comment.objects.filter(author=author).order_by('id')
+    return queryset.values(*FIELDS[kind]).iterator(chunk_size=CHUNK_SIZE)
+
+
+class Echo:
+    """Файлоподобный объект, который возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(author, kind):
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS[kind])
+    for row in rows(author, kind):
+        yield writer.writerow(row[field] for field in FIELDS[kind])
+
+
+def jsonl_lines(author, kinds=('posts', 'comments')):
+    for kind in kinds:
+        for row in rows(author, kind):
+            row['type'] = kind[:-1]
+            yield json.dumps(row, cls=DjangoJSONEncoder,
+                             ensure_ascii=False) + '\n'
+
+
+class ZipStream:
+    """Приёмник для zipfile без seek(): копит байты до выдачи наружу."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Выдаёт накопленные байты, если они есть."""
+        if self.chunks:
+            data = b''.join(self.chunks)
+            self.chunks = []
+            yield data
+
+
+def zip_chunks(author, with_images=True):
+    """Архив с posts.jsonl, comments.jsonl и, по желанию, картинками."""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w',
+                         compression=zipfile.ZIP_DEFLATED) as archive:
+        for kind in ('posts', 'comments'):
+            with archive.open(f'{kind}.jsonl', mode='w',
+                              force_zip64=True) as entry:
+                for line in jsonl_lines(author, (kind,)):
+                    entry.write(line.encode())
+                    yield from stream.drain()
+        if with_images:
+            images = Post.objects.filter(author=author).exclude(
+                image='').order_by('id').values_list('image', flat=True)
+            storage = Post._meta.get_field('image').storage
+            for name in images.iterator(chunk_size=CHUNK_SIZE):
+                if not storage.exists(name):
+                    continue
+                info = zipfile.ZipInfo(f'images/{name}')
+                info.compress_type = zipfile.ZIP_STORED
+                with storage.open(name) as source, \
+                        archive.open(info, mode='w') as entry:
+                    for chunk in iter(
+                            lambda: source.read(FILE_CHUNK_SIZE), b''):
+                        entry.write(chunk)
+                        yield from stream.drain()
+    yield from stream.drain()
@@ -0,0 +1,94 @@
+"""Облегчённые строки ленты постов.
+
+Шаблонам ленты нужны несколько полей поста, имя автора и slug группы.
+feed_rows() выбирает ровно эти столбцы через values_list() и собирает
+из них объекты со __slots__ вместо экземпляров Post, User и Group
+с их _state и всеми полями. Атрибуты строк повторяют то, к чему
+обращаются шаблоны (post.author.get_full_name, post.group.slug,
+post.image), поэтому одни и те же шаблоны работают и со строками,
+и с моделями. page_obj в контексте остаётся ленивой страницей постов:
+если к ней не обращаются, запрос за моделями не выполняется.
+"""
+from .models import Post
+
+FEED_FIELDS = (
+    'id', 'pub_date', 'excerpt', 'text_length', 'image', 'author_id',
+    'group_id', 'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title',
+)
+
+
+class AuthorRow:
+    __slots__ = ('username', 'first_name', 'last_name')
+
+    def __init__(self, username, first_name, last_name):
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow:
+    __slots__ = ('slug', 'title')
+
+    def __init__(self, slug, title):
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class FeedRow:
+    __slots__ = ('id', 'pub_date', 'excerpt', 'text_length', 'image_name',
+                 'author_id', 'group_id', 'author', 'group')
+
+    def __init__(self, post_id, pub_date, excerpt, text_length, image_name,
+                 author_id, group_id, author, group):
+        self.id = post_id
+        self.pub_date = pub_date
+        self.excerpt = excerpt
+        self.text_length = text_length
+        self.image_name = image_name
+        self.author_id = author_id
+        self.group_id = group_id
+        self.author = author
+        self.group = group
+
+    @property
+    def is_truncated(self):
+        return self.text_length > len(self.excerpt)
+
+    @property
+    def image(self):
+        """Файл картинки в хранилище Post.image, как у модели."""
+        field = Post._meta.get_field('image')
+        return field.attr_class(None, field, self.image_name)
+
+
+def feed_rows(queryset):
+    """Строки ленты для постов queryset; авторы и группы с одинаковыми
+    значениями разделяются между строками."""
+    authors = {}
+    groups = {}
+    rows = []
+    for (post_id, pub_date, excerpt, text_length, image, author_id, group_id,
+         username, first_name, last_name, slug, title) in (
+            queryset.values_list(*FEED_FIELDS)):
+        author = authors.get(username)
+        if author is None:
+            author = authors[username] = AuthorRow(username, first_name,
+                                                   last_name)
+        group = None
+        if slug is not None:
+            group = groups.get(slug)
+            if group is None:
+                group = groups[slug] = GroupRow(slug, title)
+        rows.append(FeedRow(post_id, pub_date, excerpt, text_length, image,
+                            author_id, group_id, author, group))
+    return rows
@@ -1,6 +1,7 @@
 from django import forms
 
-from .models import Comment, Post
+from .deletion import hidden_ids
+from .models import Comment, Deletion, Post
 
 
 class PostForm(forms.ModelForm):
@@ -19,6 +20,13 @@ class PostForm(forms.ModelForm):
             'image': 'Загрузите картинку'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        hidden = hidden_ids(Deletion.GROUP) - {self.instance.group_id}
+        if hidden:
+            self.fields['group'].queryset = self.fields[
+                'group'].queryset.exclude(id__in=hidden)
+
 
 class CommentForm(forms.ModelForm):
     """Форма комментария"""
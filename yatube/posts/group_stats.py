@@ -0,0 +1,155 @@
+"""Сводная статистика групп.
+
+GroupStats и GroupAuthorStats обновляются сигналами при каждом сохранении
+и удалении поста, поэтому каталог групп и счётчики страниц группы не
+требуют агрегатов по Post. Посты из Post.objects.bulk_create()
+учитываются по сигналу posts_bulk_created, массовые изменения из
+posts.bulk — по posts_bulk_updated и posts_bulk_deleted; прочие
+изменения в обход сигналов (например, update()) исправляет
+rebuild_group_stats(). Счётчики не опускаются ниже нуля, даже если
+разошлись с таблицей постов.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import (Case, Count, DateTimeField, F, Max, Q, Value,
+                              When)
+from django.db.models.functions import Greatest
+
+from .models import Group, GroupAuthorStats, GroupStats, Post
+
+TOP_AUTHORS = 3
+
+
+def _refresh_top_authors(group_id):
+    top = GroupAuthorStats.objects.filter(
+        group_id=group_id, post_count__gt=0,
+    ).order_by('-post_count', 'author_id').values_list(
+        'author_id', flat=True)[:TOP_AUTHORS]
+    GroupStats.objects.filter(group_id=group_id).update(
+        top_author_ids=','.join(map(str, top)))
+
+
+def _refresh_last_post(group_id, removed_ids=()):
+    last = Post.objects.filter(group_id=group_id).exclude(
+        id__in=removed_ids).aggregate(last=Max('pub_date'))['last']
+    GroupStats.objects.filter(group_id=group_id).update(last_post_at=last)
+
+
+def _top_authors_changed(group_id, author_id, delta):
+    """Может ли изменение счётчика автора на delta изменить тройку
+    самых активных авторов группы."""
+    top = GroupStats.objects.filter(group_id=group_id).values_list(
+        'top_author_ids', flat=True).first()
+    top = [int(top_id) for top_id in top.split(',') if top_id] if top else []
+    if author_id in top:
+        return True
+    if delta < 0:
+        return False
+    if len(top) < TOP_AUTHORS:
+        return True
+    # Автор входит в тройку, если обходит последнего из неё
+    # в порядке _refresh_top_authors.
+    counts = dict(GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id__in=(author_id, top[-1]),
+    ).values_list('author_id', 'post_count'))
+    return ((counts.get(author_id, 0), -author_id)
+            > (counts.get(top[-1], 0), -top[-1]))
+
+
+def _update_or_create(model, lookup, **changes):
+    if not model.objects.filter(**lookup).update(**changes):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def apply_post_delta(group_id, author_id, delta, pub_date=None,
+                     removed_ids=()):
+    """Учитывает появление (delta > 0) или исчезновение (delta < 0)
+    постов автора в группе; pub_date — самая поздняя из их дат.
+
+    Если исчезает пост не старше последнего поста группы, дата последнего
+    поста пересчитывается по таблице постов без removed_ids (постов, ещё
+    не удалённых из базы). Самые активные авторы пересчитываются, только
+    если автор в них входит или может войти.
+    """
+    if group_id is None:
+        return
+    changes = {'post_count': Greatest(F('post_count') + delta, 0)}
+    if delta > 0 and pub_date is not None:
+        changes['last_post_at'] = Case(
+            When(Q(last_post_at__isnull=True) | Q(last_post_at__lt=pub_date),
+                 then=Value(pub_date, output_field=DateTimeField())),
+            default=F('last_post_at'),
+        )
+    with transaction.atomic():
+        _update_or_create(GroupStats, {'group_id': group_id}, **changes)
+        _update_or_create(
+            GroupAuthorStats, {'group_id': group_id, 'author_id': author_id},
+            post_count=Greatest(F('post_count') + delta, 0))
+        if delta < 0 and (pub_date is None or GroupStats.objects.filter(
+                group_id=group_id, last_post_at__lte=pub_date).exists()):
+            _refresh_last_post(group_id, removed_ids)
+        if _top_authors_changed(group_id, author_id, delta):
+            _refresh_top_authors(group_id)
+
+
+def _apply_posts(posts, group_of, sign):
+    counts = Counter()
+    latest = {}
+    for post in posts:
+        key = (group_of(post), post.author_id)
+        counts[key] += 1
+        if post.pub_date and (key not in latest
+                              or latest[key] < post.pub_date):
+            latest[key] = post.pub_date
+    for (group_id, author_id), count in counts.items():
+        apply_post_delta(group_id, author_id, sign * count,
+                         latest.get((group_id, author_id)))
+
+
+def apply_bulk_created(posts):
+    """Учитывает посты, созданные через bulk_create()."""
+    _apply_posts(posts, lambda post: post.group_id, 1)
+
+
+def apply_bulk_removed(posts):
+    """Учитывает исчезновение постов из их групп (уже удалённых или
+    перенесённых в базе)."""
+    _apply_posts(posts, lambda post: post.group_id, -1)
+
+
+def apply_bulk_moved(posts, group_id):
+    """Учитывает перенос постов из их групп в группу group_id."""
+    apply_bulk_removed(posts)
+    _apply_posts(posts, lambda post: group_id, 1)
+
+
+def rebuild_group_stats():
+    """Полностью пересчитывает статистику по таблице постов."""
+    with transaction.atomic():
+        GroupAuthorStats.objects.all().delete()
+        GroupStats.objects.all().delete()
+        totals = Post.objects.filter(group__isnull=False).order_by().values(
+            'group_id').annotate(count=Count('id'), last=Max('pub_date'))
+        GroupStats.objects.bulk_create(
+            GroupStats(group_id=row['group_id'], post_count=row['count'],
+                       last_post_at=row['last'])
+            for row in totals
+        )
+        GroupStats.objects.bulk_create(
+            GroupStats(group_id=group_id)
+            for group_id in Group.objects.filter(
+                stats__isnull=True).values_list('id', flat=True)
+        )
+        per_author = Post.objects.filter(group__isnull=False).order_by(
+        ).values('group_id', 'author_id').annotate(count=Count('id'))
+        GroupAuthorStats.objects.bulk_create(
+            (GroupAuthorStats(group_id=row['group_id'],
+                              author_id=row['author_id'],
+                              post_count=row['count'])
+             for row in per_author.iterator()),
+            batch_size=500,
+        )
+        for group_id in GroupStats.objects.values_list('group_id', flat=True):
+            _refresh_top_authors(group_id)
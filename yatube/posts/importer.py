@@ -0,0 +1,300 @@
+"""Пакетный импорт постов из JSONL.
+
+Каждая строка файла — пост:
+
+    {"author": "leo", "group": {"slug": "cats", "title": "Коты"},
+     "text": "...", "pub_date": "2021-05-01T10:00:00+00:00",
+     "image": "images/1.jpg",
+     "comments": [{"author": "kate", "text": "...",
+                   "created": "2021-05-01T11:00:00+00:00"}]}
+
+group может быть строкой со slug, pub_date, created, image и comments
+необязательны. Строки читаются порциями по batch_size. Для порции одним
+запросом находятся существующие пользователи и группы, недостающие
+создаются через bulk_create. Картинки обрабатываются в пуле процессов,
+затем посты и комментарии создаются через bulk_create в одной транзакции
+вместе с контрольной точкой. Поэтому прерванный импорт продолжается
+с первой незафиксированной строки. Даты из файла записываются в
+созданные строки отдельным UPDATE (restore_dates()): auto_now_add полей
+при вставке не отключается. Строки, которые не разбираются как пост,
+пропускаются и попадают в Importer.rejected.
+"""
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from .blobs import lease
+from .models import (Comment, Group, ImportCheckpoint, Post, assign_bulk_ids,
+                     restore_dates)
+from .storage import blob_name
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+MAX_IMAGE_SIDE = 1920
+IMAGE_UPLOAD_TO = 'posts/'
+LOOKUP_CHUNK_SIZE = 500
+
+
+def ingest_image(source, media_root, upload_to=IMAGE_UPLOAD_TO):
+    """Проверяет картинку, уменьшает слишком большие и сохраняет её под
+    именем из хеша содержимого, как ContentAddressedStorage. Выполняется
+    в процессе пула, поэтому не обращается к базе. Возвращает имя файла
+    или None."""
+    try:
+        with open(source, 'rb') as file:
+            content = file.read()
+        with Image.open(source) as image:
+            image.verify()
+        with Image.open(source) as image:
+            extension = (image.format or 'jpeg').lower()
+            if max(image.size) > MAX_IMAGE_SIDE:
+                image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+                buffer = io.BytesIO()
+                image.save(buffer, format=image.format)
+                content = buffer.getvalue()
+        name = blob_name(hashlib.sha256(content).hexdigest(),
+                         f'{upload_to}image.{extension}')
+        destination = os.path.join(media_root, name)
+        if not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(destination, 'wb') as file:
+                file.write(content)
+        return name
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def _moment(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _check(record, date_field):
+    """Проверяет, что запись поста или комментария можно загрузить."""
+    if not isinstance(record, dict):
+        raise ValueError('ожидался объект')
+    for key in ('author', 'text'):
+        if not isinstance(record.get(key), str):
+            raise ValueError(f'нет поля {key}')
+    if record.get(date_field) and parse_datetime(record[date_field]) is None:
+        raise ValueError(f'неверная дата {date_field}')
+
+
+def _check_post(record):
+    """Проверяет запись поста вместе с группой, картинкой и
+    комментариями."""
+    _check(record, 'pub_date')
+    group = record.get('group')
+    if isinstance(group, dict):
+        for key in ('slug', 'title', 'description'):
+            if not isinstance(group.get(key, ''), str):
+                raise ValueError(f'неверное поле группы {key}')
+    elif group is not None and not isinstance(group, str):
+        raise ValueError('неверная группа')
+    if record.get('image') and not isinstance(record['image'], str):
+        raise ValueError('неверная картинка')
+    comments = record.get('comments', [])
+    if not isinstance(comments, list):
+        raise ValueError('комментарии должны быть списком')
+    for comment in comments:
+        _check(comment, 'created')
+
+
+def _group_slug(record):
+    group = record.get('group')
+    return group.get('slug') if isinstance(group, dict) else group
+
+
+def _lookup(queryset, field, values):
+    """Ищет значения частями, не упираясь в лимит параметров SQLite."""
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(queryset.filter(**{
+            f'{field}__in': values[start:start + LOOKUP_CHUNK_SIZE],
+        }).values_list(field, 'id'))
+    return found
+
+
+def resolve_users(usernames):
+    """Возвращает {username: id}, создавая недостающих пользователей."""
+    found = _lookup(User.objects, 'username', usernames)
+    missing = set(usernames) - set(found)
+    if missing:
+        new_users = []
+        for username in missing:
+            user = User(username=username)
+            user.set_unusable_password()
+            new_users.append(user)
+        User.objects.bulk_create(new_users, ignore_conflicts=True)
+        found.update(_lookup(User.objects, 'username', missing))
+    return found
+
+
+def resolve_groups(records):
+    """Возвращает {slug: id}, создавая недостающие группы."""
+    titles = {}
+    for record in records:
+        slug = _group_slug(record)
+        if slug and slug not in titles:
+            group = record['group']
+            titles[slug] = (group.get('title', slug),
+                            group.get('description', '')) if isinstance(
+                group, dict) else (slug, '')
+    found = _lookup(Group.objects, 'slug', titles)
+    missing = set(titles) - set(found)
+    if missing:
+        Group.objects.bulk_create(
+            (Group(slug=slug, title=titles[slug][0],
+                   description=titles[slug][1]) for slug in missing),
+            ignore_conflicts=True,
+        )
+        found.update(_lookup(Group.objects, 'slug', missing))
+    return found
+
+
+class Importer:
+    """Импорт одного файла с контрольной точкой по его имени."""
+
+    def __init__(self, path, name=None, batch_size=BATCH_SIZE, workers=None,
+                 image_root=None, media_root=None, report=None):
+        self.path = path
+        self.name = name or os.path.abspath(path)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.image_root = image_root or os.path.dirname(
+            os.path.abspath(path))
+        self.media_root = media_root or settings.MEDIA_ROOT
+        self.report = report or (lambda stats: None)
+        self.posts = 0
+        self.comments = 0
+        self.rejected = []
+
+    def run(self):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            name=self.name)
+        line = checkpoint.line
+        start = time.perf_counter()
+        with open(self.path, encoding='utf-8') as source, \
+                ProcessPoolExecutor(self.workers) as pool:
+            lines = itertools.islice(source, line, None)
+            while True:
+                batch = list(itertools.islice(lines, self.batch_size))
+                if not batch:
+                    break
+                records = self._parse(batch, line)
+                images = self._ingest_images(records, pool)
+                self._lease_images(records, images)
+                line += len(batch)
+                with transaction.atomic():
+                    self._load(records, images)
+                    ImportCheckpoint.objects.filter(
+                        name=self.name).update(line=line)
+                elapsed = time.perf_counter() - start
+                self.report({
+                    'line': line,
+                    'posts': self.posts,
+                    'comments': self.comments,
+                    'rejected': len(self.rejected),
+                    'rows_per_second': (
+                        (self.posts + self.comments) / elapsed
+                        if elapsed else 0),
+                })
+        return self.posts, self.comments
+
+    def _parse(self, batch, line):
+        """Записи порции; строки, которые не разбираются как пост,
+        запоминаются в rejected как (номер строки, причина)."""
+        records = []
+        for number, text in enumerate(batch, line + 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+                _check_post(record)
+            except (TypeError, ValueError) as error:
+                self.rejected.append((number, str(error)))
+                continue
+            records.append(record)
+        return records
+
+    def _ingest_images(self, records, pool):
+        sources = [
+            os.path.join(self.image_root, record['image'])
+            if record.get('image') else None
+            for record in records
+        ]
+        names = iter(pool.map(
+            ingest_image, [source for source in sources if source],
+            itertools.repeat(self.media_root), chunksize=16))
+        return [next(names) if source else None for source in sources]
+
+    def _lease_images(self, records, images):
+        """Защищает записанные пулом файлы от purge_images(); файл,
+        удалённый до этого, записывается заново."""
+        lease(name for name in images if name)
+        for number, name in enumerate(images):
+            if name and not os.path.exists(os.path.join(self.media_root,
+                                                        name)):
+                images[number] = ingest_image(
+                    os.path.join(self.image_root, records[number]['image']),
+                    self.media_root)
+
+    def _load(self, records, images):
+        users = resolve_users({
+            username
+            for record in records
+            for username in itertools.chain(
+                (record['author'],),
+                (comment['author'] for comment in record.get('comments',
+                                                             ())))
+        })
+        groups = resolve_groups(records)
+        posts = Post.objects.bulk_create([
+            Post(
+                author_id=users[record['author']],
+                group_id=groups.get(_group_slug(record)),
+                text=record['text'],
+                pub_date=_moment(record.get('pub_date')),
+                image=image or '',
+            )
+            for record, image in zip(records, images)
+        ], keep_dates=True)
+        # Курсоры ленты комментариев идут по id, поэтому комментарии
+        # поста вставляются в порядке created.
+        comments = [
+            comment
+            for post, record in zip(posts, records)
+            for comment in sorted((
+                Comment(
+                    post_id=post.id,
+                    author_id=users[comment['author']],
+                    text=comment['text'],
+                    created=_moment(comment.get('created')),
+                )
+                for comment in record.get('comments', ())
+            ), key=lambda comment: comment.created)
+        ]
+        dates = [comment.created for comment in comments]
+        comments = Comment.objects.bulk_create(comments,
+                                               batch_size=self.batch_size)
+        assign_bulk_ids(Comment.objects, comments)
+        restore_dates(Comment.objects, comments, 'created', dates)
+        self.posts += len(posts)
+        self.comments += len(comments)
@@ -0,0 +1,88 @@
+"""Уведомления о новых постах авторов из подписок.
+
+PostHub — издатель-подписчик внутри процесса. Сигнал сохранения поста
+после фиксации транзакции публикует (автор, id поста), а открытые
+соединения ленты подписок ждут события на threading.Condition: ожидающее
+соединение не занимает ни процессор, ни соединение с базой, но держит
+поток воркера, поэтому число соединений процесса ограничено
+(LIVE_MAX_CONNECTIONS в posts/views.py), а поток SSE живёт недолго и
+переподключается. Хаб живёт
+в пределах одного процесса, поэтому при нескольких процессах-воркерах
+клиент узнаёт о постах, созданных в его процессе, а остальные увидит
+при следующем переподключении (оно начинается с одного запроса к базе).
+"""
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """Очередь id новых постов для одного соединения."""
+
+    def __init__(self, hub, author_ids):
+        self.hub = hub
+        self.author_ids = frozenset(author_ids)
+        self.post_ids = []
+        self._condition = threading.Condition()
+
+    def notify(self, post_id):
+        with self._condition:
+            self.post_ids.append(post_id)
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """Ждёт новых постов не дольше timeout и забирает накопленные."""
+        with self._condition:
+            if not self.post_ids:
+                self._condition.wait(timeout)
+            post_ids, self.post_ids = self.post_ids, []
+        return post_ids
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PostHub:
+    """Рассылает новые посты подписчикам их авторов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_author = defaultdict(set)
+        self._subscriptions = set()
+
+    def subscribe(self, author_ids):
+        subscription = Subscription(self, author_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            for author_id in subscription.author_ids:
+                self._by_author[author_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for author_id in subscription.author_ids:
+                subscribers = self._by_author.get(author_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_author[author_id]
+
+    def publish(self, author_id, post_id):
+        with self._lock:
+            subscribers = list(self._by_author.get(author_id, ()))
+        for subscription in subscribers:
+            subscription.notify(post_id)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+hub = PostHub()
@@ -0,0 +1,138 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils.html import escape
+
+from posts.feed import feed_rows
+from posts.models import Group, Post
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+BENCH_USERNAME = 'bench_feed_user'
+WORDS = 'длинный пост с подробным описанием всего на свете '
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает объём данных, читаемых из базы, и размер HTML '
+            'страницы ленты с полным текстом постов и с началом текста, '
+            'а также время и память на страницу для моделей и строк ленты. '
+            'Тестовые посты создаются в транзакции и откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--text-size', type=int, default=20000,
+                            help='Длина текста поста в символах')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_posts(options['posts'], options['text_size'])
+            for name, queryset in self.querysets().items():
+                self.stdout.write(
+                    f'{name}: {self.bytes_read(queryset)} байт из базы, '
+                    f'{self.render_time(queryset, options["repeat"]):.2f} мс '
+                    f'на страницу')
+            html, text_overhead = self.html_size()
+            self.stdout.write(
+                f'HTML страницы: {html} байт, с полным текстом было бы '
+                f'{html + text_overhead} байт')
+            for name, build in self.page_builders().items():
+                build_ms, render_ms, memory = self.measure_page(
+                    build, options['repeat'])
+                self.stdout.write(
+                    f'{name}: сборка {build_ms:.2f} мс, рендер '
+                    f'{render_ms:.2f} мс, память {memory} байт на страницу')
+            transaction.set_rollback(True)
+
+    def create_posts(self, count, text_size):
+        author = User.objects.create(username=BENCH_USERNAME)
+        group = Group.objects.create(title='bench_feed', slug='bench-feed',
+                                     description='bench_feed')
+        text = (WORDS * (text_size // len(WORDS) + 1))[:text_size]
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'{number} {text}')
+            for number in range(count))
+
+    @staticmethod
+    def querysets():
+        posts = Post.objects.select_related('author', 'group')
+        return {
+            'полный текст': posts,
+            'defer(text)': posts.defer('text'),
+        }
+
+    @staticmethod
+    def bytes_read(queryset):
+        sql, params = queryset[:POSTS_PER_PAGE].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return sum(len(str(value).encode())
+                       for row in cursor.fetchall() for value in row
+                       if value is not None)
+
+    def render_time(self, queryset, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self.render(queryset)
+        return (time.perf_counter() - start) / repeat * 1000
+
+    @staticmethod
+    def render(queryset):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        page_obj = Paginator(queryset, POSTS_PER_PAGE).get_page(1)
+        return render_to_string('posts/index.html', {'page_obj': page_obj},
+                                request=request)
+
+    def html_size(self):
+        """Размер страницы с началом текста и сколько добавил бы полный
+        текст."""
+        queryset = self.querysets()['defer(text)']
+        html = self.render(queryset).encode()
+        posts = Post.objects.order_by('-pub_date')[:POSTS_PER_PAGE]
+        overhead = sum(len(escape(post.text).encode())
+                       - len(escape(post.excerpt).encode())
+                       for post in posts)
+        return len(html), overhead
+
+    @staticmethod
+    def page_builders():
+        queryset = Post.objects.select_related('author', 'group').defer(
+            'text')[:POSTS_PER_PAGE]
+        return {
+            'модели': lambda: list(queryset.all()),
+            'строки ленты': lambda: feed_rows(queryset.all()),
+        }
+
+    @staticmethod
+    def measure_page(build, repeat):
+        """Время сборки и рендера страницы группы и память объектов
+        страницы."""
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        group = Group.objects.get(slug='bench-feed')
+        page_obj = Paginator(Post.objects.none(), POSTS_PER_PAGE).get_page(1)
+        build_time = render_time = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            feed = build()
+            build_time += time.perf_counter() - start
+            start = time.perf_counter()
+            render_to_string('posts/group_list.html', {
+                'group': group, 'page_obj': page_obj, 'feed': feed,
+            }, request=request)
+            render_time += time.perf_counter() - start
+        tracemalloc.start()
+        feed = build()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del feed
+        return (build_time / repeat * 1000, render_time / repeat * 1000,
+                memory)
@@ -0,0 +1,99 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from posts import timelines
+from posts.models import Follow, Post
+from posts.views import get_feed_page
+
+User = get_user_model()
+BENCH_PREFIX = 'bench_follow_'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает сборку ленты подписок запросом с JOIN и слиянием '
+            'окон авторов на сгенерированных графах подписок. Тестовые '
+            'данные создаются в транзакции и откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', default='1,10,50,200',
+                            help='Числа авторов в подписках через запятую')
+        parser.add_argument('--posts-per-author', type=int, default=100)
+        parser.add_argument('--pages', default='1,5',
+                            help='Номера страниц через запятую')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        follows = [int(number) for number in options['follows'].split(',')]
+        pages = [int(number) for number in options['pages'].split(',')]
+        with transaction.atomic():
+            authors = self.create_authors(max(follows),
+                                          options['posts_per_author'])
+            for count in follows:
+                reader = self.create_reader(authors[:count])
+                for page in pages:
+                    for name, measure in self.strategies(reader).items():
+                        queries, milliseconds = self.measure(
+                            measure, page, options['repeat'])
+                        self.stdout.write(
+                            f'{count} авторов, страница {page}, {name}: '
+                            f'{milliseconds:.2f} мс, запросов {queries}')
+            timelines.discard(*((timelines.AUTHOR, author.id)
+                                for author in authors))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def create_authors(count, posts_per_author):
+        User.objects.bulk_create(
+            User(username=f'{BENCH_PREFIX}author_{number}')
+            for number in range(count))
+        authors = list(User.objects.filter(
+            username__startswith=f'{BENCH_PREFIX}author_'))
+        # Посты авторов перемешаны во времени, как в живой ленте.
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}')
+            for number in range(posts_per_author) for author in authors)
+        return authors
+
+    @staticmethod
+    def create_reader(authors):
+        reader = User.objects.create(
+            username=f'{BENCH_PREFIX}reader_{len(authors)}')
+        Follow.objects.bulk_create(Follow(user=reader, author=author)
+                                   for author in authors)
+        return reader
+
+    @staticmethod
+    def strategies(reader):
+        author_ids = list(Follow.objects.filter(
+            user=reader).values_list('author_id', flat=True))
+        joined = Post.objects.filter(
+            author__following__user=reader).select_related(
+            'author', 'group').defer('text')
+        merged = Post.objects.filter(author_id__in=author_ids).select_related(
+            'author', 'group').defer('text')
+        timeline_keys = [(timelines.AUTHOR, author_id)
+                         for author_id in author_ids]
+        return {
+            'JOIN': lambda request: get_feed_page(joined, request),
+            'слияние окон': lambda request: get_feed_page(
+                merged, request, timeline_keys=timeline_keys),
+        }
+
+    @staticmethod
+    def measure(strategy, page, repeat):
+        """Число запросов и среднее время сборки страницы; первый вызов
+        прогревает кеш окон."""
+        request = RequestFactory().get('/follow/', {'page': page})
+        strategy(request)
+        with CaptureQueriesContext(connection) as queries:
+            strategy(request)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            strategy(request)
+        return (len(queries),
+                (time.perf_counter() - start) / repeat * 1000)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from posts.models import Comment, Post
+from posts.write_queue import WriteQueue
+
+User = get_user_model()
+BENCH_USERNAME = 'bench_writes_user'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность прямой записи комментариев '
+            'и записи через очередь с единственным писателем')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Число записей на поток')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        post = Post.objects.create(author=user, text='bench_writes')
+        try:
+            for name, write in (
+                ('direct', self._direct),
+                ('queue', self._queued(options['batch_size'])),
+            ):
+                elapsed, errors = self._run(
+                    write, post, user, options['threads'], options['writes'])
+                total = options['threads'] * options['writes']
+                self.stdout.write(
+                    f'{name}: {total} записей за {elapsed:.2f} с, '
+                    f'{total / elapsed:.0f} записей/с, ошибок: {errors}')
+        finally:
+            post.delete()
+            user.delete()
+
+    @staticmethod
+    def _direct(func):
+        return func()
+
+    @staticmethod
+    def _queued(batch_size):
+        write_queue = WriteQueue(batch_size=batch_size)
+
+        def write(func):
+            return write_queue.execute(func)
+        write.queue = write_queue
+        return write
+
+    @staticmethod
+    def _run(write, post, user, threads, writes):
+        errors = []
+
+        def worker():
+            try:
+                for number in range(writes):
+                    try:
+                        write(lambda: Comment.objects.create(
+                            post=post, author=user, text=str(number)))
+                    except OperationalError:
+                        errors.append(number)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if hasattr(write, 'queue'):
+            write.queue.stop()
+        return elapsed, len(errors)
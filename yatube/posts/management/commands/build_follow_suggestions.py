@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import (TOP_K, USERS_CHUNK_SIZE,
+                                   build_suggestions,
+                                   refresh_stale_suggestions)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «на кого подписаться»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Только пользователи с изменёнными '
+                                 'подписками')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--chunk-size', type=int,
+                            default=USERS_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        build = (refresh_stale_suggestions if options['stale_only']
+                 else build_suggestions)
+        processed = build(top_k=options['top_k'],
+                          chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f'Рекомендации пересчитаны для {processed} пользователей '
+            f'за {time.perf_counter() - start:.2f} с')
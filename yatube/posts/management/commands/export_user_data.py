@@ -0,0 +1,48 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты и комментарии пользователя'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=('csv', 'jsonl', 'zip'),
+                            default='jsonl')
+        parser.add_argument('--kind', choices=tuple(export.FIELDS))
+        parser.add_argument('--no-images', action='store_true')
+        parser.add_argument('--output', '-o',
+                            help='Файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        try:
+            author = get_user_model().objects.get(
+                username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('Пользователь не найден')
+        kind = options['kind']
+        if options['format'] == 'csv':
+            if kind is None:
+                raise CommandError('Для csv укажите --kind')
+            chunks = export.csv_lines(author, kind)
+        elif options['format'] == 'jsonl':
+            chunks = export.jsonl_lines(
+                author, (kind,) if kind else tuple(export.FIELDS))
+        else:
+            chunks = export.zip_chunks(author,
+                                       with_images=not options['no_images'])
+        if options['output']:
+            output = open(options['output'], 'wb')
+        else:
+            output = sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk.encode() if isinstance(chunk, str)
+                             else chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts.importer import BATCH_SIZE, Importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты и комментарии из JSONL пачками; повторный '
+            'запуск продолжает с контрольной точки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--name',
+                            help='Имя контрольной точки, по умолчанию '
+                                 'путь к файлу')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--workers', type=int,
+                            help='Процессов для обработки картинок')
+        parser.add_argument('--image-root',
+                            help='Каталог, от которого считаются пути '
+                                 'картинок, по умолчанию каталог файла')
+
+    def report(self, stats):
+        self.stdout.write(
+            'Строка {line}: постов {posts}, комментариев {comments}, '
+            'отклонено строк {rejected}, {rows_per_second:.0f} '
+            'строк/с'.format(**stats))
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            options['path'],
+            name=options['name'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            image_root=options['image_root'],
+            report=self.report,
+        )
+        posts, comments = importer.run()
+        for line, reason in importer.rejected:
+            self.stderr.write(f'Строка {line} пропущена: {reason}')
+        self.stdout.write(
+            f'Импорт завершён: постов {posts}, комментариев {comments}')
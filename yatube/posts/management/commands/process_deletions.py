@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.deletion import DELETION_BATCH_SIZE, pending, run
+
+
+class Command(BaseCommand):
+    help = ('Удаляет порциями пользователей и группы, поставленные в '
+            'очередь фонового удаления из админки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=DELETION_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Пауза между порциями в секундах')
+
+    def handle(self, *args, **options):
+        for deletion in pending():
+            run(deletion, batch_size=options['batch_size'],
+                pause=options['pause'], progress=self.report)
+
+    def report(self, deletion):
+        state = 'завершено' if deletion.finished else 'идёт'
+        self.stdout.write(f'{deletion}: {deletion.done} из '
+                          f'{deletion.total} строк, {state}')
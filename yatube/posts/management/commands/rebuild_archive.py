@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import rebuild_archive
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает корзины архива по таблице постов; нужен после '
+            'массовых изменений в обход сигналов')
+
+    def handle(self, *args, **options):
+        rebuild_archive()
+        self.stdout.write('Архив пересчитан')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.group_stats import rebuild_group_stats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает статистику групп по таблице постов; нужен после '
+            'массовых изменений в обход сигналов')
+
+    def handle(self, *args, **options):
+        rebuild_group_stats()
+        self.stdout.write('Статистика групп пересчитана')
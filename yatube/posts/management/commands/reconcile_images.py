@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import (PURGE_BATCH_SIZE, delete_image, find_orphans,
+                         purge_images)
+
+
+class Command(BaseCommand):
+    help = ('Разбирает очередь удаления картинок и ищет файлы в media/posts, '
+            'на которые не ссылается ни один пост')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help='Удалить найденные файлы, а не только '
+                                 'вывести их')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--batch-size', type=int,
+                            default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        purged = purge_images(batch_size=options['batch_size'])
+        self.stdout.write(f'Удалено из очереди: {purged}')
+        orphans = 0
+        for name in find_orphans(min_age=options['min_age'],
+                                 batch_size=options['batch_size']):
+            orphans += 1
+            if options['delete']:
+                delete_image(name)
+            self.stdout.write(name)
+        action = 'Удалено' if options['delete'] else 'Найдено'
+        self.stdout.write(f'{action} файлов без постов: {orphans}')
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = ('Инкрементально пересчитывает рейтинг популярных постов; '
+            'запускается периодически, например из cron раз в минуту')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ranked = update_trending()
+        self.stdout.write(
+            f'В рейтинге {ranked} постов, расчёт занял '
+            f'{time.perf_counter() - start:.3f} с')
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(db_index=True, verbose_name='Оценка')),
+                ('computed_at', models.DateTimeField(verbose_name='Время расчёта')),
+            ],
+            options={
+                'verbose_name': 'Популярный пост',
+                'verbose_name_plural': 'Популярные посты',
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата подписки'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата и время комментария'),
+        ),
+    ]
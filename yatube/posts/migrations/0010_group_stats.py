@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('last_post_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+                ('top_author_ids', models.CharField(blank=True, max_length=100, verbose_name='Самые активные авторы')),
+            ],
+            options={
+                'verbose_name': 'Статистика группы',
+                'verbose_name_plural': 'Статистика групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора в группе',
+                'verbose_name_plural': 'Статистика авторов в группах',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', '-post_count'], name='posts_group_group_i_777893_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupauthorstats',
+            unique_together={('group', 'author')},
+        ),
+    ]
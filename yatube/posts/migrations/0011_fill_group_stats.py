@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+TOP_AUTHORS = 3
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    for group in Group.objects.all():
+        posts = Post.objects.filter(group=group).order_by()
+        totals = posts.aggregate(count=Count('id'), last=Max('pub_date'))
+        per_author = posts.values('author_id').annotate(
+            count=Count('id')).order_by('-count', 'author_id')
+        GroupAuthorStats.objects.bulk_create(
+            GroupAuthorStats(group=group, author_id=row['author_id'],
+                             post_count=row['count'])
+            for row in per_author
+        )
+        GroupStats.objects.create(
+            group=group,
+            post_count=totals['count'],
+            last_post_at=totals['last'],
+            top_author_ids=','.join(
+                str(row['author_id']) for row in per_author[:TOP_AUTHORS]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_group_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
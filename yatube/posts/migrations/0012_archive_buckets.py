@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_fill_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('site', 'Сайт'), ('group', 'Группа'), ('author', 'Автор')], max_length=6, verbose_name='Раздел')),
+                ('scope_id', models.PositiveIntegerField(verbose_name='id раздела')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Месяц')),
+                ('day', models.PositiveSmallIntegerField(verbose_name='День')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('min_id', models.PositiveIntegerField(verbose_name='Наименьший id')),
+                ('max_id', models.PositiveIntegerField(verbose_name='Наибольший id')),
+            ],
+            options={
+                'verbose_name': 'Корзина архива',
+                'verbose_name_plural': 'Корзины архива',
+                'ordering': ('-year', '-month', '-day'),
+                'unique_together': {('scope', 'scope_id', 'year', 'month', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def fill_archive_buckets(apps, schema_editor):
+    ArchiveBucket = apps.get_model('posts', 'ArchiveBucket')
+    Post = apps.get_model('posts', 'Post')
+    buckets = {}
+    for post in Post.objects.order_by().iterator():
+        local = timezone.localtime(post.pub_date)
+        scopes = [('site', 0), ('author', post.author_id)]
+        if post.group_id is not None:
+            scopes.append(('group', post.group_id))
+        for scope in scopes:
+            for day in (0, local.day):
+                key = scope + (local.year, local.month, day)
+                count, low, high = buckets.get(key, (0, post.id, post.id))
+                buckets[key] = (count + 1, min(low, post.id),
+                                max(high, post.id))
+    ArchiveBucket.objects.bulk_create(
+        (ArchiveBucket(scope=scope, scope_id=scope_id, year=year,
+                       month=month, day=day, post_count=count,
+                       min_id=low, max_id=high)
+         for (scope, scope_id, year, month, day), (count, low, high)
+         in buckets.items()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_archive_buckets'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_archive_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_fill_archive_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя импорта')),
+                ('line', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:36
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Имя файла')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлен в очередь')),
+            ],
+            options={
+                'verbose_name': 'Удаление картинки',
+                'verbose_name_plural': 'Удаления картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
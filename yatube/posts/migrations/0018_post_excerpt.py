@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Длина текста'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(text):
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    excerpt = text[:EXCERPT_LENGTH]
+    space = excerpt.rfind(' ')
+    if space > EXCERPT_LENGTH // 2:
+        excerpt = excerpt[:space]
+    return excerpt.rstrip()
+
+
+def fill_post_excerpt(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.order_by().only('id', 'text').iterator():
+        post.excerpt = make_excerpt(post.text)
+        post.text_length = len(post.text)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ('excerpt', 'text_length'))
+            batch = []
+    Post.objects.bulk_update(batch, ('excerpt', 'text_length'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_post_excerpt, migrations.RunPython.noop),
+    ]
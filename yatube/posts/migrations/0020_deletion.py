@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_fill_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=5, verbose_name='Что удаляется')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('label', models.CharField(max_length=200, verbose_name='Объект')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего строк')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Удалено строк')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Запущено')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'Фоновое удаление',
+                'verbose_name_plural': 'Фоновые удаления',
+                'ordering': ('-created',),
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='leased_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя загрузка'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:29
+
+from django.db import migrations, models
+from django.db.migrations.recorder import MigrationRecorder
+
+
+def forget_backfilled_dates(apps, schema_editor):
+    """Миграция 0009 проставила существующим подпискам время своего
+    запуска; популярное сочло бы их все новыми. Такие даты стираются."""
+    Follow = apps.get_model('posts', 'Follow')
+    applied = MigrationRecorder(schema_editor.connection).migration_qs.filter(
+        app='posts', name='0009_trending').values_list(
+        'applied', flat=True).first()
+    if applied is not None:
+        Follow.objects.filter(created__lte=applied).update(created=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_image_blob_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='Дата подписки'),
+        ),
+        migrations.RunPython(forget_backfilled_dates,
+                             migrations.RunPython.noop),
+    ]
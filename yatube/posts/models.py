@@ -1,8 +1,23 @@
-from django.db import models
+from django.db import DatabaseError, models, transaction
 from django.contrib.auth import get_user_model
+from django.dispatch import Signal
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
+EXCERPT_LENGTH = 300
+
+# Отправляется после Post.objects.bulk_create(), который не вызывает
+# post_save для каждого объекта.
+posts_bulk_created = Signal(providing_args=['objs'])
+# Отправляются после каждой порции массовых изменений из posts.bulk,
+# которые тоже идут в обход post_save и post_delete. rows — строки
+# PostRow в состоянии до изменения, changes — новые значения полей.
+posts_bulk_updated = Signal(providing_args=['rows', 'changes'])
+posts_bulk_deleted = Signal(providing_args=['rows'])
+comments_bulk_deleted = Signal(providing_args=['post_ids'])
+
 
 class Group(models.Model):
     """Модель для сообществ (групп)"""
@@ -21,10 +36,80 @@ class Group(models.Model):
         return self.title
 
 
+def make_excerpt(text):
+    """Начало текста длиной до EXCERPT_LENGTH, обрезанное по пробелу."""
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    excerpt = text[:EXCERPT_LENGTH]
+    space = excerpt.rfind(' ')
+    if space > EXCERPT_LENGTH // 2:
+        excerpt = excerpt[:space]
+    return excerpt.rstrip()
+
+
+DATE_UPDATE_CHUNK_SIZE = 400
+
+
+def assign_bulk_ids(queryset, objs):
+    """Проставляет id объектам, только что созданным bulk_create() в
+    текущей транзакции, там, где база их не возвращает (SQLite).
+
+    INSERT держит замок записи SQLite до конца транзакции, поэтому
+    последние len(objs) id таблицы — это id новых строк."""
+    if not objs or objs[0].pk is not None:
+        return
+    ids = sorted(queryset.order_by('-id').values_list(
+        'id', flat=True)[:len(objs)])
+    if len(ids) != len(objs):
+        raise DatabaseError(f'Создано {len(ids)} строк из {len(objs)}')
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+
+
+def restore_dates(queryset, objs, field, dates):
+    """Записывает созданным строкам даты, которые auto_now_add заменил
+    текущим временем при вставке: поле модели при этом не меняется."""
+    for obj, date in zip(objs, dates):
+        setattr(obj, field, date)
+    for start in range(0, len(objs), DATE_UPDATE_CHUNK_SIZE):
+        chunk = objs[start:start + DATE_UPDATE_CHUNK_SIZE]
+        queryset.filter(id__in=[obj.id for obj in chunk]).update(**{
+            field: models.Case(
+                *(models.When(id=obj.id, then=models.Value(
+                    getattr(obj, field))) for obj in chunk),
+                output_field=models.DateTimeField()),
+        })
+
+
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, keep_dates=False, **kwargs):
+        """Создаёт посты пачкой и проставляет им id (assign_bulk_ids()).
+        С keep_dates=True сохраняет заданные постам pub_date, иначе их
+        заменяет auto_now_add. Пропуск строк через ignore_conflicts
+        сделал бы id и сводки неверными, поэтому он не поддерживается."""
+        if kwargs.get('ignore_conflicts'):
+            raise ValueError(
+                'Post.objects.bulk_create() не поддерживает '
+                'ignore_conflicts: статистика и окна лент не узнают, какие '
+                'посты пропущены')
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_excerpt()
+        dates = [obj.pub_date for obj in objs] if keep_dates else None
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            assign_bulk_ids(self, objs)
+            if keep_dates:
+                restore_dates(self, objs, 'pub_date', dates)
+            posts_bulk_created.send(sender=self.model, objs=objs)
+        return objs
+
+
 class Post(models.Model):
     """Модель для создания постов"""
     text = models.TextField(verbose_name='Содержание поста')
     pub_date = models.DateTimeField(auto_now_add=True,
+                                    db_index=True,
                                     verbose_name='Дата и время поста')
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -36,20 +121,54 @@ class Post(models.Model):
                               verbose_name='Группа',
                               blank=True,
                               null=True)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH,
+                               blank=True,
+                               editable=False,
+                               verbose_name='Начало текста')
+    text_length = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name='Длина текста')
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
+        db_index=True,
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
+        if 'text' in self.get_deferred_fields():
+            return self.excerpt[:15]
         return self.text[:15]
 
+    @property
+    def is_truncated(self):
+        return self.text_length > len(self.excerpt)
+
+    def fill_excerpt(self):
+        """Пересчитывает excerpt и text_length по тексту, если он
+        загружен."""
+        if 'text' in self.get_deferred_fields():
+            return False
+        self.excerpt = make_excerpt(self.text)
+        self.text_length = len(self.text)
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            if self.fill_excerpt() and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt',
+                                           'text_length'}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Модель для комментариев к записям"""
@@ -65,6 +184,7 @@ class Comment(models.Model):
                                verbose_name='Автор комментария')
     text = models.TextField(verbose_name='Текст комментария')
     created = models.DateTimeField(auto_now_add=True,
+                                   db_index=True,
                                    verbose_name='Дата и время комментария')
 
     class Meta:
@@ -88,8 +208,224 @@ class Follow(models.Model):
                                related_name='following',
                                verbose_name='Автор',
                                )
+    # Подписки, сделанные до появления поля, даты не имеют.
+    created = models.DateTimeField(auto_now_add=True,
+                                   null=True,
+                                   db_index=True,
+                                   verbose_name='Дата подписки')
 
     class Meta:
         unique_together = ('user', 'author',)
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация автора для подписки, рассчитанная пакетной задачей"""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='follow_suggestions',
+                             verbose_name='Пользователь')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Рекомендуемый автор')
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        ordering = ('-score',)
+        unique_together = ('user', 'author',)
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+
+
+class StaleSuggestions(models.Model):
+    """Пользователи, у которых изменились подписки после расчёта
+    рекомендаций"""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='+',
+                                verbose_name='Пользователь')
+
+    class Meta:
+        verbose_name = 'Устаревшие рекомендации'
+        verbose_name_plural = 'Устаревшие рекомендации'
+
+
+class TrendingPost(models.Model):
+    """Рейтинг популярных постов, пересчитываемый периодически"""
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='trending',
+                                verbose_name='Пост')
+    score = models.FloatField(db_index=True, verbose_name='Оценка')
+    computed_at = models.DateTimeField(verbose_name='Время расчёта')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Популярный пост'
+        verbose_name_plural = 'Популярные посты'
+
+
+class GroupStats(models.Model):
+    """Сводная статистика группы, обновляемая при записи постов"""
+    group = models.OneToOneField(Group,
+                                 on_delete=models.CASCADE,
+                                 primary_key=True,
+                                 related_name='stats',
+                                 verbose_name='Группа')
+    post_count = models.PositiveIntegerField(default=0,
+                                             verbose_name='Число постов')
+    last_post_at = models.DateTimeField(null=True,
+                                        blank=True,
+                                        verbose_name='Последняя активность')
+    top_author_ids = models.CharField(max_length=100,
+                                      blank=True,
+                                      verbose_name='Самые активные авторы')
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+
+class GroupAuthorStats(models.Model):
+    """Число постов автора в группе"""
+    group = models.ForeignKey(Group,
+                              on_delete=models.CASCADE,
+                              related_name='author_stats',
+                              verbose_name='Группа')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+    post_count = models.PositiveIntegerField(default=0,
+                                             verbose_name='Число постов')
+
+    class Meta:
+        unique_together = ('group', 'author',)
+        indexes = (models.Index(fields=('group', '-post_count')),)
+        verbose_name = 'Статистика автора в группе'
+        verbose_name_plural = 'Статистика авторов в группах'
+
+
+class ArchiveBucket(models.Model):
+    """Число постов и диапазон их id за месяц или день архива.
+
+    Строка с day=0 описывает весь месяц. scope_id — id группы или автора,
+    для архива всего сайта он равен 0.
+    """
+    SITE = 'site'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    SCOPES = (
+        (SITE, 'Сайт'),
+        (GROUP, 'Группа'),
+        (AUTHOR, 'Автор'),
+    )
+    scope = models.CharField(max_length=6, choices=SCOPES,
+                             verbose_name='Раздел')
+    scope_id = models.PositiveIntegerField(verbose_name='id раздела')
+    year = models.PositiveSmallIntegerField(verbose_name='Год')
+    month = models.PositiveSmallIntegerField(verbose_name='Месяц')
+    day = models.PositiveSmallIntegerField(verbose_name='День')
+    post_count = models.PositiveIntegerField(default=0,
+                                             verbose_name='Число постов')
+    min_id = models.PositiveIntegerField(verbose_name='Наименьший id')
+    max_id = models.PositiveIntegerField(verbose_name='Наибольший id')
+
+    class Meta:
+        ordering = ('-year', '-month', '-day')
+        unique_together = ('scope', 'scope_id', 'year', 'month', 'day',)
+        verbose_name = 'Корзина архива'
+        verbose_name_plural = 'Корзины архива'
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк файла импорта уже загружено"""
+    name = models.CharField(max_length=255,
+                            unique=True,
+                            verbose_name='Имя импорта')
+    line = models.PositiveIntegerField(default=0,
+                                       verbose_name='Обработано строк')
+    updated = models.DateTimeField(auto_now=True,
+                                   verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+
+class ImageBlob(models.Model):
+    """Число постов, ссылающихся на файл картинки"""
+    name = models.CharField(max_length=100,
+                            unique=True,
+                            verbose_name='Имя файла')
+    refcount = models.PositiveIntegerField(default=0,
+                                           verbose_name='Число ссылок')
+    leased_at = models.DateTimeField(null=True,
+                                     blank=True,
+                                     verbose_name='Последняя загрузка')
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+
+class ImageDeletion(models.Model):
+    """Файл картинки, который удаляется после фиксации транзакции, если
+    на него больше нет ссылок"""
+    name = models.CharField(max_length=100,
+                            unique=True,
+                            verbose_name='Имя файла')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Поставлен в очередь')
+
+    class Meta:
+        verbose_name = 'Удаление картинки'
+        verbose_name_plural = 'Удаления картинок'
+
+
+class Deletion(models.Model):
+    """Фоновое удаление пользователя или группы.
+
+    Пока удаление не завершено, объект скрыт со страниц сайта, а
+    зависимые строки удаляются порциями (posts.deletion).
+    """
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(max_length=5, choices=KINDS,
+                            verbose_name='Что удаляется')
+    object_id = models.PositiveIntegerField(verbose_name='id объекта')
+    label = models.CharField(max_length=200,
+                             verbose_name='Объект')
+    total = models.PositiveIntegerField(default=0,
+                                        verbose_name='Всего строк')
+    done = models.PositiveIntegerField(default=0,
+                                       verbose_name='Удалено строк')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Запущено')
+    finished = models.DateTimeField(null=True,
+                                    blank=True,
+                                    verbose_name='Завершено')
+
+    class Meta:
+        ordering = ('-created',)
+        unique_together = ('kind', 'object_id',)
+        verbose_name = 'Фоновое удаление'
+        verbose_name_plural = 'Фоновые удаления'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.label}'
+
+    @property
+    def progress(self):
+        """Доля удалённых строк от 0 до 1."""
+        if self.finished is not None:
+            return 1
+        return min(self.done / self.total, 1) if self.total else 0
@@ -0,0 +1,171 @@
+"""Кеш часто запрашиваемых объектов: групп, пользователей и постов.
+
+ObjectCache читает объект по значению поля (slug, username, id) сначала
+из кеша, а при промахе — из базы, и кладёт его в кеш. get_many() берёт
+несколько объектов одним обращением к кешу и одним запросом к базе для
+промахов. Посты кешируются без связанных объектов: автор и группа
+подставляются из кешей пользователей и групп по id, поэтому изменение
+пользователя или группы не оставляет устаревших копий внутри постов.
+
+Пользователи кешируются урезанными до PUBLIC_USER_FIELDS (без хеша
+пароля и флагов доступа): users_by_username хранит только id, а запись
+в users_by_id лежит под ключом с версией пользователя из users.backends,
+которую сохранение, удаление и выход пользователя увеличивают.
+
+Сигналы сохранения и удаления удаляют ключи объекта, в том числе по
+прежнему значению поля, если оно изменилось (переименование группы или
+пользователя), сразу и ещё раз после фиксации транзакции: чтение,
+попавшее между изменением и фиксацией, могло вернуть в кеш старую
+копию. Массовые update() идут в обход сигналов; такие записи
+устаревают не позже OBJECT_CACHE_TIMEOUT. Счётчики попаданий ведутся
+в памяти процесса.
+"""
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from users.backends import user_cache_version
+
+from .models import Group, Post, User
+
+OBJECT_CACHE_TIMEOUT = 60 * 15
+PUBLIC_USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+
+
+class ObjectCache:
+    """Объекты модели по значению одного уникального поля.
+
+    fields ограничивает загружаемые поля (остальные отложены), version —
+    функция от значения, чей результат входит в ключ.
+    """
+
+    def __init__(self, model, field, timeout=OBJECT_CACHE_TIMEOUT,
+                 fields=None, version=None):
+        self.model = model
+        self.field = field
+        self.attname = model._meta.get_field(field).attname
+        self.timeout = timeout
+        self.fields = fields
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return f'{self.model._meta.label_lower}.{self.field}'
+
+    def key(self, value):
+        if self.version is not None:
+            return f'objects:{self.name}:{value}:{self.version(value)}'
+        return f'objects:{self.name}:{value}'
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_many(self, values):
+        """{значение: объект} для найденных значений."""
+        values = {str(value): value for value in values}
+        keys = {self.key(text): text for text in values}
+        found = {keys[key]: obj for key, obj in cache.get_many(keys).items()}
+        missing = [values[text] for text in values if text not in found]
+        self._count(len(found), len(missing))
+        if missing:
+            objects = self.model._default_manager.filter(
+                **{f'{self.field}__in': missing})
+            if self.fields is not None:
+                objects = objects.only(*self.fields)
+            loaded = {str(getattr(obj, self.attname)): obj
+                      for obj in objects}
+            cache.set_many({self.key(text): obj
+                            for text, obj in loaded.items()}, self.timeout)
+            found.update(loaded)
+        return {values[text]: obj for text, obj in found.items()}
+
+    def get(self, value):
+        return self.get_many([value]).get(value)
+
+    def get_or_404(self, value):
+        obj = self.get(value)
+        if obj is None:
+            raise Http404(f'{self.model._meta.object_name} не найден')
+        return obj
+
+    def invalidate(self, instance):
+        values = {getattr(instance, self.attname)}
+        values.add(getattr(instance, '_object_cache_values', {}).get(
+            self.attname))
+        self.forget(value for value in values if value is not None)
+
+    def forget(self, values):
+        """Удаляет объекты из кеша по значениям поля сейчас и после
+        фиксации транзакции."""
+        keys = [self.key(value) for value in values]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else None,
+        }
+
+
+groups_by_slug = ObjectCache(Group, 'slug')
+groups_by_id = ObjectCache(Group, 'id')
+users_by_username = ObjectCache(User, 'username', fields=('id',))
+users_by_id = ObjectCache(User, 'id', fields=PUBLIC_USER_FIELDS,
+                          version=user_cache_version)
+posts_by_id = ObjectCache(Post, 'id')
+
+OBJECT_CACHES = {
+    Group: (groups_by_slug, groups_by_id),
+    User: (users_by_username, users_by_id),
+    Post: (posts_by_id,),
+}
+
+
+def attach_relations(posts):
+    """Подставляет постам автора и группу из кешей. Посты, автора
+    которых уже нет (пост остался в кеше после удаления), пропускаются."""
+    authors = users_by_id.get_many({post.author_id for post in posts})
+    groups = groups_by_id.get_many({post.group_id for post in posts
+                                    if post.group_id is not None})
+    attached = []
+    for post in posts:
+        author = authors.get(post.author_id)
+        if author is None:
+            continue
+        post.author = author
+        post.group = groups.get(post.group_id)
+        attached.append(post)
+    return attached
+
+
+def get_user_or_404(username):
+    """Пользователь по имени: id из users_by_username, поля — из
+    users_by_id."""
+    user = users_by_id.get(users_by_username.get_or_404(username).id)
+    if user is None:
+        raise Http404('User не найден')
+    return user
+
+
+def get_post_or_404(post_id):
+    """Пост вместе с автором и группой из кешей."""
+    posts = attach_relations([posts_by_id.get_or_404(post_id)])
+    if not posts:
+        raise Http404('Post не найден')
+    return posts[0]
+
+
+def stats():
+    return {object_cache.name: object_cache.stats()
+            for caches in OBJECT_CACHES.values()
+            for object_cache in caches}
@@ -0,0 +1,64 @@
+"""Версии кеша страницы поста.
+
+Тело страницы поста кешируется тегом {% cache %} в двух фрагментах:
+пост с боковой колонкой и лента комментариев. Ключ фрагмента содержит
+вариант (гость или авторизованный пользователь) и версии поста, его
+автора и группы. Сигналы увеличивают версию ровно тогда, когда меняется
+то, что выводится во фрагментах:
+
+* пост — при сохранении (правка, смена группы или картинки), удалении
+  и при добавлении или удалении комментария;
+* автор — при появлении и удалении его постов (счётчик постов) и при
+  изменении пользователя, кроме обновления last_login;
+* группа — при её изменении.
+
+По тем же версиям кешируются карточки постов в лентах (posts.cards).
+
+Форма комментария и кнопка редактирования зависят от пользователя и
+выводятся вне фрагментов на каждом запросе, это дёшево: объекты берутся
+из кеша объектов, а запрос комментариев ленивый и выполняется только
+при промахе.
+"""
+import time
+
+from django.core.cache import cache
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def _key(kind, object_id):
+    return f'page_version:{kind}:{object_id}'
+
+
+def bump(kind, *object_ids):
+    """Делает устаревшими фрагменты, зависящие от объектов."""
+    for object_id in set(object_ids):
+        if object_id is None:
+            continue
+        try:
+            cache.incr(_key(kind, object_id))
+        except ValueError:
+            cache.set(_key(kind, object_id), int(time.time() * 1e6), None)
+
+
+def post_versions(posts):
+    """{id поста: строка версий поста, автора и группы} для нескольких
+    постов одним обращением к кешу."""
+    post_keys = {
+        post.id: (_key('post', post.id), _key('author', post.author_id),
+                  _key('group', post.group_id))
+        for post in posts
+    }
+    keys = {key for keys in post_keys.values() for key in keys}
+    versions = cache.get_many(keys)
+    for key in keys - versions.keys():
+        # Версия вытеснена из кеша: начинаем с заведомо новой.
+        cache.add(key, int(time.time() * 1e6), None)
+        versions[key] = cache.get(key)
+    return {post_id: '.'.join(str(versions[key]) for key in keys)
+            for post_id, keys in post_keys.items()}
+
+
+def post_page_version(post):
+    """Строка версий поста, автора и группы для ключа фрагмента."""
+    return post_versions([post])[post.id]
@@ -0,0 +1,201 @@
+"""Рекомендации «на кого подписаться».
+
+Граф подписок загружается из Follow порциями в компактные массивы NumPy
+в формате CSR (для каждого пользователя — непрерывный срез с авторами,
+на которых он подписан) и в обратный CSR (подписчики автора). Оценки
+кандидатов считаются векторно для порции пользователей:
+
+* второй круг — авторы, на которых подписаны мои авторы (u → a → c);
+* совместные подписки — авторы, на которых подписаны другие подписчики
+  моих авторов (u → a ← v → c).
+
+Каждый шаг обхода берёт не больше MAX_FANOUT соседей, а из подписчиков
+моих авторов остаются MAX_FANOUT самых похожих (с наибольшим числом общих
+авторов). Так на пользователя приходится O(MAX_FANOUT²) пар кандидатов
+независимо от числа его подписок и популярности авторов.
+
+Для каждого пользователя сохраняются top-K кандидатов в FollowSuggestion.
+Память ограничена размером графа (два int32 на ребро в каждом CSR) и
+размером порции пользователей.
+"""
+import numpy as np
+from django.db import transaction
+
+from .models import Follow, FollowSuggestion, StaleSuggestions
+
+TOP_K = 10
+USERS_CHUNK_SIZE = 2000
+LOAD_CHUNK_SIZE = 100000
+MAX_FANOUT = 50
+CO_FOLLOW_WEIGHT = 0.25
+
+
+def _csr(rows, cols, size):
+    """Строит CSR-смежность из массивов рёбер."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def _gather(indptr, indices, rows, cap=None):
+    """Возвращает соседей строк rows: номер строки-владельца в rows и
+    самих соседей. cap ограничивает число соседей одной строки."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    if cap is not None:
+        lengths = np.minimum(lengths, cap)
+    total = int(lengths.sum())
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths,
+                                           lengths)
+    return owners, indices[np.repeat(starts, lengths) + offsets]
+
+
+def _top(owners, values, weights, limit):
+    """Суммирует веса одинаковых пар (владелец, значение) и оставляет
+    каждому владельцу limit значений с наибольшей суммой. Результат
+    отсортирован по владельцу и убыванию суммы."""
+    if not len(values):
+        return owners, values, weights
+    span = int(values.max()) + 1
+    keys, inverse = np.unique(owners * span + values, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=weights)
+    owners, values = np.divmod(keys, span)
+    order = np.lexsort((values, -sums, owners))
+    owners = owners[order]
+    top = np.arange(len(owners)) - np.searchsorted(owners, owners) < limit
+    order = order[top]
+    return owners[top], values[order], sums[order]
+
+
+class FollowGraph:
+    """Граф подписок с плотной нумерацией пользователей."""
+
+    def __init__(self, user_ids, author_ids):
+        self.ids = np.unique(np.concatenate((user_ids, author_ids)))
+        size = len(self.ids)
+        users = np.searchsorted(self.ids, user_ids).astype(np.int32)
+        authors = np.searchsorted(self.ids, author_ids).astype(np.int32)
+        self.indptr, self.indices = _csr(users, authors, size)
+        self.rindptr, self.rindices = _csr(authors, users, size)
+
+    @classmethod
+    def load(cls, chunk_size=LOAD_CHUNK_SIZE):
+        """Читает подписки порциями в заранее выделенные массивы."""
+        count = Follow.objects.count()
+        user_ids = np.empty(count, dtype=np.int64)
+        author_ids = np.empty(count, dtype=np.int64)
+        edges = Follow.objects.order_by().values_list('user_id', 'author_id')
+        loaded = 0
+        for user_id, author_id in edges.iterator(chunk_size=chunk_size):
+            if loaded == count:
+                break
+            user_ids[loaded] = user_id
+            author_ids[loaded] = author_id
+            loaded += 1
+        return cls(user_ids[:loaded], author_ids[:loaded])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_for(self, user_ids):
+        """Переводит id пользователей в номера строк графа."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64)
+        rows = np.searchsorted(self.ids, user_ids)
+        rows = np.minimum(rows, len(self.ids) - 1)
+        return rows[self.ids[rows] == user_ids]
+
+    def score(self, rows, top_k=TOP_K, max_fanout=MAX_FANOUT,
+              co_follow_weight=CO_FOLLOW_WEIGHT):
+        """Считает top-K кандидатов для строк rows.
+
+        Возвращает массивы (id пользователя, id автора, оценка),
+        отсортированные по пользователю и убыванию оценки.
+        """
+        local_rows = np.arange(len(rows))
+        owners, followed = _gather(self.indptr, self.indices, rows)
+        expand_owners, expand = _gather(self.indptr, self.indices, rows,
+                                        max_fanout)
+
+        second_owners, second = _gather(self.indptr, self.indices, expand,
+                                        max_fanout)
+        second_users = expand_owners[second_owners]
+
+        co_owners, co_followers = _gather(self.rindptr, self.rindices,
+                                          expand, max_fanout)
+        co_owners = expand_owners[co_owners]
+        other = co_followers != rows[co_owners]
+        similar_users, similar, shared = _top(
+            co_owners[other], co_followers[other],
+            np.ones(int(other.sum()), dtype=np.float64), max_fanout)
+        third_owners, co_followed = _gather(self.indptr, self.indices,
+                                            similar, max_fanout)
+        co_users = similar_users[third_owners]
+
+        users = np.concatenate((second_users, co_users))
+        candidates = np.concatenate((second, co_followed)).astype(np.int64)
+        weights = np.concatenate((
+            np.ones(len(second), dtype=np.float64),
+            co_follow_weight * shared[third_owners],
+        ))
+        size = len(self.ids)
+        excluded = np.concatenate((owners * size + followed,
+                                   local_rows * size + rows))
+        keep = ~np.isin(users * size + candidates, excluded)
+        users, candidates, scores = _top(users[keep], candidates[keep],
+                                         weights[keep], top_k)
+        return self.ids[rows[users]], self.ids[candidates], scores
+
+
+def store_suggestions(user_ids, suggestion_users, authors, scores):
+    """Заменяет рекомендации для порции пользователей одной транзакцией."""
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(user_id=int(user_id), author_id=int(author_id),
+                             score=float(score))
+            for user_id, author_id, score in zip(suggestion_users, authors,
+                                                 scores)
+        )
+        StaleSuggestions.objects.filter(user_id__in=user_ids).delete()
+
+
+def build_suggestions(user_ids=None, top_k=TOP_K,
+                      chunk_size=USERS_CHUNK_SIZE, graph=None):
+    """Пересчитывает рекомендации для user_ids (по умолчанию — для всех
+    пользователей с подписками). Возвращает число обработанных
+    пользователей."""
+    if graph is None:
+        graph = FollowGraph.load()
+    if user_ids is None:
+        rows = np.flatnonzero(np.diff(graph.indptr))
+        # Отписавшимся от всех рекомендовать не на что.
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(
+                user__follower__isnull=True).delete()
+            StaleSuggestions.objects.exclude(
+                user_id__in=Follow.objects.values('user_id')).delete()
+    else:
+        user_ids = list(user_ids)
+        rows = graph.rows_for(user_ids)
+        unknown = set(user_ids) - set(graph.ids[rows].tolist())
+        if unknown:
+            store_suggestions(list(unknown), [], [], [])
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        store_suggestions(graph.ids[chunk].tolist(),
+                          *graph.score(chunk, top_k=top_k))
+    return len(rows)
+
+
+def refresh_stale_suggestions(**kwargs):
+    """Пересчитывает рекомендации только для пользователей, чьи подписки
+    изменились с прошлого расчёта."""
+    user_ids = list(StaleSuggestions.objects.values_list('user_id',
+                                                         flat=True))
+    if not user_ids:
+        return 0
+    return build_suggestions(user_ids, **kwargs)
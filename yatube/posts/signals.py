@@ -0,0 +1,218 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .archive import record_group_change, record_group_moves, record_posts
+from .blobs import release, retain
+from .group_stats import (apply_bulk_created, apply_bulk_moved,
+                          apply_bulk_removed, apply_post_delta)
+from .live import hub
+from .models import (Comment, Follow, Group, GroupStats, Post,
+                     StaleSuggestions, User, comments_bulk_deleted,
+                     posts_bulk_created, posts_bulk_deleted,
+                     posts_bulk_updated)
+from .object_cache import OBJECT_CACHES, posts_by_id
+from .page_cache import bump
+from .timelines import add_posts, move_post, move_posts, remove_posts
+
+DEFERRED = object()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def mark_suggestions_stale(sender, instance, **kwargs):
+    """Помечает рекомендации подписчика для пересчёта после фиксации.
+
+    Подписки удаляются и каскадом вместе с самим подписчиком, поэтому
+    отметка ставится, только если пользователь после фиксации ещё есть.
+    """
+    user_id = instance.user_id
+
+    def mark():
+        if User.objects.filter(pk=user_id).exists():
+            # Повторная отметка игнорируется.
+            StaleSuggestions.objects.bulk_create(
+                [StaleSuggestions(user_id=user_id)], ignore_conflicts=True)
+
+    transaction.on_commit(mark)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    """Запоминает исходную группу, чтобы заметить её смену при сохранении."""
+    instance._loaded_group_id = instance.__dict__.get('group_id', DEFERRED)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    """Обновляет статистику групп, архив и окна лент при создании поста
+    или смене группы."""
+    old_group_id = None if created else instance._loaded_group_id
+    if created:
+        record_posts([instance])
+        add_posts([instance])
+    if old_group_id is DEFERRED:
+        return
+    if old_group_id != instance.group_id:
+        apply_post_delta(old_group_id, instance.author_id, -1,
+                         instance.pub_date)
+        apply_post_delta(instance.group_id, instance.author_id, 1,
+                         instance.pub_date)
+        if not created:
+            record_group_change(instance, old_group_id)
+            move_post(instance, old_group_id)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_init, sender=Post)
+def remember_post_image(sender, instance, **kwargs):
+    instance._loaded_image = instance.__dict__.get('image', DEFERRED)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, **kwargs):
+    """Переносит ссылку на файл картинки при создании поста или замене
+    картинки."""
+    old_image = '' if created else instance._loaded_image
+    if old_image is DEFERRED:
+        return
+    old_name = getattr(old_image, 'name', old_image) or ''
+    new_name = instance.image.name or ''
+    if old_name != new_name:
+        retain([new_name])
+        release([old_name])
+    instance._loaded_image = new_name
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    """Сообщает открытым лентам подписок о новом посте после фиксации."""
+    if created:
+        transaction.on_commit(
+            lambda: hub.publish(instance.author_id, instance.id))
+
+
+@receiver(posts_bulk_created, sender=Post)
+def count_bulk_created_posts(sender, objs, **kwargs):
+    apply_bulk_created(objs)
+    record_posts(objs)
+    retain(post.image.name for post in objs)
+    add_posts(objs)
+
+
+@receiver(pre_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    apply_post_delta(instance.group_id, instance.author_id, -1,
+                     instance.pub_date, removed_ids=[instance.id])
+    record_posts([instance], -1)
+    release([instance.image.name])
+    remove_posts([instance])
+
+
+@receiver(posts_bulk_updated, sender=Post)
+def count_bulk_updated_posts(sender, rows, changes, **kwargs):
+    """Переносит порцию постов между группами и снимает ссылки на
+    убранные картинки."""
+    if 'group_id' in changes:
+        moved = [row for row in rows if row.group_id != changes['group_id']]
+        apply_bulk_moved(moved, changes['group_id'])
+        record_group_moves(moved, changes['group_id'])
+        move_posts(moved, changes['group_id'])
+    if 'image' in changes:
+        release([row.image_name for row in rows
+                 if row.image_name != changes['image']])
+
+
+@receiver(posts_bulk_deleted, sender=Post)
+def count_bulk_deleted_posts(sender, rows, **kwargs):
+    apply_bulk_removed(rows)
+    record_posts(rows, -1)
+    release(row.image_name for row in rows)
+    remove_posts(rows)
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.get_or_create(group=instance)
+
+
+@receiver(post_init, sender=Group)
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Post)
+def remember_cached_values(sender, instance, **kwargs):
+    """Запоминает ключевые поля, чтобы при их смене сбросить и старый
+    ключ кеша объектов."""
+    instance._object_cache_values = {
+        object_cache.attname: instance.__dict__.get(object_cache.attname)
+        for object_cache in OBJECT_CACHES[sender]
+    }
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Post)
+def invalidate_cached_object(sender, instance, **kwargs):
+    for object_cache in OBJECT_CACHES[sender]:
+        object_cache.invalidate(instance)
+    remember_cached_values(sender, instance)
+
+
+@receiver(post_save, sender=Post)
+def bump_saved_post_page(sender, instance, created, **kwargs):
+    """Сбрасывает кеш страницы поста, а для нового поста — и страниц
+    постов автора со счётчиком его постов."""
+    bump('post', instance.id)
+    if created:
+        bump('author', instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_page(sender, instance, **kwargs):
+    bump('post', instance.id)
+    bump('author', instance.author_id)
+
+
+@receiver(posts_bulk_created, sender=Post)
+def bump_bulk_created_authors(sender, objs, **kwargs):
+    bump('author', *(post.author_id for post in objs))
+
+
+@receiver(posts_bulk_updated, sender=Post)
+@receiver(posts_bulk_deleted, sender=Post)
+def invalidate_bulk_changed_posts(sender, rows, **kwargs):
+    post_ids = [row.id for row in rows]
+    posts_by_id.forget(post_ids)
+    bump('post', *post_ids)
+
+
+@receiver(posts_bulk_deleted, sender=Post)
+def bump_bulk_deleted_authors(sender, rows, **kwargs):
+    bump('author', *(row.author_id for row in rows))
+
+
+@receiver(comments_bulk_deleted, sender=Comment)
+def bump_bulk_commented_post_pages(sender, post_ids, **kwargs):
+    bump('post', *post_ids)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_commented_post_page(sender, instance, **kwargs):
+    bump('post', instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+def bump_group_pages(sender, instance, **kwargs):
+    bump('group', instance.id)
+
+
+@receiver(post_save, sender=User)
+def bump_author_pages(sender, instance, update_fields=None, **kwargs):
+    """Вход пользователя меняет только last_login, его не учитываем."""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump('author', instance.id)
@@ -0,0 +1,58 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 его содержимого:
+posts/ab/ab12…ef.gif. Одинаковые загрузки получают одно имя и один
+файл на диске, а sorl.thumbnail, который ключует миниатюры по имени
+исходника, строит для них один набор миниатюр. Содержимое файла под
+таким именем никогда не меняется, поэтому его можно отдавать
+с заголовком Cache-Control: immutable. Сколько постов ссылается на
+файл, считает ImageBlob (см. posts/blobs.py); перед проверкой наличия
+файла хранилище защищает его от удаления через blobs.lease().
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def blob_name(digest, name):
+    """Имя файла с хешем digest в каталоге и с расширением из name."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+
+def is_content_addressed(name):
+    return bool(name and HASHED_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл один раз на каждое уникальное содержимое."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        name = blob_name(digest.hexdigest(), name)
+        # Импорт здесь: models импортирует этот модуль.
+        from .blobs import lease
+        lease([name])
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length)
+        if saved != name:
+            # Тот же файл успели записать параллельно: копия не нужна.
+            self.delete(saved)
+        return name
@@ -0,0 +1,20 @@
+from django import template
+
+from ..cards import CardRenderer
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, layout='index', page=None):
+    """Карточка поста в цикле ленты, см. posts.cards. Рендерер с
+    префиксами URL создаётся один раз на рендер страницы; page — все
+    посты страницы, их карточки берутся из кеша одним запросом."""
+    key = ('post_card', layout)
+    if key not in context.render_context:
+        context.render_context[key] = CardRenderer(layout)
+    renderer = context.render_context[key]
+    if page is not None:
+        renderer.prefetch(page)
+    forloop = context.get('forloop')
+    return renderer.card(post, last=forloop is None or forloop['last'])
@@ -0,0 +1,87 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import rebuild_archive
+from ..models import ArchiveBucket, Group, Post
+
+User = get_user_model()
+
+
+class ArchiveTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, text='Сегодня',
+                                       group=cls.group)
+        cls.today = timezone.localtime(cls.post.pub_date)
+
+    def buckets(self, scope, scope_id):
+        return {
+            (bucket.year, bucket.month, bucket.day): bucket.post_count
+            for bucket in ArchiveBucket.objects.filter(scope=scope,
+                                                       scope_id=scope_id)
+        }
+
+    def test_buckets_are_updated_on_write_and_match_rebuild(self):
+        """Корзины обновляются при записи и совпадают с пересчётом"""
+        Post.objects.create(author=self.author, text='Ещё')
+        other = Post.objects.create(author=self.author, text='Удалить')
+        other.delete()
+        month = (self.today.year, self.today.month, 0)
+        self.assertEqual(self.buckets(ArchiveBucket.SITE, 0)[month], 2)
+        self.assertEqual(
+            self.buckets(ArchiveBucket.GROUP, self.group.id)[month], 1)
+        incremental = self.buckets(ArchiveBucket.AUTHOR, self.author.id)
+        rebuild_archive()
+        self.assertEqual(
+            self.buckets(ArchiveBucket.AUTHOR, self.author.id), incremental)
+
+    def test_group_change_moves_post_between_group_archives(self):
+        """Смена группы переносит пост в архив новой группы"""
+        other_group = Group.objects.create(title='Другая', slug='other',
+                                           description='Описание')
+        self.post.group = other_group
+        self.post.save()
+        month = (self.today.year, self.today.month, 0)
+        self.assertEqual(
+            self.buckets(ArchiveBucket.GROUP, self.group.id)[month], 0)
+        self.assertEqual(
+            self.buckets(ArchiveBucket.GROUP, other_group.id)[month], 1)
+        self.post.group = self.group
+        self.post.save()
+
+    def test_archive_pages_show_posts_of_period(self):
+        """Страницы архива выводят посты выбранного периода"""
+        urls = (
+            reverse('posts:archive', kwargs={
+                'year': self.today.year, 'month': self.today.month}),
+            reverse('posts:group_archive', kwargs={
+                'slug': 'group', 'year': self.today.year,
+                'month': self.today.month, 'day': self.today.day}),
+            reverse('posts:profile_archive', kwargs={
+                'username': 'writer', 'year': self.today.year,
+                'month': self.today.month}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(list(response.context['page_obj']),
+                                 [self.post])
+                self.assertEqual(len(response.context['months']), 1)
+
+    def test_empty_and_invalid_periods(self):
+        """Пустой период даёт пустую страницу, несуществующая дата — 404"""
+        last_year = datetime.date.today().year - 1
+        response = self.client.get(reverse(
+            'posts:archive', kwargs={'year': last_year, 'month': 1}))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.client.get(reverse(
+            'posts:archive', kwargs={'year': last_year, 'month': 13}))
+        self.assertEqual(response.status_code, 404)
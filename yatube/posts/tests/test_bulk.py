@@ -0,0 +1,206 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.signals import post_init
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import bulk, timelines
+from ..admin import NO_GROUP
+from ..archive import rebuild_archive
+from ..group_stats import rebuild_group_stats
+from ..models import (ArchiveBucket, Comment, Group, GroupAuthorStats,
+                      GroupStats, ImageBlob, Post, TrendingPost)
+from .utils import SMALL_GIF, TempMediaMixin, commit_callbacks
+
+User = get_user_model()
+
+
+def counters():
+    """Счётчики статистики групп и архива, которые должны совпадать
+    с пересчитанными с нуля."""
+    return (
+        set(GroupStats.objects.values_list('group_id', 'post_count',
+                                           'top_author_ids')),
+        set(GroupAuthorStats.objects.filter(post_count__gt=0).values_list(
+            'group_id', 'author_id', 'post_count')),
+        set(ArchiveBucket.objects.filter(post_count__gt=0).values_list(
+            'scope', 'scope_id', 'year', 'month', 'day', 'post_count')),
+    )
+
+
+class BulkTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_group = Group.objects.create(
+            title='Старая', slug='old', description='Описание')
+        cls.new_group = Group.objects.create(
+            title='Новая', slug='new', description='Описание')
+        for number in range(5):
+            Post.objects.create(author=cls.author, group=cls.old_group,
+                                text=f'Пост {number}')
+        Post.objects.create(author=cls.other, group=cls.new_group,
+                            text='Пост в новой группе')
+        cls.image_post = Post.objects.create(
+            author=cls.other, group=cls.old_group, text='С картинкой',
+            image=SimpleUploadedFile('pic.gif', SMALL_GIF, 'image/gif'))
+        for post in Post.objects.all():
+            Comment.objects.create(post=post, author=cls.other,
+                                   text='Комментарий')
+        TrendingPost.objects.create(post=cls.image_post, score=1,
+                                    computed_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+        self.loaded = []
+        post_init.connect(self.count_loaded, sender=Post)
+        self.addCleanup(post_init.disconnect, self.count_loaded, sender=Post)
+
+    def count_loaded(self, sender, instance, **kwargs):
+        self.loaded.append(instance)
+
+    def assert_counters_rebuilt(self):
+        actual = counters()
+        rebuild_group_stats()
+        rebuild_archive()
+        self.assertEqual(actual, counters())
+
+    def test_reassign_group_in_batches(self):
+        timelines.load(timelines.GROUP, self.old_group.id)
+        timelines.load(timelines.GROUP, self.new_group.id)
+        with commit_callbacks():
+            moved = bulk.reassign_group(
+                Post.objects.filter(group=self.old_group), self.new_group,
+                batch_size=2)
+        self.assertEqual(moved, 6)
+        self.assertEqual(self.loaded, [])
+        self.assertFalse(Post.objects.filter(group=self.old_group).exists())
+        for group in (self.old_group, self.new_group):
+            with self.subTest(group=group.slug):
+                self.assertEqual(
+                    list(timelines.load(timelines.GROUP, group.id).ids),
+                    list(timelines.build(timelines.GROUP, group.id).ids))
+        self.assert_counters_rebuilt()
+
+    def test_remove_from_group(self):
+        bulk.reassign_group(Post.objects.filter(author=self.author), None)
+        self.assertEqual(
+            Post.objects.filter(author=self.author, group=None).count(), 5)
+        self.assert_counters_rebuilt()
+
+    def test_delete_posts_with_comments(self):
+        timelines.load(timelines.SITE, 0)
+        with commit_callbacks():
+            deleted = bulk.delete_posts(
+                Post.objects.filter(group=self.old_group), batch_size=4)
+        self.assertEqual(deleted, 6)
+        self.assertEqual(self.loaded, [])
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(TrendingPost.objects.exists())
+        self.assertFalse(ImageBlob.objects.filter(
+            name=self.image_post.image.name, refcount__gt=0).exists())
+        self.assertEqual(list(timelines.load(timelines.SITE, 0).ids),
+                         list(Post.objects.values_list('id', flat=True)))
+        self.assert_counters_rebuilt()
+
+    def test_clear_images(self):
+        name = self.image_post.image.name
+        self.assertEqual(bulk.clear_images(Post.objects.all()), 1)
+        self.assertFalse(Post.objects.exclude(image='').exists())
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 0)
+
+    def test_changed_posts_leave_object_cache(self):
+        post = Post.objects.filter(group=self.old_group).first()
+        self.client.get(reverse('posts:post_detail', args=(post.id,)))
+        bulk.reassign_group(Post.objects.filter(id=post.id), self.new_group)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.id,)))
+        self.assertEqual(response.context['post'].group, self.new_group)
+
+    def test_delete_comments(self):
+        post = Post.objects.filter(group=self.old_group).first()
+        self.client.get(reverse('posts:post_detail', args=(post.id,)))
+        self.assertEqual(bulk.delete_comments(
+            Comment.objects.filter(post=post)), 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.id,)))
+        self.assertNotContains(response, 'Комментарий')
+
+
+class BulkAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for number in range(3):
+            Post.objects.create(author=cls.admin, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_reassign_all_matching(self):
+        response = self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'reassign_group',
+            'select_across': '1',
+            'index': '0',
+            '_selected_action': [Post.objects.first().id],
+            'group': self.group.id,
+        }, follow=True)
+        self.assertContains(response, 'Перенесено постов: 3')
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 3)
+
+    def test_reassign_needs_explicit_group(self):
+        post = Post.objects.first()
+        data = {
+            'action': 'reassign_group',
+            'index': '0',
+            '_selected_action': [post.id],
+            'group': '',
+        }
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.post(url, data, follow=True)
+        self.assertContains(response, 'Выберите группу')
+        post.refresh_from_db()
+        self.assertIsNone(post.group)
+        self.client.post(url, {**data, 'group': self.group.id})
+        self.client.post(url, {**data, 'group': NO_GROUP})
+        post.refresh_from_db()
+        self.assertIsNone(post.group)
+
+    def test_delete_selected_asks_for_confirmation(self):
+        post = Post.objects.first()
+        data = {
+            'action': 'delete_posts',
+            'index': '0',
+            '_selected_action': [post.id],
+        }
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Будет удалено: посты — 1')
+        self.assertTrue(Post.objects.filter(id=post.id).exists())
+        self.client.post(url, {**data, 'post': 'yes'})
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_delete_all_matching_confirmation_counts_rows(self):
+        response = self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'delete_posts',
+            'select_across': '1',
+            'index': '0',
+            '_selected_action': [Post.objects.first().id],
+        })
+        self.assertContains(response, 'Будет удалено: посты — 3')
+        self.assertContains(response, 'name="select_across" value="1"')
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_default_delete_action_is_replaced(self):
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="reassign_group"')
@@ -0,0 +1,146 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from ..cards import SEPARATOR, CardRenderer
+from ..feed import feed_rows
+from ..models import Group, Post
+from .utils import SMALL_GIF, TempMediaMixin
+
+User = get_user_model()
+
+
+def fake_thumbnail(image, geometry, **options):
+    return SimpleNamespace(url=f'/media/cache/{geometry}/{image.name}?a=1&b=2')
+
+
+class CardRendererTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='o.henry+1@x', first_name='О. <Генри>',
+            last_name='& Ко')
+        cls.group = Group.objects.create(
+            title='Рассказы', slug='stories', description='Описание')
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Короткий <b>пост</b>')
+        Post.objects.create(author=cls.author, text='слово ' * 100)
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('posts.cards.get_thumbnail', fake_thumbnail)
+    def test_cards_render_post_fields(self):
+        sources = {
+            'модели': list(Post.objects.select_related('author', 'group')),
+            'строки ленты': feed_rows(Post.objects.all()),
+        }
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        for layout in ('index', 'group', 'profile'):
+            for source, posts in sources.items():
+                with self.subTest(layout=layout, source=source):
+                    html = CardRenderer(layout).render(posts)
+                    articles = 1 if layout == 'profile' else 2
+                    self.assertEqual(html.count('<article>'),
+                                     articles * len(posts))
+                    self.assertEqual(html.count('<hr>'), len(posts) - 1)
+                    self.assertNotIn(SEPARATOR, html)
+                    self.assertEqual(
+                        html.count(f'<a href="{profile_url}">'), len(posts))
+                    self.assertEqual(
+                        html.count(f'<a href="{group_url}">'), 2)
+                    self.assertIn('Автор: О. &lt;Генри&gt; &amp; Ко', html)
+                    self.assertIn('<img class="card-img my-2" '
+                                  'src="/media/cache/960x339/', html)
+                    self.assertIn('?a=1&amp;b=2"', html)
+                    self.assertIn('читать дальше', html)
+                    self.assertIn('&lt;b&gt;пост&lt;/b&gt;', html)
+                    self.assertEqual(html, Template(
+                        '{% load post_cards %}{% for post in posts %}'
+                        '{% post_card post "' + layout + '" %}{% endfor %}'
+                    ).render(Context({'posts': posts})))
+
+    def test_empty_page(self):
+        self.assertEqual(CardRenderer('profile').render([]), '')
+
+    def test_feed_pages_render_cards(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'все посты пользователя')
+                self.assertContains(
+                    response, reverse('posts:profile',
+                                      args=(self.author.username,)))
+
+
+class CardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(
+            title='Проза', slug='prose', description='Описание')
+        for number in range(3):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self):
+        posts = feed_rows(Post.objects.all())
+        with mock.patch.object(CardRenderer, 'render_head',
+                               autospec=True,
+                               side_effect=CardRenderer.render_head) as head:
+            html = CardRenderer('group').render(posts)
+        return html, head.call_count
+
+    def test_cards_are_cached_between_pages(self):
+        html, rendered = self.render()
+        self.assertEqual(rendered, 3)
+        self.assertEqual(self.render(), (html, 0))
+        self.assertEqual(html.count('<hr>'), 2)
+
+    def test_page_reads_versions_and_cards_once(self):
+        self.render()
+        posts = feed_rows(Post.objects.all())
+        with mock.patch('posts.cards.cache.get_many',
+                        wraps=cache.get_many) as get_many:
+            CardRenderer('group').render(posts)
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_post_author_and_group_changes_invalidate_cards(self):
+        post = Post.objects.first()
+        changes = (
+            lambda: Post.objects.get(id=post.id).save(),
+            lambda: User.objects.filter(id=self.author.id).first().save(),
+            lambda: Group.objects.get(id=self.group.id).save(),
+        )
+        for change in changes:
+            with self.subTest(change=change):
+                self.render()
+                change()
+                self.assertGreater(self.render()[1], 0)
+
+    def test_author_rename_shows_in_cards(self):
+        self.render()
+        self.author.first_name = 'Фёдор'
+        self.author.save()
+        html, _ = self.render()
+        self.assertIn('Автор: Фёдор', html)
+        self.assertNotIn('Автор: Лев', html)
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import deletion
+from ..forms import PostForm
+from ..models import (Comment, Deletion, Follow, FollowSuggestion, Group,
+                      GroupStats, Post)
+from .utils import commit_callbacks
+
+User = get_user_model()
+
+
+class DeletionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='prolific')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Большая группа', slug='big', description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5))
+        cls.reader_post = Post.objects.create(
+            author=cls.reader, group=cls.group, text='Пост читателя')
+        Comment.objects.create(post=cls.reader_post, author=cls.author,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_scheduled_user_is_hidden(self):
+        post = Post.objects.filter(author=self.author).first()
+        self.client.get(reverse('posts:index'))
+        scheduled = deletion.schedule(self.author)
+        self.assertEqual(scheduled.total, 7)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertEqual(self.client.get(reverse(
+            'posts:profile', args=(self.author.username,))).status_code, 404)
+        self.assertEqual(self.client.get(reverse(
+            'posts:post_detail', args=(post.id,))).status_code, 404)
+        for url in (reverse('posts:group_list', args=(self.group.slug,)),
+                    reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn(post, response.context['page_obj'])
+        self.assertEqual(
+            deletion.visible(Post.objects.all()).get(), self.reader_post)
+
+    def test_scheduled_user_is_hidden_everywhere(self):
+        post = Post.objects.filter(author=self.author).first()
+        FollowSuggestion.objects.create(
+            user=self.reader, author=self.author, score=1)
+        detail = reverse('posts:post_detail', args=(self.reader_post.id,))
+        self.assertContains(self.client.get(detail), 'Комментарий')
+        with commit_callbacks():
+            deletion.schedule(self.author)
+        self.assertNotContains(self.client.get(detail), 'Комментарий')
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_index')).context[
+                'suggestions'], [])
+        for url in (reverse('posts:profile_follow',
+                            args=(self.author.username,)),
+                    reverse('posts:add_comment', args=(post.id,)),
+                    reverse('posts:post_comments', args=(post.id,))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_scheduled_group_is_not_selectable(self):
+        deletion.schedule(self.group)
+        self.assertNotIn(self.group, PostForm().fields['group'].queryset)
+        self.assertIn(self.group, PostForm(
+            instance=self.reader_post).fields['group'].queryset)
+
+    def test_user_is_deleted_in_batches(self):
+        scheduled = deletion.schedule(self.author)
+        processed = [deletion.run_step(scheduled, batch_size=2)
+                     for _ in range(3)]
+        self.assertEqual(processed, [1, 1, 2])
+        self.assertEqual(Deletion.objects.get().done, 4)
+        out = StringIO()
+        call_command('process_deletions', batch_size=2, pause=0, stdout=out)
+        self.assertIn('7 из 7 строк, завершено', out.getvalue())
+        self.assertFalse(User.objects.filter(id=self.author.id).exists())
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).post_count, 1)
+        self.assertEqual(deletion.hidden_ids(Deletion.USER), set())
+        self.assertEqual(Deletion.objects.get().progress, 1)
+
+    def test_group_posts_are_detached_in_batches(self):
+        scheduled = deletion.schedule(self.group)
+        self.assertEqual(scheduled.total, 6)
+        self.assertEqual(self.client.get(reverse(
+            'posts:group_list', args=(self.group.slug,))).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('posts:group_index')),
+                               self.group.title)
+        deletion.run(scheduled, batch_size=4)
+        self.assertFalse(Group.objects.filter(id=self.group.id).exists())
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 6)
+        self.assertEqual(Deletion.objects.get().done, 6)
+        self.assertEqual(deletion.hidden_ids(Deletion.GROUP), set())
+        response = self.client.get(reverse(
+            'posts:post_detail', args=(self.reader_post.id,)))
+        self.assertIsNone(response.context['post'].group)
+
+    def test_admin_action_schedules_deletion(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'schedule_deletion',
+            '_selected_action': [self.author.id, admin.id],
+        })
+        self.assertEqual(list(Deletion.objects.values_list(
+            'kind', 'object_id')), [(Deletion.USER, self.author.id)])
+        response = self.client.get(
+            reverse('admin:posts_deletion_changelist'))
+        self.assertContains(response, 'prolific')
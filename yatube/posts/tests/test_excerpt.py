@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import EXCERPT_LENGTH, Post
+
+User = get_user_model()
+
+
+class PostExcerptTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.long_text = 'слово ' * 1000 + 'ФИНАЛ'
+        cls.post = Post.objects.create(author=cls.author, text=cls.long_text)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_excerpt_and_length_are_stored_on_save(self):
+        self.assertEqual(self.post.text_length, len(self.long_text))
+        self.assertLessEqual(len(self.post.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(self.long_text.startswith(self.post.excerpt))
+        self.assertFalse(self.post.excerpt.endswith(' '))
+        self.assertTrue(self.post.is_truncated)
+        self.post.text = 'Коротко'
+        self.post.save(update_fields=['text'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, 'Коротко')
+        self.assertFalse(self.post.is_truncated)
+
+    def test_bulk_created_posts_get_excerpt(self):
+        posts = Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(3))
+        self.assertEqual([post.excerpt for post in posts],
+                         ['Пост 0', 'Пост 1', 'Пост 2'])
+        self.assertEqual(Post.objects.get(id=posts[0].id).text_length, 6)
+
+    def test_str_of_deferred_post_uses_excerpt(self):
+        post = Post.objects.defer('text').get(id=self.post.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(post), self.long_text[:15])
+
+    def test_feeds_render_excerpt_without_loading_text(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                post = response.context['page_obj'][0]
+                self.assertIn('text', post.get_deferred_fields())
+                self.assertContains(response, 'читать дальше')
+                self.assertNotContains(response, 'ФИНАЛ')
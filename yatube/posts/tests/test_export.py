@@ -0,0 +1,79 @@
+import io
+import json
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from .utils import SMALL_GIF, TempMediaMixin
+
+User = get_user_model()
+
+
+class ExportTest(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='exporter')
+        cls.other = User.objects.create(username='other')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост, с "кавычками"',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Свой коммент')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Чужой коммент')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+        self.url = reverse('posts:profile_export',
+                           kwargs={'username': 'exporter'})
+
+    def test_export_is_available_only_to_owner(self):
+        """Выгрузка чужих данных запрещена"""
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_jsonl_export_streams_posts_and_comments(self):
+        """JSONL содержит посты и только свои комментарии"""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        lines = [json.loads(line) for line in
+                 b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['type'] for line in lines],
+                         ['post', 'comment'])
+        self.assertEqual(lines[1]['text'], 'Свой коммент')
+
+    def test_csv_export_quotes_text(self):
+        """CSV корректно экранирует текст"""
+        response = self.client.get(self.url, {'format': 'csv',
+                                              'kind': 'posts'})
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"Пост, с ""кавычками"""', content)
+        self.assertTrue(content.startswith('id,pub_date,group__slug'))
+
+    def test_zip_export_bundles_images(self):
+        """Архив zip содержит данные и картинки"""
+        response = self.client.get(self.url, {'format': 'zip'})
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [
+            'posts.jsonl', 'comments.jsonl', f'images/{self.post.image.name}'
+        ])
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'), SMALL_GIF)
+
+    def test_management_command_writes_export(self):
+        """Команда выгрузки пишет те же данные в файл"""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as output:
+            call_command('export_user_data', 'exporter', format='csv',
+                         kind='comments', output=output.name)
+            content = open(output.name, encoding='utf-8').read()
+        self.assertIn('Свой коммент', content)
+        self.assertNotIn('Чужой коммент', content)
@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..feed import AuthorRow, FeedRow, feed_rows
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedRowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Проза', slug='prose', description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text='слово ' * 100 + f'пост {number}')
+            for number in range(3)
+        ]
+        cls.no_group = Post.objects.create(author=cls.author, text='Коротко')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_carry_fields_used_by_templates(self):
+        rows = feed_rows(Post.objects.filter(id=self.posts[0].id))
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertIsInstance(row, FeedRow)
+        self.assertEqual(row.id, self.posts[0].id)
+        self.assertEqual(row.excerpt, self.posts[0].excerpt)
+        self.assertTrue(row.is_truncated)
+        self.assertEqual(row.author.username, 'writer')
+        self.assertEqual(row.author.get_full_name(), 'Лев Толстой')
+        self.assertEqual(row.group.slug, 'prose')
+        self.assertFalse(row.image)
+        self.assertFalse(hasattr(row, '__dict__'))
+
+    def test_authors_and_groups_are_shared(self):
+        rows = feed_rows(Post.objects.all())
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len({id(row.author) for row in rows}), 1)
+        grouped = [row for row in rows if row.group is not None]
+        self.assertEqual(len({id(row.group) for row in grouped}), 1)
+        self.assertIn(None, [row.group for row in rows])
+        self.assertIsInstance(rows[0].author, AuthorRow)
+
+    def test_feed_pages_render_rows_without_loading_posts(self):
+        urls = (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                feed = response.context['feed']
+                self.assertTrue(all(isinstance(row, FeedRow)
+                                    for row in feed))
+                self.assertFalse(
+                    response.context['page_obj'].object_list._result_cache)
+                self.assertContains(response, 'читать дальше')
+                self.assertContains(
+                    response,
+                    reverse('posts:post_detail', args=(self.posts[0].id,)))
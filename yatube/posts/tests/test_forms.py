@@ -1,22 +1,17 @@
-import shutil
-import tempfile
-
+import hashlib
 from http import HTTPStatus
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, TestCase
 from django.urls import reverse
 
 from ..forms import CommentForm, PostForm
 from ..models import Comment, Group, Post
-
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+from .utils import SMALL_GIF, TempMediaMixin
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostFormsTest(TestCase):
+class PostFormsTest(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -34,11 +29,6 @@ class PostFormsTest(TestCase):
         )
         cls.form = PostForm()
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client_1 = Client()
@@ -50,17 +40,10 @@ class PostFormsTest(TestCase):
         """Проверка работы редиректа, создания поста
          и наличия новой записи после ее создания """
         posts_amount = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         form_data = {
@@ -79,7 +62,7 @@ class PostFormsTest(TestCase):
         self.assertTrue(Post.objects.filter(
             text='Содержание только что созданного поста',
             group=self.group,
-            image='posts/small.gif'
+            image=f'posts/{digest[:2]}/{digest}.gif'
         ).exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
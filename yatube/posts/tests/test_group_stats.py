@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import bulk, deletion, group_stats
+from ..deletion import hidden_ids
+from ..group_stats import TOP_AUTHORS, rebuild_group_stats
+from ..models import Deletion, Group, GroupAuthorStats, GroupStats, Post
+
+User = get_user_model()
+
+
+class GroupStatsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create(username='first')
+        cls.second = User.objects.create(username='second')
+        cls.cats = Group.objects.create(title='Коты', slug='cats',
+                                        description='Про котов')
+        cls.dogs = Group.objects.create(title='Собаки', slug='dogs',
+                                        description='Про собак')
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_stats_follow_post_create_move_and_delete(self):
+        """Статистика обновляется при создании, переносе и удалении"""
+        post = Post.objects.create(author=self.first, text='1',
+                                   group=self.cats)
+        Post.objects.create(author=self.second, text='2', group=self.cats)
+        Post.objects.create(author=self.second, text='3', group=self.cats)
+        self.assertEqual(self.stats(self.cats).post_count, 3)
+        self.assertEqual(self.stats(self.cats).top_author_ids,
+                         f'{self.second.id},{self.first.id}')
+        post.group = self.dogs
+        post.save()
+        self.assertEqual(self.stats(self.cats).post_count, 2)
+        self.assertEqual(self.stats(self.dogs).post_count, 1)
+        self.assertEqual(self.stats(self.dogs).last_post_at, post.pub_date)
+        post.delete()
+        self.assertEqual(self.stats(self.dogs).post_count, 0)
+
+    def test_removing_latest_post_recomputes_last_post_at(self):
+        """Уход последнего поста из группы сдвигает дату последнего поста"""
+        older = Post.objects.create(author=self.first, text='1',
+                                    group=self.cats)
+        newest = Post.objects.create(author=self.first, text='2',
+                                     group=self.cats)
+        newest.group = self.dogs
+        newest.save()
+        self.assertEqual(self.stats(self.cats).last_post_at, older.pub_date)
+        older.delete()
+        self.assertIsNone(self.stats(self.cats).last_post_at)
+        bulk.reassign_group(Post.objects.filter(id=newest.id), None)
+        self.assertIsNone(self.stats(self.dogs).last_post_at)
+
+    def test_drifted_counters_do_not_go_negative(self):
+        """Разошедшиеся счётчики не опускаются ниже нуля"""
+        post = Post.objects.create(author=self.first, text='1',
+                                   group=self.cats)
+        GroupStats.objects.filter(group=self.cats).update(post_count=0)
+        GroupAuthorStats.objects.filter(group=self.cats).update(post_count=0)
+        post.delete()
+        self.assertEqual(self.stats(self.cats).post_count, 0)
+        self.assertEqual(GroupAuthorStats.objects.get(
+            group=self.cats, author=self.first).post_count, 0)
+
+    def test_bulk_create_is_counted_and_rebuild_matches(self):
+        """bulk_create учитывается, полный пересчёт даёт то же самое"""
+        Post.objects.bulk_create(
+            Post(author=self.first, text=str(i), group=self.dogs)
+            for i in range(5)
+        )
+        incremental = self.stats(self.dogs)
+        rebuild_group_stats()
+        rebuilt = self.stats(self.dogs)
+        self.assertEqual(incremental.post_count, 5)
+        self.assertEqual(rebuilt.post_count, 5)
+        self.assertEqual(incremental.top_author_ids, rebuilt.top_author_ids)
+
+    def test_bulk_create_assigns_ids_of_new_rows(self):
+        """Созданные посты получают id своих строк"""
+        Post.objects.create(author=self.second, text='раньше')
+        posts = Post.objects.bulk_create(
+            Post(author=self.first, text=str(i), group=self.dogs)
+            for i in range(3)
+        )
+        self.assertEqual(
+            [Post.objects.get(id=post.id).text for post in posts],
+            ['0', '1', '2'])
+
+    def test_bulk_create_rejects_ignore_conflicts(self):
+        """Пропуск строк не поддерживается: сводки бы разошлись"""
+        with self.assertRaises(ValueError):
+            Post.objects.bulk_create(
+                [Post(author=self.first, text='1', group=self.dogs)],
+                ignore_conflicts=True)
+        self.assertEqual(self.stats(self.dogs).post_count, 0)
+
+    def test_group_index_is_served_from_rollup(self):
+        """Каталог групп читает только сводные таблицы"""
+        Post.objects.create(author=self.first, text='1', group=self.cats)
+        # Набор удаляемых групп кешируется и в запросы каталога не входит.
+        hidden_ids(Deletion.GROUP)
+        hidden_ids(Deletion.USER)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('posts:group_index'))
+        groups = list(response.context['page_obj'])
+        self.assertEqual(groups, [self.cats, self.dogs])
+        self.assertEqual(groups[0].summary.post_count, 1)
+        self.assertEqual(groups[0].top_authors, [self.first])
+        self.assertContains(response, 'Всего постов: 0')
+
+    def test_group_index_skips_authors_being_deleted(self):
+        """Удаляемые авторы не показываются среди активных"""
+        Post.objects.create(author=self.first, text='1', group=self.cats)
+        Post.objects.create(author=self.second, text='2', group=self.cats)
+        deletion.schedule(self.first)
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertEqual(response.context['page_obj'][0].top_authors,
+                         [self.second])
+
+    def test_post_outside_top_authors_skips_refresh(self):
+        """Пост автора, не догнавшего тройку, не пересчитывает её"""
+        Post.objects.create(author=self.first, text='1', group=self.cats)
+        authors = [User.objects.create(username=f'author{number}')
+                   for number in range(TOP_AUTHORS)]
+        for author in authors:
+            Post.objects.create(author=author, text='1', group=self.cats)
+            Post.objects.create(author=author, text='2', group=self.cats)
+            Post.objects.create(author=author, text='3', group=self.cats)
+        # Два обновления счётчиков, чтение тройки и сравнение с последним
+        # в ней, а также точка сохранения транзакции и её освобождение.
+        with self.assertNumQueries(6):
+            group_stats.apply_post_delta(self.cats.id, self.first.id, 1)
+        self.assertEqual(self.stats(self.cats).top_author_ids,
+                         ','.join(str(author.id) for author in authors))
+        # Автор догоняет тройку: её чтение и запись добавляют два запроса.
+        with self.assertNumQueries(8):
+            group_stats.apply_post_delta(self.cats.id, self.first.id, 1)
+        self.assertEqual(self.stats(self.cats).top_author_ids.split(',')[0],
+                         str(self.first.id))
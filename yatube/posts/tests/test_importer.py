@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from PIL import Image
+
+from ..importer import Importer
+from ..models import Comment, Group, GroupStats, ImportCheckpoint, Post
+from .utils import TempMediaMixin
+
+User = get_user_model()
+
+
+class ImporterTest(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        Image.new('RGB', (4, 4), 'red').save(
+            os.path.join(self.source_dir, 'red.png'))
+        User.objects.create(username='existing')
+        records = [
+            {'author': 'existing', 'group': {'slug': 'cats',
+                                             'title': 'Коты'},
+             'text': 'Первый', 'pub_date': '2020-01-02T03:04:05+00:00',
+             'image': 'red.png',
+             'comments': [{'author': 'newbie', 'text': 'Ура',
+                           'created': '2020-01-03T00:00:00+00:00'}]},
+            {'author': 'newbie', 'group': 'cats', 'text': 'Второй'},
+            {'author': 'newbie', 'text': 'Третий',
+             'image': 'missing.png'},
+        ]
+        self.path = os.path.join(self.source_dir, 'posts.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.source_dir, ignore_errors=True)
+
+    def test_import_creates_rows_and_keeps_dates(self):
+        """Импорт создаёт пользователей, группы, посты и комментарии"""
+        reports = []
+        posts, comments = Importer(self.path, batch_size=2, workers=1,
+                                   report=reports.append).run()
+        self.assertEqual((posts, comments), (3, 1))
+        self.assertEqual(len(reports), 2)
+        self.assertTrue(User.objects.filter(username='newbie').exists())
+        cats = Group.objects.get(slug='cats')
+        self.assertEqual(cats.title, 'Коты')
+        self.assertEqual(GroupStats.objects.get(group=cats).post_count, 2)
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertTrue(os.path.exists(first.image.path))
+        self.assertEqual(Post.objects.get(text='Третий').image, '')
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, first)
+        self.assertEqual(comment.created.day, 3)
+
+    def test_import_keeps_auto_now_add_for_other_writers(self):
+        """Даты из файла не отключают auto_now_add для других записей"""
+        seen = []
+
+        def report(stats):
+            seen.append(Post._meta.get_field('pub_date').auto_now_add)
+            seen.append(Post.objects.create(
+                author=User.objects.get(username='existing'),
+                text='Параллельно').pub_date.year)
+
+        Importer(self.path, batch_size=1, workers=1, report=report).run()
+        self.assertNotIn(False, seen)
+        self.assertNotIn(2020, seen)
+
+    def test_malformed_lines_are_rejected(self):
+        """Битые строки пропускаются, остальные импортируются"""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('{"author": "newbie", "text": \n')
+            file.write('[1, 2]\n')
+            file.write('{"author": "newbie", "text": "Дата", '
+                       '"pub_date": "вчера"}\n')
+            file.write('{"author": "newbie", "text": "Группа", '
+                       '"group": {"slug": ["cats"]}}\n')
+            file.write('{"author": "newbie", "text": "Группа", '
+                       '"group": 7}\n')
+            file.write('{"author": "newbie", "text": "Картинка", '
+                       '"image": {"path": "red.png"}}\n')
+            file.write('{"author": "newbie", "text": "Четвёртый"}\n')
+        importer = Importer(self.path, batch_size=2, workers=1)
+        self.assertEqual(importer.run(), (4, 1))
+        self.assertEqual([line for line, _ in importer.rejected],
+                         [4, 5, 6, 7, 8, 9])
+        self.assertTrue(Post.objects.filter(text='Четвёртый').exists())
+
+    def test_comments_are_inserted_in_created_order(self):
+        """id импортированных комментариев идут в порядке их дат"""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'author': 'newbie', 'text': 'Обсуждаемый',
+                'comments': [
+                    {'author': 'newbie', 'text': 'Позже',
+                     'created': '2020-01-05T00:00:00+00:00'},
+                    {'author': 'newbie', 'text': 'Раньше',
+                     'created': '2020-01-04T00:00:00'},
+                ]}) + '\n')
+        Importer(self.path, workers=1).run()
+        self.assertEqual(
+            list(Comment.objects.order_by('id').values_list('text',
+                                                            flat=True)),
+            ['Раньше', 'Позже'])
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает с контрольной точки"""
+        ImportCheckpoint.objects.create(name='resume', line=2)
+        out = io.StringIO()
+        call_command('import_posts', self.path, name='resume', workers=1,
+                     stdout=out)
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Третий'])
+        self.assertEqual(ImportCheckpoint.objects.get(name='resume').line, 3)
+        self.assertIn('строк/с', out.getvalue())
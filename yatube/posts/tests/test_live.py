@@ -0,0 +1,103 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .. import views
+from ..live import PostHub, hub
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class PostHubTest(SimpleTestCase):
+
+    def test_subscriber_receives_posts_of_followed_authors_only(self):
+        """Подписчик получает только посты своих авторов"""
+        post_hub = PostHub()
+        with post_hub.subscribe([1, 2]) as subscription:
+            post_hub.publish(1, 10)
+            post_hub.publish(3, 11)
+            post_hub.publish(2, 12)
+            self.assertEqual(subscription.wait(0), [10, 12])
+            self.assertEqual(subscription.wait(0), [])
+        self.assertEqual(post_hub.subscriber_count(), 0)
+
+    def test_waiting_subscriber_is_woken_up(self):
+        """Ожидающее соединение просыпается при публикации"""
+        post_hub = PostHub()
+        subscription = post_hub.subscribe([1])
+        received = []
+        waiter = threading.Thread(
+            target=lambda: received.extend(subscription.wait(5)))
+        waiter.start()
+        post_hub.publish(1, 42)
+        waiter.join(5)
+        self.assertEqual(received, [42])
+        subscription.close()
+
+
+class FollowUpdatesViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.first = Post.objects.create(author=cls.author, text='1')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:follow_updates')
+
+    def test_poll_counts_posts_since_last_seen(self):
+        """Длинный опрос сразу отвечает, если посты уже появились"""
+        second = Post.objects.create(author=self.author, text='2')
+        response = self.client.get(
+            self.url, {'since': self.first.id, 'mode': 'poll'})
+        self.assertEqual(response.json(),
+                         {'count': 1, 'latest': second.id})
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_stream_sends_event_for_published_post(self):
+        """Поток SSE присылает событие о новом посте"""
+        response = self.client.get(self.url, {'since': self.first.id})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        hub.publish(self.author.id, self.first.id + 1)
+        self.assertEqual(
+            next(stream),
+            b'event: posts\ndata: {"count": 1, "latest": %d}\n\n'
+            % (self.first.id + 1))
+        response.close()
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_unread_stream_does_not_subscribe(self):
+        """Ответ, закрытый до чтения потока, не оставляет подписку"""
+        response = self.client.get(self.url, {'since': self.first.id})
+        self.assertEqual(hub.subscriber_count(), 0)
+        response.close()
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_extra_connections_are_refused_with_retry_after(self):
+        """Сверх LIVE_MAX_CONNECTIONS соединений отвечает 503"""
+        held = [hub.subscribe([]) for _ in range(views.LIVE_MAX_CONNECTIONS)]
+        try:
+            response = self.client.get(
+                self.url, {'since': self.first.id, 'mode': 'poll'})
+        finally:
+            for subscription in held:
+                subscription.close()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'],
+                         str(views.LIVE_RETRY_AFTER))
+
+    def test_empty_feed_listens_for_all_new_posts(self):
+        """При пустой ленте подписок уведомления ждут с since=0"""
+        cache.clear()
+        Post.objects.all().delete()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'follow/updates/?since=0')
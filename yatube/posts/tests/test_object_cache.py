@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import object_cache
+from ..models import Group, Post
+from .utils import commit_callbacks
+
+User = get_user_model()
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='cached_author')
+        cls.group = Group.objects.create(title='Кеш', slug='cache',
+                                         description='Группа')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост из кеша')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookup_reads_database_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(object_cache.groups_by_slug.get('cache'),
+                             self.group)
+        with self.assertNumQueries(0):
+            self.assertEqual(object_cache.groups_by_slug.get('cache'),
+                             self.group)
+        with self.assertRaises(Http404):
+            object_cache.groups_by_slug.get_or_404('missing')
+
+    def test_get_many_fetches_misses_in_one_query(self):
+        other = User.objects.create_user(username='other_author')
+        object_cache.users_by_id.get(self.author.id)
+        with self.assertNumQueries(1):
+            users = object_cache.users_by_id.get_many(
+                [self.author.id, other.id, 0])
+        self.assertEqual(users, {self.author.id: self.author,
+                                 other.id: other})
+
+    def test_post_relations_come_from_caches(self):
+        object_cache.get_post_or_404(self.post.id)
+        with self.assertNumQueries(0):
+            post = object_cache.get_post_or_404(self.post.id)
+            self.assertEqual(post.author.username, 'cached_author')
+            self.assertEqual(post.group.slug, 'cache')
+
+    def test_save_and_delete_invalidate(self):
+        object_cache.groups_by_slug.get('cache')
+        group = Group.objects.get(id=self.group.id)
+        group.slug = 'renamed'
+        group.save()
+        self.assertIsNone(object_cache.groups_by_slug.get('cache'))
+        self.assertEqual(object_cache.groups_by_slug.get('renamed').slug,
+                         'renamed')
+        object_cache.posts_by_id.get(self.post.id)
+        Post.objects.get(id=self.post.id).delete()
+        self.assertIsNone(object_cache.posts_by_id.get(self.post.id))
+
+    def test_users_are_cached_without_account_state(self):
+        object_cache.get_user_or_404('cached_author')
+        with self.assertNumQueries(0):
+            user = object_cache.get_user_or_404('cached_author')
+        self.assertEqual(user, self.author)
+        self.assertEqual(user.get_deferred_fields(),
+                         {'password', 'last_login', 'is_superuser', 'email',
+                          'is_staff', 'is_active', 'date_joined'})
+        # Сохранение увеличивает версию пользователя в ключе.
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.assertEqual(
+            object_cache.get_user_or_404('cached_author').first_name,
+            'Новое')
+
+    def test_post_of_missing_author_is_not_found(self):
+        # Пост остался в кеше, а его автора уже удалили.
+        cache.set(object_cache.posts_by_id.key(self.post.id),
+                  Post(id=self.post.id, author_id=0, text='Сирота'))
+        self.assertEqual(object_cache.attach_relations(
+            [object_cache.posts_by_id.get(self.post.id)]), [])
+        with self.assertRaises(Http404):
+            object_cache.get_post_or_404(self.post.id)
+
+    def test_copy_cached_before_commit_is_dropped(self):
+        object_cache.groups_by_slug.get('cache')
+        with commit_callbacks():
+            group = Group.objects.get(id=self.group.id)
+            group.title = 'Новый'
+            group.save()
+            # Чтение до фиксации кладёт в кеш копию, которую другие
+            # соединения видели бы ещё старой.
+            cache.set(object_cache.groups_by_slug.key('cache'), self.group)
+        self.assertEqual(object_cache.groups_by_slug.get('cache').title,
+                         'Новый')
+
+    def test_hit_ratio_is_reported_to_staff(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        for _ in range(2):
+            self.client.get(reverse('posts:group_list', args=('cache',)))
+        stats = client.get(reverse('posts:object_cache_stats')).json()
+        self.assertGreater(stats['posts.group.slug']['hits'], 0)
+        self.assertIsNotNone(stats['posts.group.slug']['hit_ratio'])
+        client.force_login(self.author)
+        self.assertEqual(
+            client.get(reverse('posts:object_cache_stats')).status_code,
+            403)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostDetailCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='page_author')
+        cls.reader = User.objects.create_user(username='page_reader')
+        cls.group = Group.objects.create(title='Старое название',
+                                         slug='page-cache',
+                                         description='Группа')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Исходный текст')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:post_detail', args=(self.post.id,))
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_warm_anonymous_page_needs_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Исходный текст')
+
+    def test_personal_parts_are_rendered_per_user(self):
+        self.client.get(self.url)
+        self.reader_client.get(self.url)
+        edit_url = reverse('posts:post_edit', args=(self.post.id,))
+        anonymous = self.client.get(self.url)
+        self.assertNotContains(anonymous, 'Добавить комментарий')
+        reader = self.reader_client.get(self.url)
+        self.assertContains(reader, 'Добавить комментарий')
+        self.assertNotContains(reader, edit_url)
+        self.assertContains(self.author_client.get(self.url), edit_url)
+
+    def test_comment_and_edit_refresh_page(self):
+        self.client.get(self.url)
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Свежий комментарий'})
+        self.assertContains(self.client.get(self.url), 'Свежий комментарий')
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.id,)),
+            {'text': 'Исправленный текст'})
+        self.assertContains(self.client.get(self.url), 'Исправленный текст')
+        Comment.objects.filter(post=self.post).delete()
+        self.assertNotContains(self.client.get(self.url),
+                               'Свежий комментарий')
+
+    def test_group_and_author_changes_refresh_page(self):
+        self.client.get(self.url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.client.get(self.url), 'Новое название')
+        Post.objects.create(author=self.author, text='Второй пост')
+        response = self.client.get(self.url)
+        self.assertContains(response, '<span >2</span>', html=False)
+
+    def test_login_does_not_refresh_page(self):
+        self.client.get(self.url)
+        self.author.save(update_fields=['last_login'])
+        # Автор перечитывается в кеш объектов, фрагменты остаются.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, StaleSuggestions
+from ..recommendations import build_suggestions, refresh_stale_suggestions
+from .utils import commit_callbacks
+
+User = get_user_model()
+
+
+class FollowSuggestionsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol, cls.dave, cls.erin = (
+            User.objects.create(username=name)
+            for name in ('alice', 'bob', 'carol', 'dave', 'erin')
+        )
+        for user, author in (
+            (cls.alice, cls.bob),
+            (cls.bob, cls.carol),
+            (cls.bob, cls.dave),
+            (cls.erin, cls.bob),
+            (cls.erin, cls.dave),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def suggested(self, user):
+        return list(FollowSuggestion.objects.filter(user=user)
+                    .values_list('author__username', flat=True))
+
+    def test_second_degree_and_co_follow_candidates_are_ranked(self):
+        """Кандидаты второго круга и совместных подписок ранжируются"""
+        build_suggestions()
+        self.assertEqual(self.suggested(self.alice), ['dave', 'carol'])
+        self.assertEqual(self.suggested(self.erin), ['carol'])
+
+    def test_followed_authors_and_self_are_not_suggested(self):
+        """Не рекомендуются уже отслеживаемые авторы и сам пользователь"""
+        build_suggestions()
+        for user in (self.alice, self.bob, self.erin):
+            with self.subTest(user=user.username):
+                suggested = self.suggested(user)
+                self.assertNotIn(user.username, suggested)
+                followed = user.follower.values_list('author__username',
+                                                     flat=True)
+                self.assertFalse(set(suggested) & set(followed))
+
+    def test_co_followers_are_weighted_by_shared_authors(self):
+        """Похожие подписчики с большим числом общих авторов весят больше"""
+        frank, gina, henry, ivan = (
+            User.objects.create(username=name)
+            for name in ('frank', 'gina', 'henry', 'ivan'))
+        Follow.objects.create(user=self.alice, author=self.carol)
+        for author in (self.bob, self.carol, gina):
+            Follow.objects.create(user=frank, author=author)
+        for author in (self.bob, ivan):
+            Follow.objects.create(user=henry, author=author)
+        build_suggestions()
+        scores = dict(FollowSuggestion.objects.filter(
+            user=self.alice).values_list('author__username', 'score'))
+        self.assertEqual(scores['gina'], 0.5)
+        self.assertEqual(scores['ivan'], 0.25)
+
+    def test_users_without_follows_are_cleared(self):
+        """Полный пересчёт убирает рекомендации отписавшихся от всех"""
+        build_suggestions()
+        with commit_callbacks():
+            Follow.objects.filter(user=self.alice).delete()
+        self.assertTrue(StaleSuggestions.objects.filter(
+            user=self.alice).exists())
+        build_suggestions()
+        self.assertEqual(self.suggested(self.alice), [])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_only_stale_users_are_refreshed(self):
+        """Инкрементальный пересчёт затрагивает только изменённых"""
+        build_suggestions()
+        self.assertFalse(StaleSuggestions.objects.exists())
+        with commit_callbacks():
+            Follow.objects.create(user=self.alice, author=self.dave)
+        self.assertEqual(refresh_stale_suggestions(), 1)
+        self.assertEqual(self.suggested(self.alice), ['carol'])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_suggestions_are_shown_on_follow_index(self):
+        """Рекомендации выводятся на странице подписок"""
+        build_suggestions()
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['suggestions'],
+                         [self.dave, self.carol])
+
+
+class DeleteFollowerTest(TransactionTestCase):
+
+    def test_user_with_follows_can_be_deleted(self):
+        """Удаление подписчика не оставляет отметку о его рекомендациях"""
+        reader, author = (User.objects.create(username=name)
+                          for name in ('reader', 'author'))
+        Follow.objects.create(user=reader, author=author)
+        reader.delete()
+        self.assertFalse(User.objects.filter(id=reader.id).exists())
+        self.assertFalse(StaleSuggestions.objects.exists())
+        author.delete()
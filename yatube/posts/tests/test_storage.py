@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase
+
+from core.views import media
+
+from .. import blobs
+from ..blobs import find_orphans, purge_images
+from ..models import ImageBlob, ImageDeletion, Post
+from ..storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+from .utils import SMALL_GIF, TempMediaMixin
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='meme_lord')
+
+    def create_post(self, name='meme.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text='Мем',
+            image=SimpleUploadedFile(name, content, 'image/gif'))
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковые загрузки хранятся в одном файле с именем из хеша."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('copy.GIF')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(first.image.name,
+                         f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(os.listdir(os.path.dirname(first.image.path)),
+                         [os.path.basename(first.image.path)])
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).refcount, 2)
+
+    @mock.patch.object(blobs, 'IMAGE_LEASE', 0)
+    def test_file_is_deleted_with_last_reference(self):
+        first = self.create_post()
+        second = self.create_post()
+        name, path = first.image.name, first.image.path
+        first.delete()
+        purge_images([name])
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        purge_images([name])
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+
+    def test_replacing_image_moves_reference(self):
+        post = self.create_post()
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\x00',
+                                        'image/gif')
+        post.save()
+        self.assertEqual(ImageBlob.objects.get(name=old_name).refcount, 0)
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).refcount, 1)
+
+    def test_bulk_created_posts_are_counted(self):
+        name = self.create_post().image.name
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Копия', image=name)
+            for _ in range(3))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 4)
+
+    def test_hashed_media_is_served_as_immutable(self):
+        name = self.create_post().image.name
+        self.assertTrue(is_content_addressed(name))
+        self.assertFalse(is_content_addressed('posts/small.gif'))
+        response = media(RequestFactory().get(f'/media/{name}'), name)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+
+class ImageCleanupTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='cleaner')
+
+    def create_post(self, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text='Пост',
+            image=SimpleUploadedFile('pic.gif', content, 'image/gif'))
+
+    @mock.patch.object(blobs, 'IMAGE_LEASE', 0)
+    def test_cascade_delete_queues_and_purges_images(self):
+        path = self.create_post().image.path
+        self.author.delete()
+        self.assertEqual(ImageDeletion.objects.count(), 1)
+        self.assertEqual(purge_images(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageDeletion.objects.exists())
+
+    def test_fresh_upload_of_queued_file_keeps_it(self):
+        path = self.create_post().image.path
+        self.author.delete()
+        ImageBlob.objects.update(leased_at=None)
+        # Тот же файл загружают снова, пост ещё не сохранён.
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/again.gif', SimpleUploadedFile(
+            'again.gif', SMALL_GIF, 'image/gif'))
+        self.assertEqual(purge_images(), 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ImageDeletion.objects.get().name, name)
+        with mock.patch.object(blobs, 'IMAGE_LEASE', 0):
+            self.assertEqual(purge_images(), 1)
+        self.assertFalse(os.path.exists(path))
+
+    def test_rolled_back_change_keeps_image(self):
+        post = self.create_post()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            post.delete()
+            raise RuntimeError
+        self.assertFalse(ImageDeletion.objects.exists())
+        self.assertEqual(purge_images(), 0)
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_orphans_are_found_by_streaming_scan(self):
+        kept = self.create_post().image.name
+        orphan = self.create_post(SMALL_GIF + b'\x01')
+        orphan_path = orphan.image.path
+        Post.objects.filter(id=orphan.id).update(image='')
+        self.assertEqual(list(find_orphans(min_age=0, batch_size=1)),
+                         [orphan.image.name])
+        self.assertEqual(list(find_orphans(min_age=3600)), [])
+        old = time.time() - 7200
+        os.utime(orphan_path, (old, old))
+        call_command('reconcile_images', delete=True, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertEqual(Post.objects.get(image=kept).image.name, kept)
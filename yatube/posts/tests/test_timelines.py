@@ -0,0 +1,222 @@
+from array import array
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timelines
+from ..models import Follow, Group, Post
+from ..timelines import AUTHOR, GROUP, SITE, Timeline
+from .utils import commit_callbacks
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def test_insert_keeps_order_and_window_length(self):
+        timeline = Timeline(0, array('q'))
+        with mock.patch.object(timelines, 'TIMELINE_LENGTH', 3):
+            for stamp, post_id in ((10, 1), (30, 3), (20, 2), (40, 4)):
+                timeline.insert(stamp, post_id)
+        self.assertEqual(list(timeline.ids), [4, 3, 2])
+        self.assertEqual(timeline.count, 4)
+        self.assertFalse(timeline.complete)
+        self.assertEqual(timeline.slice(0, 2), [4, 3])
+        self.assertIsNone(timeline.slice(2, 4))
+        timeline.insert(5, 5)
+        self.assertEqual(list(timeline.ids), [4, 3, 2])
+
+    def test_remove_and_bytes_round_trip(self):
+        timeline = Timeline(2, array('q', (20, 2, 10, 1)))
+        timeline.remove(2)
+        restored = Timeline.frombytes(timeline.tobytes())
+        self.assertEqual(restored.count, 1)
+        self.assertEqual(list(restored.ids), [1])
+        self.assertTrue(restored.complete)
+        self.assertEqual(restored.slice(0, 10), [1])
+
+    def test_merge_interleaves_windows(self):
+        first = Timeline(3, array('q', (50, 5, 30, 3, 10, 1)))
+        second = Timeline(2, array('q', (40, 4, 20, 2)))
+        self.assertEqual(timelines.merge([first, second], 0, 10),
+                         [5, 4, 3, 2, 1])
+        self.assertEqual(timelines.merge([first, second], 1, 3), [4, 3])
+
+    def test_merge_stops_at_incomplete_window(self):
+        complete = Timeline(3, array('q', (50, 5, 30, 3, 10, 1)))
+        # У второй ленты за окном есть посты старше 40.
+        partial = Timeline(5, array('q', (60, 6, 40, 4)))
+        self.assertEqual(timelines.merge([complete, partial], 0, 3),
+                         [6, 5, 4])
+        self.assertIsNone(timelines.merge([complete, partial], 0, 4))
+        self.assertIsNone(timelines.merge([complete, partial], 3, 10))
+
+
+class TimelineSignalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text=f'Пост {number}')
+                     for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, kind, object_id):
+        return list(timelines.load(kind, object_id).ids)
+
+    def test_timelines_follow_created_and_deleted_posts(self):
+        expected = [post.id for post in reversed(self.posts)]
+        for kind, object_id in ((SITE, 0), (GROUP, self.group.id),
+                                (AUTHOR, self.author.id)):
+            self.assertEqual(self.ids(kind, object_id), expected)
+        with commit_callbacks():
+            new_post = Post.objects.create(
+                author=self.author, group=self.group, text='Новый')
+            created = Post.objects.bulk_create(
+                [Post(author=self.author, text='Пачка')])
+            self.posts[0].delete()
+        with self.assertNumQueries(0):
+            site = timelines.load(SITE, 0)
+            group = timelines.load(GROUP, self.group.id)
+        self.assertEqual(list(site.ids), [created[0].id, new_post.id]
+                         + expected[:2])
+        self.assertEqual(site.count, 4)
+        self.assertEqual(list(group.ids), [new_post.id] + expected[:2])
+
+    def test_group_change_moves_post(self):
+        self.ids(GROUP, self.group.id)
+        self.ids(GROUP, self.other_group.id)
+        post = Post.objects.get(id=self.posts[1].id)
+        post.group = self.other_group
+        with commit_callbacks():
+            post.save()
+        with self.assertNumQueries(0):
+            self.assertNotIn(post.id, self.ids(GROUP, self.group.id))
+            self.assertEqual(self.ids(GROUP, self.other_group.id), [post.id])
+
+    def test_changes_wait_for_commit(self):
+        self.ids(GROUP, self.group.id)
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Не зафиксирован')
+        self.assertNotIn(post.id, timelines.Timeline.frombytes(cache.get(
+            timelines._key(GROUP, self.group.id))[1]).ids)
+
+    def test_window_built_before_commit_is_not_stored(self):
+        build = timelines.build
+        created = []
+
+        def build_then_commit(kind, object_id):
+            timeline = build(kind, object_id)
+            with commit_callbacks():
+                created.append(Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'))
+            return timeline
+
+        with mock.patch.object(timelines, 'build', build_then_commit):
+            stale = timelines.load(GROUP, self.group.id)
+        self.assertNotIn(created[0].id, stale.ids)
+        self.assertEqual(self.ids(GROUP, self.group.id)[0], created[0].id)
+
+
+class TimelinePagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(25))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_window_pages_skip_order_by(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        timelines.load(SITE, 0)
+        timelines.load(GROUP, self.group.id)
+        timelines.load(AUTHOR, self.author.id)
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url + '?page=2')
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertEqual(response.context['page_obj'].paginator.count,
+                                 25)
+                self.assertFalse([query for query in queries
+                                  if 'ORDER BY' in query['sql']])
+
+    def test_pages_past_window_and_stale_ids_use_database(self):
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        expected = list(Post.objects.filter(
+            group=self.group).values_list('id', flat=True)[20:])
+        with mock.patch.object(timelines, 'TIMELINE_LENGTH', 10):
+            response = self.client.get(url + '?page=3')
+        self.assertEqual([row.id for row in response.context['feed']],
+                         expected)
+        cache.clear()
+        first_page = list(Post.objects.filter(
+            group=self.group).values_list('id', flat=True)[:10])
+        timelines.load(GROUP, self.group.id)
+        # update() идёт в обход сигналов: окно группы устарело.
+        Post.objects.filter(id=first_page[0]).update(group=None)
+        response = self.client.get(url)
+        self.assertEqual([row.id for row in response.context['feed']][:9],
+                         first_page[1:])
+        self.assertNotIn(first_page[0],
+                         timelines.load(GROUP, self.group.id).ids)
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}')
+            for number in range(5) for author in cls.authors)
+        Follow.objects.bulk_create(Follow(user=cls.reader, author=author)
+                                   for author in cls.authors[:2])
+        cls.expected = list(Post.objects.filter(
+            author__in=cls.authors[:2]).values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self, count=10):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, count)
+        return [row.id for row in response.context['feed']]
+
+    def test_merged_feed_matches_join(self):
+        with mock.patch.object(timelines, 'TIMELINE_LENGTH', 3):
+            self.assertEqual(self.feed_ids(), self.expected)
+        with mock.patch.object(timelines, 'FOLLOW_MERGE_MAX_AUTHORS', 1):
+            self.assertEqual(self.feed_ids(), self.expected)
+
+    def test_merged_feed_uses_shared_author_windows(self):
+        self.feed_ids()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.feed_ids(), self.expected)
+        self.assertFalse([query for query in queries
+                          if 'ORDER BY "posts_post"' in query['sql']])
+        with commit_callbacks():
+            new_post = Post.objects.create(author=self.authors[0],
+                                           text='Новый')
+        self.assertEqual(self.feed_ids(11), [new_post.id] + self.expected[:9])
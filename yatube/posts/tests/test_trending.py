@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Post, TrendingPost
+from ..trending import COMMIT_LAG, HALF_LIFE, update_trending
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.hot = Post.objects.create(author=cls.author, text='Горячий')
+
+    def update(self, now=None):
+        """Расчёт, для которого только что созданные события уже
+        старше COMMIT_LAG."""
+        return update_trending((now or timezone.now()) + COMMIT_LAG)
+
+    def comment(self, post, age=timedelta()):
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='!')
+        Comment.objects.filter(id=comment.id).update(
+            created=timezone.now() - age)
+
+    def test_posts_are_ranked_by_decayed_comment_activity(self):
+        """Свежие комментарии весят больше старых"""
+        for _ in range(2):
+            self.comment(self.hot)
+        for _ in range(3):
+            self.comment(self.quiet, age=HALF_LIFE * 4)
+        self.update()
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('post_id', flat=True)),
+            [self.hot.id, self.quiet.id])
+
+    def test_incremental_update_decays_and_adds_new_events(self):
+        """Повторный расчёт затухает старые оценки и добавляет новые"""
+        self.comment(self.hot)
+        now = timezone.now() + COMMIT_LAG
+        update_trending(now)
+        first = TrendingPost.objects.get(post=self.hot).score
+        update_trending(now + HALF_LIFE)
+        self.assertAlmostEqual(TrendingPost.objects.get(post=self.hot).score,
+                               first / 2, places=3)
+
+    def test_new_follows_boost_recent_posts_of_author(self):
+        """Новые подписки на автора поднимают его свежие посты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.update()
+        self.assertEqual(TrendingPost.objects.count(), 2)
+
+    def test_follows_without_date_are_not_counted(self):
+        """Подписки, сделанные до появления даты, не считаются новыми"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.update(created=None)
+        self.update()
+        self.assertFalse(TrendingPost.objects.exists())
+
+    def test_late_committed_event_is_counted_by_next_run(self):
+        """Событие, зафиксированное после начала расчёта, не теряется"""
+        now = timezone.now()
+        self.comment(self.quiet, age=HALF_LIFE * 4)
+        update_trending(now)
+        # Транзакция началась до расчёта, а зафиксировалась после него.
+        self.comment(self.hot, age=timedelta(seconds=1))
+        update_trending(now + timedelta(seconds=1))
+        self.assertFalse(TrendingPost.objects.filter(post=self.hot).exists())
+        update_trending(now + COMMIT_LAG * 2)
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('post_id', flat=True)),
+            [self.hot.id, self.quiet.id])
+
+    def test_trending_page_shows_ranked_posts(self):
+        """Лента популярного выводит посты в порядке рейтинга"""
+        self.comment(self.quiet)
+        self.update()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.quiet])
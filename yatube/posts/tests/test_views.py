@@ -1,41 +1,30 @@
 import datetime
-import shutil
-import tempfile
 
 from django import forms
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models.fields.files import ImageFieldFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, TestCase
 from django.urls import reverse
 
 from ..forms import CommentForm
+from ..views import COMMENTS_PER_PAGE
 from ..models import Comment, Follow, Group, Post
+from .utils import SMALL_GIF, TempMediaMixin
 
 User = get_user_model()
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostViewsTest(TestCase):
+class PostViewsTest(TempMediaMixin, TestCase):
 
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create(username='Hathaway')
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         cls.group = Group.objects.create(
@@ -56,11 +45,6 @@ class PostViewsTest(TestCase):
             text='Просто коммент',
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -276,3 +260,49 @@ class PostViewsTest(TestCase):
         self.authorized_client.post(reverse('posts:profile_unfollow',
                                             kwargs={'username': 'AAA'}))
         self.assertEqual(Follow.objects.all().count(), 0)
+
+
+class CommentPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Коммент {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        cls.ids = list(Comment.objects.order_by('-id')
+                       .values_list('id', flat=True))
+
+    def test_post_detail_renders_only_first_batch(self):
+        """На странице поста выводится только первая порция комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual([c.id for c in comments],
+                         self.ids[:COMMENTS_PER_PAGE])
+        self.assertTrue(response.context['comments_has_more'])
+
+    def test_fragment_returns_comments_older_than_cursor(self):
+        """Фрагмент отдаёт комментарии старее курсора"""
+        cursor = self.ids[COMMENTS_PER_PAGE - 1]
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'before': cursor, 'format': 'json'})
+        data = response.json()
+        self.assertEqual([c['id'] for c in data['comments']],
+                         self.ids[COMMENTS_PER_PAGE:])
+        self.assertFalse(data['has_more'])
+
+    def test_fragment_returns_comments_newer_than_cursor(self):
+        """Фрагмент отдаёт комментарии новее курсора в HTML"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': self.ids[3]})
+        self.assertEqual(response['X-Has-More'], '0')
+        for comment_id in self.ids[:3]:
+            self.assertContains(response, f'data-comment-id="{comment_id}"')
+        self.assertNotContains(response,
+                               f'data-comment-id="{self.ids[3]}"')
@@ -0,0 +1,90 @@
+import threading
+
+from django.test import RequestFactory, SimpleTestCase
+
+from ..write_queue import WriteQueue, WriteQueueFull, backpressure
+
+
+class WriteQueueTest(SimpleTestCase):
+
+    def test_execute_returns_result_of_write(self):
+        """Писатель возвращает результат изменения ожидающему запросу"""
+        write_queue = WriteQueue()
+        self.assertEqual(write_queue.execute(lambda x: x * 2, 21), 42)
+        write_queue.stop()
+
+    def test_writes_are_grouped_into_batches(self):
+        """Накопившиеся изменения фиксируются одной транзакцией"""
+        write_queue = WriteQueue(batch_size=10)
+        gate = threading.Event()
+        blocker = write_queue.submit(gate.wait)
+        futures = [write_queue.submit(lambda n=n: n) for n in range(10)]
+        gate.set()
+        self.assertEqual([future.result(timeout=5) for future in futures],
+                         list(range(10)))
+        blocker.result(timeout=5)
+        write_queue.stop()
+        self.assertEqual(write_queue.operations, 11)
+        self.assertLess(write_queue.batches, 11)
+
+    def test_error_in_one_write_does_not_break_batch(self):
+        """Ошибка одного изменения не отменяет соседние в пакете"""
+        write_queue = WriteQueue()
+        gate = threading.Event()
+        write_queue.submit(gate.wait)
+        failed = write_queue.submit(lambda: 1 / 0)
+        succeeded = write_queue.submit(lambda: 'ok')
+        gate.set()
+        with self.assertRaises(ZeroDivisionError):
+            failed.result(timeout=5)
+        self.assertEqual(succeeded.result(timeout=5), 'ok')
+        write_queue.stop()
+
+    def test_full_queue_raises_and_view_answers_503(self):
+        """Переполненная очередь даёт 503 с Retry-After"""
+        write_queue = WriteQueue(max_size=1, put_timeout=0.01)
+        started, gate = threading.Event(), threading.Event()
+        write_queue.submit(lambda: (started.set(), gate.wait()))
+        started.wait(5)
+        write_queue.submit(lambda: None)
+
+        @backpressure
+        def view(request):
+            return write_queue.submit(lambda: None)
+
+        with self.assertRaises(WriteQueueFull):
+            write_queue.submit(lambda: None)
+        response = view(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        gate.set()
+        write_queue.stop()
+
+    def test_timed_out_write_is_cancelled_and_view_answers_503(self):
+        """Не дождавшееся писателя изменение отменяется, ответ — 503"""
+        write_queue = WriteQueue()
+        started, gate = threading.Event(), threading.Event()
+        write_queue.submit(lambda: (started.set(), gate.wait()))
+        started.wait(5)
+        written = []
+
+        @backpressure
+        def view(request):
+            return write_queue.execute(written.append, 1, timeout=0.01)
+
+        response = view(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 503)
+        gate.set()
+        write_queue.stop()
+        self.assertEqual(written, [])
+
+    def test_stopped_writer_is_restarted(self):
+        """Остановившийся поток-писатель запускается заново"""
+        write_queue = WriteQueue()
+        write_queue.execute(lambda: None)
+        thread = write_queue._thread
+        write_queue._queue.put(None)
+        thread.join(5)
+        self.assertEqual(write_queue.execute(lambda: 'ok'), 'ok')
+        self.assertIsNot(write_queue._thread, thread)
+        write_queue.stop()
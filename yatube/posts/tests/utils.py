@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@contextmanager
+def commit_callbacks():
+    """Выполняет колбэки transaction.on_commit, добавленные внутри блока,
+    как после фиксации: в TestCase транзакция теста не фиксируется."""
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
+
+
+class TempMediaMixin:
+    """Подменяет MEDIA_ROOT временным каталогом на время класса тестов,
+    включая setUpTestData, и удаляет каталог после них."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls._media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._remove_media_root()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._remove_media_root()
+
+    @classmethod
+    def _remove_media_root(cls):
+        cls._media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -0,0 +1,328 @@
+"""Окна новейших постов лент в кеше.
+
+Для главной, каждой группы и каждого автора в кеше лежит упакованный
+array('q'): число постов ленты и до TIMELINE_LENGTH пар (время
+публикации в микросекундах, id) в порядке ленты. Страница из окна — это
+срез массива и выборка постов по первичному ключу, без ORDER BY, OFFSET
+и COUNT по всей ленте. Страницы за окном читаются из базы как раньше.
+
+Сигналы создания и удаления постов и смены группы после фиксации
+транзакции обновляют закешированные окна на месте под коротким замком
+в кеше; если замок не взят, окно удаляется и перестраивается при
+следующем чтении. Каждое изменение увеличивает поколение ленты, даже
+если окна в кеше нет, а окно хранится вместе с поколением, в котором
+построено. Читатель, начавший строить окно до изменения, не сохранит
+его, а окно, пропустившее изменение, при чтении перестраивается.
+Массовые update() и delete() идут в обход сигналов (у posts.bulk свои
+сигналы на порцию строк); такие окна устаревают не позже
+TIMELINE_TIMEOUT.
+Если в окне нашёлся id, которого уже нет в ленте, окно сбрасывается
+сразу.
+"""
+import heapq
+import time
+from array import array
+from collections import defaultdict
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .deletion import visible
+from .models import Post
+
+TIMELINE_LENGTH = 500
+TIMELINE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1
+
+# Лента подписок собирается слиянием окон авторов, если авторов не
+# больше этого числа; иначе — запросом с JOIN по подпискам.
+FOLLOW_MERGE_MAX_AUTHORS = 50
+
+SITE = 'site'
+GROUP = 'group'
+AUTHOR = 'author'
+
+
+def _key(kind, object_id):
+    return f'timeline:{kind}:{object_id}'
+
+
+def _stamp(pub_date):
+    return int(pub_date.timestamp() * 1e6)
+
+
+def timeline_posts(kind, object_id):
+    """Посты ленты в том виде, в каком их выбирают страницы."""
+    posts = visible(Post.objects.all())
+    if kind == GROUP:
+        posts = posts.filter(group_id=object_id)
+    elif kind == AUTHOR:
+        posts = posts.filter(author_id=object_id)
+    return posts
+
+
+def post_timelines(post):
+    """Ленты, в которые входит пост."""
+    keys = [(SITE, 0), (AUTHOR, post.author_id)]
+    if post.group_id is not None:
+        keys.append((GROUP, post.group_id))
+    return keys
+
+
+class Timeline:
+    """Число постов ленты и окно её новейших постов."""
+
+    __slots__ = ('count', 'entries')
+
+    def __init__(self, count, entries):
+        self.count = count
+        self.entries = entries
+
+    @classmethod
+    def frombytes(cls, data):
+        entries = array('q')
+        entries.frombytes(data)
+        return cls(entries[0], entries[1:])
+
+    def tobytes(self):
+        return (array('q', [self.count]) + self.entries).tobytes()
+
+    def __len__(self):
+        return len(self.entries) // 2
+
+    @property
+    def ids(self):
+        return self.entries[1::2]
+
+    @property
+    def complete(self):
+        """Окно содержит всю ленту."""
+        return len(self) >= self.count
+
+    def slice(self, start, stop):
+        """id постов с start по stop или None, если срез выходит за
+        окно."""
+        if stop > len(self) and not self.complete:
+            return None
+        return list(self.entries[start * 2 + 1:stop * 2:2])
+
+    def pairs(self):
+        return zip(self.entries[0::2], self.entries[1::2])
+
+    def insert(self, stamp, post_id):
+        self.count += 1
+        position = 0
+        while position < len(self.entries) and (
+                self.entries[position], self.entries[position + 1]) > (
+                stamp, post_id):
+            position += 2
+        if position == len(self.entries) and len(self) + 1 < self.count:
+            # Пост старше окна, а за окном есть другие посты.
+            return
+        self.entries[position:position] = array('q', (stamp, post_id))
+        del self.entries[TIMELINE_LENGTH * 2:]
+
+    def remove(self, post_id):
+        self.count = max(self.count - 1, 0)
+        ids = self.ids
+        if post_id in ids:
+            position = ids.index(post_id) * 2
+            del self.entries[position:position + 2]
+
+
+def build(kind, object_id):
+    posts = timeline_posts(kind, object_id)
+    entries = array('q')
+    for pub_date, post_id in posts.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id')[:TIMELINE_LENGTH]:
+        entries.extend((_stamp(pub_date), post_id))
+    count = len(entries) // 2
+    if count == TIMELINE_LENGTH:
+        count = posts.count()
+    return Timeline(count, entries)
+
+
+def _generation_key(kind, object_id):
+    return f'{_key(kind, object_id)}:generation'
+
+
+def _start_generation(key):
+    # Поколение вытеснено из кеша: начинаем с заведомо нового.
+    cache.add(key, int(time.time() * 1e6), None)
+    return cache.get(key)
+
+
+def _bump_generation(kind, object_id):
+    """Новое поколение ленты или None, если прежнее было потеряно."""
+    key = _generation_key(kind, object_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _start_generation(key)
+        return None
+
+
+def _build_and_add(kind, object_id, generation):
+    timeline = build(kind, object_id)
+    # Окно кладётся, только если с начала построения лента не менялась:
+    # иначе в нём может не быть поста, зафиксированного за это время.
+    lock = f'{_key(kind, object_id)}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            if cache.get(_generation_key(kind, object_id)) == generation:
+                cache.set(_key(kind, object_id),
+                          (generation, timeline.tobytes()), TIMELINE_TIMEOUT)
+        finally:
+            cache.delete(lock)
+    return timeline
+
+
+def load(kind, object_id):
+    """Окно ленты из кеша; при промахе строится одним запросом и
+    кладётся в кеш."""
+    return load_many([(kind, object_id)])[0]
+
+
+def load_many(timeline_keys):
+    """Окна нескольких лент одним обращением к кешу, в порядке
+    timeline_keys. Окно, записанное в прежнем поколении ленты,
+    перестраивается."""
+    cached = cache.get_many(
+        [_key(*key) for key in timeline_keys]
+        + [_generation_key(*key) for key in timeline_keys])
+    windows = []
+    for key in timeline_keys:
+        generation = cached.get(_generation_key(*key))
+        if generation is None:
+            generation = _start_generation(_generation_key(*key))
+        stored = cached.get(_key(*key))
+        if stored is not None and stored[0] == generation:
+            windows.append(Timeline.frombytes(stored[1]))
+        else:
+            windows.append(_build_and_add(*key, generation))
+    return windows
+
+
+def discard(*timeline_keys):
+    for key in timeline_keys:
+        _bump_generation(*key)
+    cache.delete_many([_key(*key) for key in timeline_keys])
+
+
+def merge(windows, start, stop):
+    """id постов start:stop общей ленты из нескольких окон или None,
+    если срез выходит за окно одной из лент.
+
+    Окна сливаются heapq.merge по (время, id). Пока слияние не опустилось
+    ниже последней пары неполного окна, посты за этим окном в срез
+    попасть не могут.
+    """
+    if len(windows) == 1:
+        return windows[0].slice(start, stop)
+    horizon = None
+    for window in windows:
+        if window.complete:
+            continue
+        if not len(window):
+            return None
+        last = (window.entries[-2], window.entries[-1])
+        horizon = last if horizon is None else max(horizon, last)
+    merged = list(islice(heapq.merge(
+        *(window.pairs() for window in windows), reverse=True), start, stop))
+    if horizon is not None and (
+            stop > start + len(merged) or merged and merged[-1] < horizon):
+        return None
+    return [post_id for _, post_id in merged]
+
+
+def _acquire(lock):
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock, 1, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def _update(kind, object_id, changes):
+    generation = _bump_generation(kind, object_id)
+    key = _key(kind, object_id)
+    lock = f'{key}:lock'
+    if not _acquire(lock):
+        cache.delete(key)
+        return
+    try:
+        stored = cache.get(key)
+        if stored is None:
+            return
+        if generation is None or stored[0] != generation - 1:
+            # Окно пропустило другое изменение.
+            cache.delete(key)
+            return
+        timeline = Timeline.frombytes(stored[1])
+        for change in changes:
+            change(timeline)
+        cache.set(key, (generation, timeline.tobytes()), TIMELINE_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def _apply(changes):
+    """Применяет изменения к окнам после фиксации транзакции: до неё
+    другие соединения могут перестроить окно без этих постов."""
+    def apply():
+        for (kind, object_id), timeline_changes in changes.items():
+            _update(kind, object_id, timeline_changes)
+
+    transaction.on_commit(apply)
+
+
+def _inserting(post):
+    # Значения берутся сразу: к фиксации удалённый пост уже без id.
+    stamp, post_id = _stamp(post.pub_date), post.id
+    return lambda timeline: timeline.insert(stamp, post_id)
+
+
+def _removing(post):
+    post_id = post.id
+    return lambda timeline: timeline.remove(post_id)
+
+
+def add_posts(posts):
+    changes = defaultdict(list)
+    for post in posts:
+        for timeline_key in post_timelines(post):
+            changes[timeline_key].append(_inserting(post))
+    _apply(changes)
+
+
+def remove_posts(posts):
+    changes = defaultdict(list)
+    for post in posts:
+        for timeline_key in post_timelines(post):
+            changes[timeline_key].append(_removing(post))
+    _apply(changes)
+
+
+def move_post(post, old_group_id):
+    """Переносит пост из ленты прежней группы в ленту новой."""
+    changes = {}
+    if old_group_id is not None:
+        changes[(GROUP, old_group_id)] = [_removing(post)]
+    if post.group_id is not None:
+        changes[(GROUP, post.group_id)] = [_inserting(post)]
+    _apply(changes)
+
+
+def move_posts(posts, group_id):
+    """Переносит посты из лент их прежних групп в ленту группы
+    group_id."""
+    changes = defaultdict(list)
+    for post in posts:
+        if post.group_id is not None:
+            changes[(GROUP, post.group_id)].append(_removing(post))
+        if group_id is not None:
+            changes[(GROUP, group_id)].append(_inserting(post))
+    _apply(changes)
@@ -6,16 +6,40 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
+    path('archive/', views.archive, name='archive'),
+    path('archive/<int:year>/<int:month>/', views.archive, name='archive'),
+    path('archive/<int:year>/<int:month>/<int:day>/', views.archive,
+         name='archive'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug>/', views.group_posts, name='group_list'),
+    path('group/<slug>/archive/', views.archive, name='group_archive'),
+    path('group/<slug>/archive/<int:year>/<int:month>/', views.archive,
+         name='group_archive'),
+    path('group/<slug>/archive/<int:year>/<int:month>/<int:day>/',
+         views.archive, name='group_archive'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/export/', views.profile_export,
+         name='profile_export'),
+    path('profile/<str:username>/archive/', views.archive,
+         name='profile_archive'),
+    path('profile/<str:username>/archive/<int:year>/<int:month>/',
+         views.archive, name='profile_archive'),
+    path('profile/<str:username>/archive/<int:year>/<int:month>/<int:day>/',
+         views.archive, name='profile_archive'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/updates/', views.follow_updates, name='follow_updates'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
+    path('metrics/object-cache/', views.object_cache_stats,
+         name='object_cache_stats'),
 ]
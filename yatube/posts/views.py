@@ -1,42 +1,209 @@
+import datetime
+import json
+import time
+
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import connection
+from django.http import (Http404, HttpResponse, HttpResponseForbidden,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.cache import cache_page
 
+from . import archive as post_archive
+from . import export
+from . import object_cache
+from . import timelines
+from .deletion import hidden_ids, visible
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .feed import feed_rows
+from .live import hub
+from .models import (ArchiveBucket, Comment, Deletion, Follow,
+                     FollowSuggestion, Group, GroupStats, Post, User)
+from .page_cache import PAGE_CACHE_TIMEOUT, post_page_version
+from .write_queue import backpressure, write
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+SUGGESTIONS_SHOWN = 5
 CACHE_SECONDS_DELAY = 20
+LIVE_POLL_TIMEOUT = 25
+LIVE_HEARTBEAT = 15
+LIVE_STREAM_DURATION = 60
+# Ожидающее соединение занимает поток воркера: сверх этого числа
+# соединений процесса клиент получает 503 и приходит позже.
+LIVE_MAX_CONNECTIONS = 20
+LIVE_RETRY_AFTER = 30
 
 
-def get_page_objects(queryset, request):
+def get_page_objects(queryset, request, count=None):
     paginator = Paginator(queryset, POSTS_PER_PAGE)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {'page_obj': page_obj}
 
 
+def get_timeline_page(queryset, request, timeline_keys, fetch):
+    """Страница ленты по окнам из timelines: число постов и id страницы
+    берутся из кеша (для нескольких лент — слиянием окон), а
+    fetch(queryset) выбирает посты страницы по первичному ключу и
+    возвращает {id: пост}. Возвращает ленивую страницу и посты в порядке
+    ленты или None, если страница за окном."""
+    windows = timelines.load_many(timeline_keys)
+    paginator = Paginator(queryset, POSTS_PER_PAGE)
+    paginator.count = sum(window.count for window in windows)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    bottom = (page_obj.number - 1) * POSTS_PER_PAGE
+    post_ids = timelines.merge(windows, bottom, bottom + POSTS_PER_PAGE)
+    if post_ids is not None:
+        found = fetch(queryset.filter(id__in=post_ids).order_by())
+        if len(found) == len(post_ids):
+            return page_obj, [found[post_id] for post_id in post_ids]
+        timelines.discard(*timeline_keys)
+    return page_obj, None
+
+
+def get_feed_page(queryset, request, count=None, timeline_keys=None):
+    """Страница постов: ленивая page_obj и строки ленты feed для
+    шаблона. timeline_keys — ленты timelines, из окон которых собирается
+    страница."""
+    rows = None
+    if timeline_keys is None:
+        page_obj = get_page_objects(queryset, request, count)['page_obj']
+    else:
+        page_obj, rows = get_timeline_page(
+            queryset, request, timeline_keys,
+            fetch=lambda posts: {row.id: row for row in feed_rows(posts)})
+    if rows is None:
+        rows = feed_rows(page_obj.object_list)
+    return {'page_obj': page_obj, 'feed': rows}
+
+
+def get_group_or_404(slug):
+    """Группа из кеша объектов; удаляемая группа не показывается."""
+    group = object_cache.groups_by_slug.get_or_404(slug)
+    if group.id in hidden_ids(Deletion.GROUP):
+        raise Http404('Group не найден')
+    return group
+
+
+def get_author_or_404(username):
+    author = object_cache.get_user_or_404(username)
+    if author.id in hidden_ids(Deletion.USER):
+        raise Http404('User не найден')
+    return author
+
+
+def get_post_or_404(queryset, post_id):
+    """Пост из queryset; посты удаляемого автора не показываются."""
+    post = get_object_or_404(queryset, id=post_id)
+    if post.author_id in hidden_ids(Deletion.USER):
+        raise Http404('Пост не найден')
+    return post
+
+
+def get_follow_suggestions(user, exclude_id=None):
+    """Возвращает заранее рассчитанные рекомендации подписок."""
+    if not user.is_authenticated:
+        return []
+    suggestions = FollowSuggestion.objects.filter(
+        user=user).select_related('author')
+    hidden_authors = hidden_ids(Deletion.USER)
+    if hidden_authors:
+        suggestions = suggestions.exclude(author_id__in=hidden_authors)
+    if exclude_id is not None:
+        suggestions = suggestions.exclude(author_id=exclude_id)
+    return [suggestion.author
+            for suggestion in suggestions[:SUGGESTIONS_SHOWN]]
+
+
+def get_comment_batch(post_id, before=None, after=None):
+    """Возвращает порцию комментариев (новые сверху) и признак того,
+    что за курсором остались ещё комментарии.
+
+    Курсором служит id комментария: before — комментарии старее указанного,
+    after — новее указанного. Порядок по id совпадает с порядком создания.
+    """
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    hidden_authors = hidden_ids(Deletion.USER)
+    if hidden_authors:
+        comments = comments.exclude(author_id__in=hidden_authors)
+    if after is not None:
+        batch = list(comments.filter(id__gt=after).order_by('id')
+                     [:COMMENTS_PER_PAGE + 1])
+        has_more = len(batch) > COMMENTS_PER_PAGE
+        return batch[:COMMENTS_PER_PAGE][::-1], has_more
+    if before is not None:
+        comments = comments.filter(id__lt=before)
+    batch = list(comments.order_by('-id')[:COMMENTS_PER_PAGE + 1])
+    return batch[:COMMENTS_PER_PAGE], len(batch) > COMMENTS_PER_PAGE
+
+
 @cache_page(CACHE_SECONDS_DELAY, key_prefix='index_page')
 def index(request):
-    posts = Post.objects.select_related('author')
-    context = get_page_objects(posts, request)
+    # Главная кешируется целиком на CACHE_SECONDS_DELAY: выигрыш от строк
+    # ленты здесь ничтожен, и в контексте остаются сами посты.
+    posts = visible(Post.objects.select_related('author', 'group').defer(
+        'text'))
+    page_obj, page_posts = get_timeline_page(
+        posts, request, [(timelines.SITE, 0)],
+        fetch=lambda posts: posts.in_bulk())
+    if page_posts is not None:
+        page_obj.object_list = page_posts
+    context = {'page_obj': page_obj}
     return render(request, 'posts/index.html', context)
 
 
+def trending(request):
+    posts = visible(Post.objects.filter(trending__isnull=False).order_by(
+        '-trending__score').select_related('author', 'group').defer('text'))
+    context = get_feed_page(posts, request)
+    return render(request, 'posts/trending.html', context)
+
+
+def group_index(request):
+    groups = Group.objects.select_related('stats').order_by('title')
+    hidden_groups = hidden_ids(Deletion.GROUP)
+    if hidden_groups:
+        groups = groups.exclude(id__in=hidden_groups)
+    context = get_page_objects(groups, request)
+    author_ids = set()
+    for group in context['page_obj']:
+        group.summary = getattr(group, 'stats', None) or GroupStats()
+        group.top_author_ids = [
+            int(author_id)
+            for author_id in group.summary.top_author_ids.split(',')
+            if author_id
+        ]
+        author_ids.update(group.top_author_ids)
+    # Авторы, удаляемые в фоне, в карточки групп не попадают.
+    authors = User.objects.in_bulk(author_ids - hidden_ids(Deletion.USER))
+    for group in context['page_obj']:
+        group.top_authors = [authors[author_id]
+                             for author_id in group.top_author_ids
+                             if author_id in authors]
+    return render(request, 'posts/group_index.html', context)
+
+
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = get_group_or_404(slug)
+    post_list = visible(group.posts.defer('text'))
     context = {
         'group': group,
     }
-    context.update(get_page_objects(post_list, request))
+    context.update(get_feed_page(
+        post_list, request, timeline_keys=[(timelines.GROUP, group.id)]))
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author_id=author.id)
+    author = get_author_or_404(username)
+    post_list = Post.objects.filter(author_id=author.id).defer('text')
     following = False
     if request.user.is_authenticated:
         if Follow.objects.filter(user=request.user, author=author).exists():
@@ -44,37 +211,112 @@ def profile(request, username):
     context = {
         'author': author,
         'following': following,
+        'suggestions': get_follow_suggestions(request.user, author.id),
     }
-    context.update(get_page_objects(post_list, request))
+    context.update(get_feed_page(
+        post_list, request, timeline_keys=[(timelines.AUTHOR, author.id)]))
     return render(request, 'posts/profile.html', context)
 
 
+def archive(request, year=None, month=None, day=None, slug=None,
+            username=None):
+    """Архив сайта, группы или автора по месяцам и дням."""
+    context = {'year': year, 'month': month, 'day': day}
+    if slug is not None:
+        context['group'] = get_group_or_404(slug)
+        scope, scope_id = ArchiveBucket.GROUP, context['group'].id
+        url_name, url_kwargs = 'posts:group_archive', {'slug': slug}
+    elif username is not None:
+        context['author'] = get_author_or_404(username)
+        scope, scope_id = ArchiveBucket.AUTHOR, context['author'].id
+        url_name, url_kwargs = 'posts:profile_archive', {'username': username}
+    else:
+        scope, scope_id = ArchiveBucket.SITE, 0
+        url_name, url_kwargs = 'posts:archive', {}
+    context['months'] = list(post_archive.month_menu(scope, scope_id))
+    for bucket in context['months']:
+        bucket.url = reverse(url_name, kwargs=dict(
+            url_kwargs, year=bucket.year, month=bucket.month))
+    if year is not None:
+        try:
+            datetime.date(year, month, day or 1)
+        except ValueError:
+            raise Http404('Некорректная дата')
+        context['days'] = list(post_archive.day_menu(
+            scope, scope_id, year, month))
+        for bucket in context['days']:
+            bucket.url = reverse(url_name, kwargs=dict(
+                url_kwargs, year=year, month=month, day=bucket.day))
+        posts, count = post_archive.period_posts(
+            scope, scope_id, year, month, day or 0)
+        if posts is None:
+            posts = Post.objects.none()
+        context.update(get_feed_page(
+            visible(posts.select_related('author', 'group').defer('text')),
+            request, count))
+    return render(request, 'posts/archive.html', context)
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    group = post.group
-    title_text = post.text[:30]
-    author = post.author
-    comments = Comment.objects.filter(post_id=post_id)
-    form = CommentForm(request.POST or None)
+    """Страница поста. Тело страницы кешируется фрагментами по версиям
+    из page_cache, поэтому комментарии запрашиваются лениво: при
+    попадании в кеш запрос не выполняется."""
+    post = object_cache.get_post_or_404(post_id)
+    if post.author_id in hidden_ids(Deletion.USER):
+        raise Http404('Пост не найден')
+    batch = SimpleLazyObject(lambda: get_comment_batch(post_id))
     context = {
         'post': post,
-        'title_text': title_text,
-        'author': author,
-        'group': group,
-        'comments': comments,
-        'form': form,
+        'title_text': post.text[:30],
+        'author': post.author,
+        'group': post.group,
+        'comments': SimpleLazyObject(lambda: batch[0]),
+        'comments_has_more': SimpleLazyObject(lambda: batch[1]),
+        'form': CommentForm(request.POST or None),
+        'page_version': post_page_version(post),
+        'page_cache_timeout': PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Фрагмент со следующей порцией комментариев в HTML или JSON."""
+    try:
+        before = request.GET.get('before')
+        after = request.GET.get('after')
+        before = int(before) if before else None
+        after = int(after) if after else None
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный курсор'}, status=400)
+    post = get_post_or_404(Post.objects.only('id', 'author_id'), post_id)
+    comments, has_more = get_comment_batch(post.id, before, after)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                } for comment in comments
+            ],
+            'has_more': has_more,
+        })
+    response = render(request, 'posts/includes/comment_list.html',
+                      {'comments': comments})
+    response['X-Has-More'] = int(has_more)
+    return response
+
+
 @login_required
+@backpressure
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST, files=request.FILES or None,)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            write(post.save)
             return redirect('posts:profile', username=post.author)
         return render(request, 'posts/post_create.html', {'form': form})
     form = PostForm()
@@ -99,31 +341,128 @@ def post_edit(request, post_id):
 
 
 @login_required
+@backpressure
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(Post, post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user).select_related('author', 'group')
-    context = get_page_objects(posts, request)
+    """Лента подписок. Если авторов немного, страница собирается
+    слиянием их окон из timelines, общих для всех подписчиков; иначе —
+    одним запросом с JOIN по подпискам."""
+    hidden_authors = hidden_ids(Deletion.USER)
+    author_ids = [author_id for author_id in Follow.objects.filter(
+        user=request.user).values_list('author_id', flat=True)
+        if author_id not in hidden_authors]
+    if len(author_ids) <= timelines.FOLLOW_MERGE_MAX_AUTHORS:
+        posts = Post.objects.filter(author_id__in=author_ids)
+        timeline_keys = [(timelines.AUTHOR, author_id)
+                         for author_id in author_ids]
+    else:
+        posts = visible(Post.objects.filter(
+            author__following__user=request.user))
+        timeline_keys = None
+    context = get_feed_page(
+        posts.select_related('author', 'group').defer('text'), request,
+        timeline_keys=timeline_keys)
+    context['suggestions'] = get_follow_suggestions(request.user)
+    feed = context['feed']
+    # Уведомления нужны только на первой странице; при пустой ленте
+    # новыми считаются все посты подписок (since=0).
+    context['live_updates'] = context['page_obj'].number == 1
+    context['latest_post_id'] = feed[0].id if feed else 0
     return render(request, 'posts/follow.html', context)
 
 
+def live_event(count, latest):
+    data = json.dumps({'count': count, 'latest': latest})
+    return f'event: posts\ndata: {data}\n\n'
+
+
+def count_new_posts(author_ids, since):
+    """Возвращает число постов авторов новее since и id последнего."""
+    new_posts = Post.objects.filter(
+        author_id__in=author_ids, id__gt=since).order_by('-id')
+    count = new_posts.count()
+    latest = new_posts.values_list('id', flat=True).first() or since
+    # Ожидающее соединение не должно держать соединение с базой.
+    connection.close()
+    return count, latest
+
+
+def stream_new_posts(author_ids, since):
+    """Отдаёт события о новых постах, пока клиент подключён, и
+    закрывает поток через LIVE_STREAM_DURATION. EventSource
+    переподключится по тому же адресу, и счётчик новых постов с since
+    будет заново взят из базы.
+
+    Подписка оформляется при первом чтении потока, до подсчёта постов,
+    чтобы не пропустить опубликованные между ними; ответ, закрытый до
+    начала чтения, ничего не оставляет в хабе."""
+    with hub.subscribe(author_ids) as subscription:
+        count, latest = count_new_posts(author_ids, since)
+        yield 'retry: 3000\n\n'
+        if count:
+            yield live_event(count, latest)
+        deadline = time.monotonic() + LIVE_STREAM_DURATION
+        while time.monotonic() < deadline:
+            post_ids = subscription.wait(LIVE_HEARTBEAT)
+            if post_ids:
+                count += len(post_ids)
+                latest = max(latest, *post_ids)
+                yield live_event(count, latest)
+            else:
+                yield ': heartbeat\n\n'
+
+
 @login_required
+def follow_updates(request):
+    """Сообщает о новых постах авторов из подписок: поток SSE или, с
+    параметром mode=poll, длинный опрос с ответом в JSON. Когда открыто
+    LIVE_MAX_CONNECTIONS соединений, отвечает 503 с Retry-After."""
+    try:
+        since = int(request.GET.get('since') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный since'}, status=400)
+    if hub.subscriber_count() >= LIVE_MAX_CONNECTIONS:
+        response = HttpResponse('Слишком много ожидающих соединений',
+                                status=503)
+        response['Retry-After'] = LIVE_RETRY_AFTER
+        return response
+    hidden_authors = hidden_ids(Deletion.USER)
+    author_ids = [author_id for author_id in Follow.objects.filter(
+        user=request.user).values_list('author_id', flat=True)
+        if author_id not in hidden_authors]
+    if request.GET.get('mode') == 'poll':
+        with hub.subscribe(author_ids) as subscription:
+            count, latest = count_new_posts(author_ids, since)
+            if not count:
+                post_ids = subscription.wait(LIVE_POLL_TIMEOUT)
+                count = len(post_ids)
+                latest = max(post_ids, default=latest)
+        return JsonResponse({'count': count, 'latest': latest})
+    response = StreamingHttpResponse(stream_new_posts(author_ids, since),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@backpressure
 def profile_follow(request, username):
     follower = request.user
-    fav_author = User.objects.get(username=username)
+    fav_author = get_author_or_404(username)
     if follower.id != fav_author.id:
-        Follow.objects.get_or_create(user=follower, author=fav_author)
+        write(Follow.objects.get_or_create, user=follower, author=fav_author)
         return redirect('posts:follow_index')
     return profile(request, username)
 
@@ -135,3 +474,54 @@ def profile_unfollow(request, username):
     Follow.objects.filter(user=follower,
                           author=following).delete()
     return profile(request, username)
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'zip': 'application/zip',
+}
+
+
+@login_required
+def profile_export(request, username):
+    """Потоковая выгрузка постов и комментариев пользователя.
+
+    Доступна самому пользователю и персоналу. Параметры: format
+    (csv, jsonl, zip), kind (posts или comments, обязателен для csv),
+    images=0 отключает картинки в zip.
+    """
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        return HttpResponseForbidden()
+    export_format = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind')
+    if export_format not in EXPORT_FORMATS or kind not in (
+            None, *export.FIELDS):
+        return JsonResponse({'error': 'Неизвестный формат'}, status=400)
+    if export_format == 'csv':
+        if kind is None:
+            return JsonResponse({'error': 'Для csv укажите kind'},
+                                status=400)
+        content = export.csv_lines(author, kind)
+        filename = f'{username}-{kind}.csv'
+    elif export_format == 'jsonl':
+        content = export.jsonl_lines(
+            author, (kind,) if kind else tuple(export.FIELDS))
+        filename = f'{username}-{kind or "all"}.jsonl'
+    else:
+        content = export.zip_chunks(
+            author, with_images=request.GET.get('images') != '0')
+        filename = f'{username}.zip'
+    response = StreamingHttpResponse(
+        content, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def object_cache_stats(request):
+    """Попадания в кеш объектов в текущем процессе; только персоналу."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse(object_cache.stats())
@@ -0,0 +1,186 @@
+"""Очередь записи с единственным писателем.
+
+SQLite допускает только одну пишущую транзакцию одновременно, поэтому при
+всплесках нагрузки конкурентные запросы выстраиваются на блокировке базы.
+Очередь передаёт изменения одному потоку-писателю, который объединяет их
+в пакетные транзакции (group commit) и возвращает результат ожидающим
+запросам. Очередь ограничена по размеру: когда она заполнена, запрос
+получает WriteQueueFull вместо бесконечного ожидания, а изменение, которое
+писатель не успел начать за время ожидания результата, отменяется.
+Остановившийся писатель перезапускается при следующей записи.
+
+Режим включается настройкой POSTS_WRITE_QUEUE; по умолчанию запись идёт
+напрямую в потоке запроса.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_PUT_TIMEOUT = 2
+DEFAULT_RESULT_TIMEOUT = 30
+RETRY_AFTER_SECONDS = 1
+
+
+class WriteQueueFull(Exception):
+    """Очередь записи переполнена, запрос стоит повторить позже."""
+
+
+class WriteQueue:
+    """Ограниченная очередь изменений с одним потоком-писателем."""
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 put_timeout=DEFAULT_PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит изменение в очередь и возвращает Future с результатом."""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put((func, args, kwargs, future),
+                            timeout=self.put_timeout)
+        except queue.Full:
+            raise WriteQueueFull('Очередь записи переполнена')
+        return future
+
+    def execute(self, func, *args, timeout=DEFAULT_RESULT_TIMEOUT, **kwargs):
+        """Выполняет изменение через писателя и ждёт фиксации транзакции.
+
+        Если результата нет за timeout, ещё не начатое изменение
+        отменяется; уже начатое может зафиксироваться позже.
+        """
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Останавливает писателя после обработки уже принятых изменений."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            if thread.is_alive():
+                self._queue.put(None)
+                thread.join()
+            self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='posts-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Блокируется до первого изменения и добирает готовые следом."""
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is None
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._commit(batch)
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, batch):
+        """Фиксирует пакет одной транзакцией; каждое изменение в точке
+        сохранения, чтобы ошибка одного не откатывала остальные."""
+        # Отменённые по таймауту ожидания изменения не выполняются.
+        batch = [item for item in batch
+                 if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        try:
+            with transaction.atomic():
+                for func, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args, **kwargs),
+                                            None))
+                    except Exception as error:
+                        results.append((future, None, error))
+        except Exception as error:
+            for _, _, _, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.operations += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """Возвращает общую для процесса очередь записи."""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(
+                max_size=getattr(settings, 'POSTS_WRITE_QUEUE_MAX_SIZE',
+                                 DEFAULT_MAX_SIZE),
+                batch_size=getattr(settings, 'POSTS_WRITE_QUEUE_BATCH_SIZE',
+                                   DEFAULT_BATCH_SIZE),
+            )
+        return _write_queue
+
+
+def write(func, *args, **kwargs):
+    """Выполняет изменение напрямую или через писателя, если он включён."""
+    if not getattr(settings, 'POSTS_WRITE_QUEUE', False):
+        return func(*args, **kwargs)
+    return get_write_queue().execute(func, *args, **kwargs)
+
+
+def backpressure(view_func):
+    """Отвечает 503 с Retry-After, если очередь записи переполнена или
+    писатель не вернул результат вовремя."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except (WriteQueueFull, FutureTimeoutError):
+            response = HttpResponse('Сервис перегружен, повторите запрос',
+                                    status=503)
+            response['Retry-After'] = RETRY_AFTER_SECONDS
+            return response
+    return wrapper
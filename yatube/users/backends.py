@@ -0,0 +1,89 @@
+"""Загрузка пользователя запроса из кеша.
+
+AuthenticationMiddleware на каждый запрос вызывает backend.get_user().
+CachedModelBackend отдаёт пользователя из компактной записи в кеше
+(значения полей модели), и с сессиями cached_db запрос авторизованного
+пользователя при тёплом кеше не обращается к базе. Запись лежит под
+ключом с номером версии: изменение пользователя, смена пароля и выход
+увеличивают версию, а запись, прочитанная из базы до изменения,
+сохраняется под старым ключом и больше не читается. Версия
+увеличивается и сразу, и после фиксации транзакции: иначе запрос,
+прочитавший строку до фиксации, положил бы её под новую версию.
+
+Хеш пароля в кеш не попадает: в записи только CACHED_FIELDS и хеш
+сессии, по которому django.contrib.auth проверяет, не сменился ли
+пароль. Остальные поля у пользователя из кеша отложены и при обращении
+читаются из базы, поэтому save() не затрёт их.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+USER_CACHE_TIMEOUT = 60 * 60
+CACHED_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email',
+                 'is_active', 'is_staff', 'is_superuser')
+
+
+def _version_key(user_id):
+    return f'users:user:{user_id}:version'
+
+
+def _current_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Версия вытеснена из кеша: начинаем с заведомо новой.
+        cache.add(key, int(time.time() * 1e6), None)
+        version = cache.get(key)
+    return version
+
+
+def user_cache_version(user_id):
+    """Текущая версия записей пользователя в кешах; меняется при каждом
+    сохранении, удалении и выходе пользователя."""
+    return _current_version(user_id)
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), int(time.time() * 1e6), None)
+
+
+def invalidate_user(user_id):
+    """Делает устаревшей закешированную запись пользователя."""
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def get_cached_user(user_id):
+    """Пользователь из кеша или из базы; None, если его нет."""
+    User = get_user_model()
+    key = f'users:user:{user_id}:{_current_version(user_id)}'
+    record = cache.get(key)
+    if record is None:
+        user = User._default_manager.filter(pk=user_id).first()
+        if user is None:
+            return None
+        record = {field: getattr(user, field) for field in CACHED_FIELDS}
+        record['session_hash'] = user.get_session_auth_hash()
+        cache.set(key, record, USER_CACHE_TIMEOUT)
+        return user
+    session_hash = record.pop('session_hash')
+    # from_db() ждёт значения в порядке полей модели.
+    field_names = [field.attname for field in User._meta.concrete_fields
+                   if field.attname in record]
+    user = User.from_db(User._default_manager.db, field_names,
+                        [record[name] for name in field_names])
+    user.get_session_auth_hash = lambda: session_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user and self.user_can_authenticate(user) else None
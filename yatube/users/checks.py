@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+DEFAULT_SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.memcached.',
+    'django_redis.',
+)
+
+
+def is_shared_cache(alias):
+    """Виден ли кеш alias всем процессам-воркерам."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return backend.startswith(getattr(settings, 'SHARED_CACHE_BACKENDS',
+                                      DEFAULT_SHARED_CACHE_BACKENDS))
+
+
+@register()
+def check_cached_auth(app_configs, **kwargs):
+    """Предупреждает о кешированных пользователях и сессиях в кеше,
+    которого не видят другие воркеры."""
+    warnings = []
+    if ('users.backends.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS
+            and not is_shared_cache('default')):
+        warnings.append(Warning(
+            'CachedModelBackend с кешем, локальным для процесса',
+            hint='Смена пароля, блокировка и выход дойдут до других '
+                 'воркеров только по истечении USER_CACHE_TIMEOUT. '
+                 'Подключите memcached или redis либо используйте '
+                 'ModelBackend.',
+            id='users.W001',
+        ))
+    if (settings.SESSION_ENGINE in CACHED_SESSION_ENGINES
+            and not is_shared_cache(settings.SESSION_CACHE_ALIAS)):
+        warnings.append(Warning(
+            f'{settings.SESSION_ENGINE} с кешем, локальным для процесса',
+            hint='Выход из системы дойдёт до других воркеров только по '
+                 'истечении записи сессии. Подключите memcached или redis '
+                 'либо используйте сессии в базе.',
+            id='users.W002',
+        ))
+    return warnings
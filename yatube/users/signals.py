@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_saved_user(sender, instance, **kwargs):
+    """Профиль, пароль и last_login меняются через save()."""
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..backends import _current_version, get_cached_user
+from ..checks import check_cached_auth
+
+User = get_user_model()
+
+# В тестах процесс один, и локального кеша достаточно.
+CACHED_AUTH_SETTINGS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': [
+        'users.backends.CachedModelBackend',
+        'django.contrib.auth.backends.ModelBackend',
+    ],
+}
+
+
+class CachedAuthCheckTest(TestCase):
+    def test_default_settings_pass(self):
+        self.assertEqual(check_cached_auth(None), [])
+
+    @override_settings(**CACHED_AUTH_SETTINGS)
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([warning.id for warning in check_cached_auth(None)],
+                         ['users.W001', 'users.W002'])
+
+    @override_settings(**CACHED_AUTH_SETTINGS, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_cached_auth(None), [])
+
+
+@override_settings(**CACHED_AUTH_SETTINGS)
+class CachedUserLoadingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached',
+                                             password='old-password-1')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_warm_request_needs_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertTrue(response.context['user'].is_authenticated)
+
+    def test_profile_update_invalidates_cached_user(self):
+        self.client.get(self.url)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(self.url)
+        self.user.set_password('new-password-2')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_invalidates_cached_user(self):
+        cached = get_cached_user(self.user.pk)
+        self.client.get(reverse('users:logout'))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertTrue(cached.is_active)
+        self.assertFalse(get_cached_user(self.user.pk).is_active)
+
+    def test_password_hash_is_not_cached(self):
+        get_cached_user(self.user.pk)
+        record = cache.get(
+            f'users:user:{self.user.pk}:{_current_version(self.user.pk)}')
+        self.assertNotIn('password', record)
+        self.assertNotIn(self.user.password, record.values())
+
+    def test_cached_user_save_keeps_password(self):
+        get_cached_user(self.user.pk)
+        cached = get_cached_user(self.user.pk)
+        cached.first_name = 'Имя'
+        cached.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password(
+            'old-password-1'))
+
+
+class CommitInvalidationTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_changes_after_commit(self):
+        user = User.objects.create_user(username='committed')
+        with transaction.atomic():
+            user.is_active = False
+            user.save()
+            # Запрос, выполненный до фиксации, кеширует запись под этой
+            # версией; после фиксации её читать нельзя.
+            version = _current_version(user.pk)
+        self.assertNotEqual(_current_version(user.pk), version)
@@ -111,6 +111,7 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -122,9 +123,50 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Отдавать медиафайлы через прокси: 'X-Accel-Redirect' (nginx, location
+# MEDIA_ACCEL_REDIRECT_PREFIX с internal и alias на MEDIA_ROOT) или
+# 'X-Sendfile' (Apache mod_xsendfile, lighttpd). None — отдаёт Django.
+MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
+# Кеши, общие для всех процессов-воркеров (см. users/checks.py).
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.memcached.',
+    'django_redis.',
+)
+
+# Сессии и пользователь запроса из кеша (см. users/backends.py). Выход,
+# смена пароля и блокировка сбрасывают записи только в кеше своего
+# процесса, поэтому режим включается лишь при общем кеше; иначе
+# остальные воркеры узнали бы о них только по истечении записей.
+# ModelBackend оставлен для сессий, созданных до включения кеша.
+CACHED_AUTH = (
+    os.getenv('CACHED_AUTH') == '1'
+    and CACHES['default']['BACKEND'].startswith(SHARED_CACHE_BACKENDS)
+)
+if CACHED_AUTH:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = [
+        'users.backends.CachedModelBackend',
+        'django.contrib.auth.backends.ModelBackend',
+    ]
+
+# Очередь записи с единственным писателем (см. posts/write_queue.py)
+POSTS_WRITE_QUEUE = False
+POSTS_WRITE_QUEUE_MAX_SIZE = 1000
+POSTS_WRITE_QUEUE_BATCH_SIZE = 100
+
+# Прогрев воркера при загрузке yatube/wsgi.py (см. core/warmup.py)
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', '1') == '1'
+WARMUP_URLS = ('/', '/groups/', '/trending/')
+
+# Удалять ненужные картинки сразу после фиксации транзакции; при False
+# очередь разбирает только команда reconcile_images (см. posts/blobs.py)
+POSTS_PURGE_IMAGES_ON_COMMIT = True
@@ -1,7 +1,8 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.views import media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,13 +10,9 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media),
 ]
 
 handler403 = 'core.views.csrf_failure'
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )